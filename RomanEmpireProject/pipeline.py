@@ -0,0 +1,424 @@
+# pipeline.py
+"""
+Run the text pipeline (stage 0 -> stage 1 -> stage 2) as a DAG of steps.
+
+Every step declares the files it reads and writes. A step starts once the steps
+producing its inputs have finished, independent steps run concurrently, and a
+step whose command, input hashes and output hashes match its last successful run
+is skipped. Each run leaves per-step logs and a Chrome trace (open in
+chrome://tracing or ui.perfetto.dev) under pipeline_runs/<timestamp>/.
+
+    python pipeline.py                      # run whatever changed
+    python pipeline.py --only 'stage2.*'    # run a subset, treating the rest as done
+    python pipeline.py --list               # show steps, dependencies and freshness
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import hashlib
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = "pipeline_state.json"
+RUNS_DIR = "pipeline_runs"
+
+# (chapter range, stage key, stage 1 input file)
+STAGE_TEXTS = [
+    ("IV-VI", "stage1", "stage1_iv-vi.txt"),
+    ("VI-X", "stage2", "stage2_vi-x.txt"),
+    ("XIII-XIV", "stage3", "stage3_xiii-xiv.txt"),
+    ("XIV-XVII", "stage4", "stage4_xiv-xvii.txt")
+]
+
+# Stable outputs handed from one stage to the next
+STAGE1_REPORT = "roman_history_stage1/outputs/final_analysis.json"
+STAGE2_REPORT = "roman_history_stage2/outputs/stage2_final_analysis.json"
+TERRAIN_STEM = "roman_history_stage2/outputs/terrain/heightmap"
+
+class Step:
+    """One unit of work: a command (run in a subprocess) or a Python action"""
+    
+    def __init__(self, name: str, inputs: List[str], outputs: List[str], command: List[str] = None,
+                 action: Callable[[], None] = None, cwd: str = ".", env: Dict[str, str] = None):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.command = command
+        self.action = action
+        self.cwd = cwd
+        self.env = env or {}
+    
+    def signature(self) -> str:
+        """What the step does, so a changed command also counts as a change"""
+        return json.dumps({
+            "command": self.command,
+            "action": self.action.__name__ if self.action else None,
+            "cwd": self.cwd,
+            "env": self.env
+        }, sort_keys=True)
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def publish_stage_texts():
+    """Copy the cleaned chapter ranges into stage 1's input directory"""
+    os.makedirs("roman_history_stage1/data/stages", exist_ok=True)
+    for chapter_range, _, stage_file in STAGE_TEXTS:
+        shutil.copyfile(
+            f"roman_history_stage0/deep_cleaned_chapters/deep_cleaned_chapters_{chapter_range}.txt",
+            f"roman_history_stage1/data/stages/{stage_file}"
+        )
+
+def stage_code(stage_dir: str, modules: List[str]) -> List[str]:
+    """A stage's main.py plus the src modules a step runs, as step inputs"""
+    return [f"{stage_dir}/main.py"] + [f"{stage_dir}/src/{module}.py" for module in modules]
+
+def build_steps() -> List[Step]:
+    """The pipeline; dependencies follow from matching outputs to inputs"""
+    python = sys.executable
+    extracted = [f"roman_history_stage0/extracted_chapters/chapters_{r}.txt" for r, _, _ in STAGE_TEXTS]
+    cleaned = [f"roman_history_stage0/deep_cleaned_chapters/deep_cleaned_chapters_{r}.txt" for r, _, _ in STAGE_TEXTS]
+    stage_texts = [f"roman_history_stage1/data/stages/{f}" for _, _, f in STAGE_TEXTS]
+    stage_summaries = [f"roman_history_stage1/data/summaries/{key}_summary.json" for _, key, _ in STAGE_TEXTS]
+    stage1_settings = "roman_history_stage1/config/settings.py"
+    stage2_config = ["roman_history_stage2/config/settings.py", "roman_history_stage2/config/themes_mapping.py"]
+    stage2_env = {"STAGE1_INPUT_PATH": STAGE1_REPORT}
+    
+    # Code each step runs, so editing it invalidates the step like its data would
+    stage1_code = stage_code("roman_history_stage1", [
+        "ai_client", "batch_client", "chunk_dedup", "chunk_processor", "completion_cache", "rate_limiter",
+        "stage_summarizer", "stage_text", "theme_analyzer", "tokenizer", "utils"
+    ])
+    stage2_client = ["ai_client", "batch_client", "completion_cache", "rate_limiter", "utils"]
+    stage2_terrain = stage2_config + ["roman_history_stage2/config/terrain_layout.py"]
+    
+    steps = [
+        Step("stage0.extract",
+             inputs=["roman_history_stage0/decline_fall_full.txt", "roman_history_stage0/extract_chapters.py",
+                     "roman_history_stage0/build_manifest.py"],
+             outputs=extracted,
+             command=[python, "extract_chapters.py"], cwd="roman_history_stage0"),
+        Step("stage0.clean",
+             inputs=extracted + ["roman_history_stage0/chapters_clean.py", "roman_history_stage0/build_manifest.py"],
+             outputs=cleaned,
+             command=[python, "chapters_clean.py"], cwd="roman_history_stage0"),
+        Step("stage1.texts", inputs=cleaned, outputs=stage_texts, action=publish_stage_texts)
+    ]
+    
+    # One process for all stages: the chunk dedup index is in memory, and chapters
+    # shared by two stages are only summarized once if both stages see it.
+    # Unchanged stages are cheap to rerun (chunk checkpoints and the completion cache).
+    stage_args = [arg for _, stage_key, _ in STAGE_TEXTS for arg in ("--stage", stage_key)]
+    steps += [
+        Step("stage1.summaries",
+             inputs=stage_texts + [stage1_settings] + stage1_code,
+             outputs=stage_summaries,
+             command=[python, "roman_history_stage1/main.py"] + stage_args),
+        Step("stage1.themes",
+             inputs=stage_summaries + [stage1_settings] + stage1_code,
+             outputs=[STAGE1_REPORT],
+             command=[python, "roman_history_stage1/main.py", "--combine-stages", "--output", STAGE1_REPORT]),
+        Step("stage2.themes",
+             inputs=[STAGE1_REPORT] + stage2_config + stage_code("roman_history_stage2", ["theme_mapper", "utils"]),
+             outputs=["roman_history_stage2/data/processed/theme_mapping_process.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "themes"], env=stage2_env),
+        Step("stage2.events",
+             inputs=[STAGE1_REPORT] + stage2_config + stage_code("roman_history_stage2", stage2_client + [
+                 "event_analyzer", "event_table", "json_stream"
+             ]),
+             outputs=["roman_history_stage2/data/processed/historical_events.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "events"], env=stage2_env),
+        Step("stage2.periods",
+             inputs=[STAGE1_REPORT] + stage2_config + stage_code("roman_history_stage2", stage2_client + [
+                 "period_analyzer"
+             ]),
+             outputs=["roman_history_stage2/data/processed/period_analysis.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "periods"], env=stage2_env),
+        Step("stage2.report",
+             inputs=[
+                 "roman_history_stage2/data/processed/theme_mapping_process.json",
+                 "roman_history_stage2/data/processed/historical_events.json",
+                 "roman_history_stage2/data/processed/period_analysis.json"
+             ] + stage_code("roman_history_stage2", ["utils"]),
+             outputs=[STAGE2_REPORT],
+             command=[python, "roman_history_stage2/main.py", "--step", "report", "--output", STAGE2_REPORT],
+             env=stage2_env),
+        Step("stage2.terrain",
+             inputs=[
+                 "roman_history_stage2/data/processed/historical_events.json",
+                 "roman_history_stage2/data/processed/period_analysis.json"
+             ] + stage2_terrain + stage_code("roman_history_stage2", ["event_table", "terrain_rasterizer", "utils"]),
+             outputs=[f"{TERRAIN_STEM}.png", f"{TERRAIN_STEM}.raw", f"{TERRAIN_STEM}.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "terrain"], env=stage2_env),
+        Step("stage2.tiles",
+             inputs=[
+                 "roman_history_stage2/data/processed/historical_events.json",
+                 "roman_history_stage2/data/processed/period_analysis.json"
+             ] + stage2_terrain + stage_code("roman_history_stage2", ["event_table", "terrain_rasterizer", "heightmap_store", "utils"]),
+             outputs=["roman_history_stage2/outputs/terrain/tiles/store.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "tiles"], env=stage2_env),
+        Step("stage2.animation",
+             inputs=[
+                 "roman_history_stage2/data/processed/historical_events.json",
+                 "roman_history_stage2/data/processed/period_analysis.json"
+             ] + stage2_terrain + stage_code("roman_history_stage2", ["event_table", "terrain_rasterizer", "terrain_animation", "utils"]),
+             outputs=["roman_history_stage2/outputs/terrain/frames/frames.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "animation"], env=stage2_env),
+        Step("stage2.cascades",
+             inputs=[
+                 "roman_history_stage2/data/processed/historical_events.json",
+                 "roman_history_stage2/data/processed/period_analysis.json"
+             ] + stage2_config + stage_code("roman_history_stage2", ["event_table", "cascade_simulator", "utils"]),
+             outputs=["roman_history_stage2/data/processed/theme_intensity.json"],
+             command=[python, "roman_history_stage2/main.py", "--step", "cascades"], env=stage2_env)
+    ]
+    return steps
+
+class PipelineRunner:
+    def __init__(self, steps: List[Step], jobs: int = 4, force: bool = False, only: List[str] = None):
+        self.steps = {step.name: step for step in steps}
+        self.jobs = max(1, jobs)
+        self.force = force
+        self.selected = {
+            name for name in self.steps
+            if not only or any(fnmatch.fnmatch(name, pattern) for pattern in only)
+        }
+        self.deps = self._resolve_dependencies(steps)
+        self.order = self._topological_order()
+        self.state = self._load_state()
+        self._state_lock = threading.Lock()
+    
+    @staticmethod
+    def _resolve_dependencies(steps: List[Step]) -> Dict[str, set]:
+        producers = {}
+        for step in steps:
+            for output in step.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is produced by both {producers[output]} and {step.name}")
+                producers[output] = step.name
+        return {
+            step.name: {producers[path] for path in step.inputs if path in producers}
+            for step in steps
+        }
+    
+    def _topological_order(self) -> List[str]:
+        order = []
+        visiting = set()
+        
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through {name}")
+            visiting.add(name)
+            for dep in sorted(self.deps[name]):
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+        
+        for name in self.steps:
+            visit(name)
+        return order
+    
+    @staticmethod
+    def _load_state() -> Dict:
+        try:
+            with open(STATE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"steps": {}}
+    
+    def _save_state(self):
+        with open(STATE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2, sort_keys=True)
+    
+    def is_up_to_date(self, step: Step, input_hashes: Dict[str, str]) -> bool:
+        """Same command, same input hashes, and outputs untouched since the last successful run"""
+        entry = self.state["steps"].get(step.name)
+        if not entry or entry.get("signature") != step.signature() or entry.get("inputs") != input_hashes:
+            return False
+        for path in step.outputs:
+            if not os.path.exists(path) or entry.get("outputs", {}).get(path) != file_sha256(path):
+                return False
+        return True
+    
+    def describe(self):
+        """Print each step with its dependencies and whether it would be skipped"""
+        for name in self.order:
+            step = self.steps[name]
+            missing = [path for path in step.inputs if not os.path.exists(path)]
+            if missing:
+                status = f"missing input {missing[0]}"
+            elif self.is_up_to_date(step, {path: file_sha256(path) for path in step.inputs}):
+                status = "up to date"
+            else:
+                status = "stale"
+            deps = ", ".join(sorted(self.deps[name])) or "-"
+            print(f"{name:<24} after: {deps:<60} {status}")
+    
+    def run(self) -> bool:
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.log_dir = os.path.join(RUNS_DIR, run_id)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.run_started = time.perf_counter()
+        self.trace = []
+        self.lanes = {}
+        
+        results = {}
+        pending = [name for name in self.order if name in self.selected]
+        for name in self.order:
+            if name not in self.selected:
+                results[name] = ("unselected", "")
+        failed = False
+        
+        print(f"Pipeline run {run_id}: {len(pending)} steps, up to {self.jobs} at a time")
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            running = {}
+            while pending or running:
+                if failed:
+                    # Fail fast: nothing new starts once a step has failed
+                    for name in pending:
+                        results[name] = ("blocked", "an earlier step failed")
+                    pending = []
+                else:
+                    for name in list(pending):
+                        if all(results.get(dep, ("",))[0] in ("ran", "skipped", "unselected") for dep in self.deps[name]):
+                            pending.remove(name)
+                            running[executor.submit(self._execute, self.steps[name])] = name
+                
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    status, detail = future.result()
+                    results[name] = (status, detail)
+                    elapsed = time.perf_counter() - self.run_started
+                    print(f"[{elapsed:7.1f}s] {name}: {status}{' - ' + detail if detail else ''}")
+                    if status == "failed":
+                        failed = True
+        
+        self._write_trace(run_id, results)
+        self._print_summary(results)
+        return not failed
+    
+    def _execute(self, step: Step):
+        started = time.perf_counter()
+        status, detail = self._run_step(step)
+        self._record_trace(step.name, started, time.perf_counter(), status)
+        return status, detail
+    
+    def _run_step(self, step: Step):
+        missing = [path for path in step.inputs if not os.path.exists(path)]
+        if missing:
+            if all(os.path.exists(path) for path in step.outputs):
+                return "skipped", f"input {missing[0]} not found, keeping existing outputs"
+            return "failed", f"missing inputs: {', '.join(missing)}"
+        
+        input_hashes = {path: file_sha256(path) for path in step.inputs}
+        if not self.force and self.is_up_to_date(step, input_hashes):
+            return "skipped", "unchanged"
+        
+        log_path = os.path.join(self.log_dir, f"{step.name}.log")
+        try:
+            if step.command:
+                with open(log_path, 'w', encoding='utf-8') as log:
+                    returncode = subprocess.call(
+                        step.command, cwd=step.cwd, stdout=log, stderr=subprocess.STDOUT,
+                        env={**os.environ, "PYTHONIOENCODING": "utf-8", **step.env}
+                    )
+                if returncode:
+                    return "failed", f"exit code {returncode}\n{self._log_tail(log_path)}"
+            else:
+                step.action()
+        except Exception as e:
+            return "failed", str(e)
+        
+        missing = [path for path in step.outputs if not os.path.exists(path)]
+        if missing:
+            return "failed", f"did not produce {', '.join(missing)}"
+        
+        with self._state_lock:
+            self.state["steps"][step.name] = {
+                "signature": step.signature(),
+                "inputs": input_hashes,
+                "outputs": {path: file_sha256(path) for path in step.outputs}
+            }
+            # Saved after every step so an interrupted run keeps its progress
+            self._save_state()
+        return "ran", ""
+    
+    @staticmethod
+    def _log_tail(log_path: str, lines: int = 20) -> str:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            return "".join(f.readlines()[-lines:])
+    
+    def _record_trace(self, name: str, started: float, finished: float, status: str):
+        with self._state_lock:
+            lane = self.lanes.setdefault(threading.get_ident(), len(self.lanes) + 1)
+            self.trace.append({
+                "name": name,
+                "cat": "step",
+                "ph": "X",
+                "ts": round((started - self.run_started) * 1e6),
+                "dur": round((finished - started) * 1e6),
+                "pid": 1,
+                "tid": lane,
+                "args": {"status": status}
+            })
+    
+    def _write_trace(self, run_id: str, results: Dict):
+        trace_path = os.path.join(self.log_dir, "trace.json")
+        with open(trace_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "traceEvents": self.trace,
+                "otherData": {
+                    "run_id": run_id,
+                    "wall_seconds": round(time.perf_counter() - self.run_started, 3),
+                    "statuses": {name: status for name, (status, _) in results.items()}
+                }
+            }, f, indent=2)
+        print(f"Timing trace: {trace_path}")
+    
+    def _print_summary(self, results: Dict):
+        durations = {event["name"]: event["dur"] / 1e6 for event in self.trace}
+        print("\nStep summary:")
+        for name in self.order:
+            status, _ = results.get(name, ("not run", ""))
+            timing = f"{durations[name]:8.1f}s" if name in durations else " " * 9
+            print(f"  {name:<24} {status:<10} {timing}")
+        print(f"  {'total':<24} {'':<10} {time.perf_counter() - self.run_started:8.1f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run stage 0, stage 1 and stage 2 as one pipeline")
+    parser.add_argument("--only", action="append", metavar="PATTERN",
+                        help="Run only steps matching this glob (repeatable); other steps count as done")
+    parser.add_argument("--jobs", type=int, default=4, help="Steps run at the same time")
+    parser.add_argument("--force", action="store_true", help="Run steps even if nothing changed")
+    parser.add_argument("--list", action="store_true", help="Show steps and whether they are up to date")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.chdir(PROJECT_DIR)
+    
+    runner = PipelineRunner(build_steps(), jobs=args.jobs, force=args.force, only=args.only)
+    if args.list:
+        runner.describe()
+        return 0
+    return 0 if runner.run() else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
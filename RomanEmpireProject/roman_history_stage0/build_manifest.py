@@ -0,0 +1,67 @@
+import os
+import json
+import hashlib
+
+# 记录第0阶段每个输出文件的输入哈希、处理版本和输出哈希
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stage0_manifest.json")
+
+
+def file_sha256(file_path):
+    """
+    计算文件内容的 SHA-256
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """
+    读取构建清单，不存在或损坏时返回空清单
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"artifacts": {}}
+
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """
+    保存构建清单
+    """
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def artifact_key(output_path):
+    """
+    清单中的键：相对于清单所在目录的输出路径
+    """
+    manifest_dir = os.path.dirname(MANIFEST_PATH)
+    return os.path.relpath(os.path.abspath(output_path), manifest_dir).replace(os.sep, '/')
+
+
+def is_up_to_date(manifest, output_path, input_hash, version):
+    """
+    输入哈希和处理版本与清单一致，且输出文件未被改动时返回 True
+    """
+    entry = manifest["artifacts"].get(artifact_key(output_path))
+    if not entry or not os.path.exists(output_path):
+        return False
+    if entry.get("input_sha256") != input_hash or entry.get("version") != version:
+        return False
+    return entry.get("output_sha256") == file_sha256(output_path)
+
+
+def record_artifact(manifest, output_path, input_hash, version):
+    """
+    记录刚生成的输出文件
+    """
+    manifest["artifacts"][artifact_key(output_path)] = {
+        "input_sha256": input_hash,
+        "version": version,
+        "output_sha256": file_sha256(output_path)
+    }
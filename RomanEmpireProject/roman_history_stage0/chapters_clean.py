@@ -1,168 +1,297 @@
 import re
 import os
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from build_manifest import file_sha256, load_manifest, save_manifest, is_up_to_date, record_artifact
 
-def deep_clean_notes(input_dir="extracted_chapters", output_dir="deep_cleaned_chapters"):
+# 清理逻辑版本，strip_notes 的输出变化时递增以重新生成清理结果
+CLEANER_VERSION = 1
+
+CHAPTER_FILES = [
+    "chapters_IV-VI.txt",
+    "chapters_VI-X.txt", 
+    "chapters_XIII-XIV.txt",
+    "chapters_XIV-XVII.txt"
+]
+
+# 注释起始标记，例如 "      12 (return) [" 或 "1001a (return) ["
+# lead 为注释前包含换行的空白，存在时说明注释独占一段
+NOTE_START_PATTERN = re.compile(r'(?P<lead>\n\s*)?(?P<marker>\d+[a-z]?)\s*\(return\)\s*\[')
+NOTE_BRACKET_PATTERN = re.compile(r'[\[\]]')
+# 注释结束后直到最后一个换行的空白
+NOTE_TRAIL_PATTERN = re.compile(r'\s*\n')
+NOTE_SPACE_PATTERN = re.compile(r'[ \t]*')
+
+REMAINING_NOTE_PATTERN = re.compile(r'\d+[a-z]?\s*\(return\)\s*\[|\[\s*\]')
+
+def deep_clean_notes(input_dir="extracted_chapters", output_dir="deep_cleaned_chapters", input_files=None, workers=1, force=False):
     """
-    深度清理注释，使用多种方法确保彻底清除
+    深度清理注释，每个文件只扫描一遍
+
+    workers 大于 1 时在进程池中并行处理各个文件。
+    输入和清理版本都未变化的文件会被跳过（见 build_manifest）。
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    chapter_files = [
-        "chapters_IV-VI.txt",
-        "chapters_VI-X.txt", 
-        "chapters_XIII-XIV.txt",
-        "chapters_XIV-XVII.txt"
-    ]
+    version = f"strip_notes-{CLEANER_VERSION}"
+    manifest = load_manifest()
+    input_hashes = {}
     
-    for filename in chapter_files:
-        input_path = os.path.join(input_dir, filename)
-        output_path = os.path.join(output_dir, f"deep_cleaned_{filename}")
-        
-        if not os.path.exists(input_path):
-            print(f"警告: 找不到文件 {input_path}")
+    for input_path in resolve_input_files(input_dir, input_files):
+        input_hash = file_sha256(input_path)
+        output_path = os.path.join(output_dir, f"deep_cleaned_{os.path.basename(input_path)}")
+        if not force and is_up_to_date(manifest, output_path, input_hash, version):
+            print(f"跳过（未变化）: {input_path}")
             continue
-            
-        print(f"\n正在深度清理: {filename}")
-        
-        with open(input_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # 方法1: 使用多种正则表达式模式
-        cleaned_content = content
-
-        pattern1 = r'\n\s*\d+\s*\(return\)\s*\[[^\]]*\]\s*\n'
-        pattern2 = r'\n\s*\d+\s*\(return\)\s*\[[\s\S]*?\]\s*\n'
-        pattern3 = r'\d+\s*\(return\)\s*\[[^\]]*\]'
-        pattern4 = r'\n\s*\d+\s*\(return\)\s*\[.*?\]\s*\n'
-        
-        patterns = [pattern1, pattern2, pattern3, pattern4]
-        
-        for i, pattern in enumerate(patterns):
-            matches = re.findall(pattern, cleaned_content, re.DOTALL)
-            if matches:
-                print(f"  使用模式{i+1}找到 {len(matches)} 个注释")
-                cleaned_content = re.sub(pattern, '\n\n', cleaned_content, flags=re.DOTALL)
-        
-
-        cleaned_content = remove_notes_comprehensively(cleaned_content)
-        
-        with open(output_path, 'w', encoding='utf-8') as file:
-            file.write(cleaned_content)
-        
-        print(f"  已保存: {output_path}")
-        
-        remaining_notes = check_remaining_notes(cleaned_content)
-        if remaining_notes:
-            print(f"  警告: 可能仍有 {len(remaining_notes)} 个注释未被完全删除")
-            debug_path = os.path.join(output_dir, f"debug_{filename}")
-            with open(debug_path, 'w', encoding='utf-8') as debug_file:
-                for note in remaining_notes[:5]:  
-                    debug_file.write(f"可能未删除的注释:\n{note}\n\n")
-            print(f"  调试信息已保存: {debug_path}")
+        input_hashes[input_path] = input_hash
+    
+    results = []
     
+    for result in run_file_jobs(clean_note_file, list(input_hashes), workers, output_dir):
+        record_artifact(manifest, result['output'], input_hashes[result['input']], version)
+        print(f"\n已深度清理: {result['file']}")
+        print(f"  删除 {result['removed']} 个注释")
+        print(f"  已保存: {result['output']}")
+        if result['debug']:
+            print(f"  警告: 可能仍有 {result['remaining']} 个注释未被完全删除")
+            print(f"  调试信息已保存: {result['debug']}")
+        results.append(result)
+    
+    save_manifest(manifest)
+    print_timing_summary("清理", results)
     print("\n深度清理完成！")
 
-def remove_notes_comprehensively(content):
+def clean_note_file(input_path, output_dir):
     """
-    使用多种方法综合清理注释
+    清理单个文件的注释并返回处理结果，可在子进程中运行
     """
-    lines = content.split('\n')
-    cleaned_lines = []
-    in_note = False
-    note_start_pattern = r'^\s*\d+\s*\(return\)\s*\['
-
-    for line in lines:
-        if re.match(note_start_pattern, line):
-            in_note = True
-            if ']' in line:
-                in_note = False
-            continue
-        
-        if in_note and ']' in line:
-            in_note = False
+    started = time.perf_counter()
+    filename = os.path.basename(input_path)
+    output_path = os.path.join(output_dir, f"deep_cleaned_{filename}")
+    
+    with open(input_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    
+    cleaned_content, removed, unterminated = strip_notes(content)
+    
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write(cleaned_content)
+    
+    result = {
+        "file": filename,
+        "input": input_path,
+        "output": output_path,
+        "removed": removed,
+        "remaining": 0,
+        "debug": None
+    }
+    
+    # 只有存在未闭合的注释时才需要再检查一遍
+    remaining_notes = check_remaining_notes(cleaned_content) if unterminated else []
+    if remaining_notes:
+        debug_path = os.path.join(output_dir, f"debug_{filename}")
+        with open(debug_path, 'w', encoding='utf-8') as debug_file:
+            for note in remaining_notes[:5]:  
+                debug_file.write(f"可能未删除的注释:\n{note}\n\n")
+        result["remaining"] = len(remaining_notes)
+        result["debug"] = debug_path
+    
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def resolve_input_files(input_dir, input_files=None):
+    """
+    展开输入文件的 glob 模式；未指定时使用 input_dir 下的默认章节文件
+    """
+    if not input_files:
+        input_paths = [os.path.join(input_dir, filename) for filename in CHAPTER_FILES]
+    else:
+        input_paths = []
+        for pattern in input_files:
+            matched = sorted(glob.glob(pattern))
+            if not matched:
+                print(f"警告: 没有匹配的文件 {pattern}")
+            input_paths.extend(path for path in matched if path not in input_paths)
+    
+    existing = []
+    for input_path in input_paths:
+        if os.path.exists(input_path):
+            existing.append(input_path)
+        else:
+            print(f"警告: 找不到文件 {input_path}")
+    return existing
+
+def run_file_jobs(job, input_paths, workers=1, *args):
+    """
+    对每个文件执行 job，workers 大于 1 时使用进程池，按完成顺序返回结果
+    """
+    if workers <= 1 or len(input_paths) <= 1:
+        for input_path in input_paths:
+            yield job(input_path, *args)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(job, input_path, *args) for input_path in input_paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+def print_timing_summary(task_name, results):
+    """
+    打印每个文件的耗时汇总
+    """
+    if not results:
+        return
+    
+    print(f"\n{task_name}耗时汇总:")
+    for result in sorted(results, key=lambda r: r["file"]):
+        print(f"  {result['file']}: {result['seconds']:.3f} 秒")
+    print(f"  合计: {sum(r['seconds'] for r in results):.3f} 秒 ({len(results)} 个文件)")
+
+def strip_notes(content):
+    """
+    单次线性扫描删除全部注释（包括跨行和含嵌套方括号的注释）
+
+    注释从 "数字 (return) [" 开始，到方括号配平处结束。
+    独占一段的注释连同前后的空白替换为一个空行，连续的注释合并处理；
+    行内注释直接删除。返回 (清理后的文本, 删除数量, 未闭合数量)。
+    """
+    parts = []
+    pos = 0
+    removed = 0
+    unterminated = 0
+    # 上一个独占一段的注释替换后的结束位置，用于合并连续注释
+    block_end = -1
+
+    while True:
+        match = NOTE_START_PATTERN.search(content, pos)
+        if not match:
+            break
+
+        close = find_note_end(content, match.end())
+        if close is None:
+            unterminated += 1
+            parts.append(content[pos:match.end()])
+            pos = match.end()
             continue
-        
-        if in_note:
+
+        removed += 1
+        start = match.start()
+        gap = content[pos:match.start('marker')]
+        chained = pos == block_end and not gap.strip()
+
+        if not (chained or match.group('lead')):
+            parts.append(content[pos:start])
+            pos = close
             continue
-        
-        if re.search(r'\d+\s*\(return\)\s*\[', line) and ']' in line:
-            line = re.sub(r'\d+\s*\(return\)\s*\[.*?\]', '', line)
-        
-        cleaned_lines.append(line)
-    
-    return '\n'.join(cleaned_lines)
+
+        if not chained:
+            parts.append(content[pos:start])
+            parts.append('\n\n')
+
+        trail = NOTE_TRAIL_PATTERN.match(content, close)
+        if trail:
+            pos = trail.end()
+            block_end = pos
+        else:
+            # 注释后同一行还有正文：保留该行缩进
+            parts.append(gap[gap.rfind('\n') + 1:])
+            pos = NOTE_SPACE_PATTERN.match(content, close).end()
+
+    parts.append(content[pos:])
+    return ''.join(parts), removed, unterminated
+
+def find_note_end(content, pos):
+    """
+    从注释左方括号之后开始，返回配平的右方括号之后的位置
+    """
+    depth = 1
+    for bracket in NOTE_BRACKET_PATTERN.finditer(content, pos):
+        depth += 1 if bracket.group() == '[' else -1
+        if depth == 0:
+            return bracket.end()
+    return None
 
 def check_remaining_notes(content):
     """
     检查是否还有注释残留
     """
-    patterns = [
-        r'\d+\s*\(return\)\s*\[',
-        r'^\s*\d+\s*\(return\)\s*\[',
-        r'\[\s*\]' 
-    ]
-    
     remaining = []
     lines = content.split('\n')
     
     for i, line in enumerate(lines):
-        for pattern in patterns:
-            if re.search(pattern, line):
-                start = max(0, i-2)
-                end = min(len(lines), i+3)
-                context = '\n'.join(lines[start:end])
-                remaining.append(context)
-                break 
+        if REMAINING_NOTE_PATTERN.search(line):
+            start = max(0, i-2)
+            end = min(len(lines), i+3)
+            context = '\n'.join(lines[start:end])
+            remaining.append(context)
     
     return remaining
 
-def analyze_note_patterns(input_dir="extracted_chapters"):
+def analyze_note_patterns(input_dir="extracted_chapters", input_files=None, workers=1):
     """
     分析注释模式，帮助我们理解为什么有些注释没被删除
     """
-    chapter_files = [
-        "chapters_IV-VI.txt",
-        "chapters_VI-X.txt", 
-        "chapters_XIII-XIV.txt",
-        "chapters_XIV-XVII.txt"
+    input_paths = resolve_input_files(input_dir, input_files)
+    results = []
+    
+    for result in run_file_jobs(analyze_note_file, input_paths, workers):
+        print(f"\n分析 {result['file']} 中的注释模式:")
+        for line in result["report"]:
+            print(line)
+        results.append(result)
+    
+    print_timing_summary("分析", results)
+
+def analyze_note_file(input_path):
+    """
+    分析单个文件的注释模式并返回报告，可在子进程中运行
+    """
+    started = time.perf_counter()
+    report = []
+    
+    with open(input_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    
+    note_patterns = [
+        r'\n\s*(\d+)\s*\(return\)\s*\[[^\]]*\]\s*\n',
+        r'\n\s*(\d+)\s*\(return\)\s*\[[\s\S]*?\]\s*\n',
+        r'(\d+)\s*\(return\)\s*\[[^\]]*\]',
     ]
     
-    for filename in chapter_files:
-        input_path = os.path.join(input_dir, filename)
-        
-        if not os.path.exists(input_path):
-            continue
-            
-        print(f"\n分析 {filename} 中的注释模式:")
-        
-        with open(input_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        note_patterns = [
-            r'\n\s*(\d+)\s*\(return\)\s*\[[^\]]*\]\s*\n',
-            r'\n\s*(\d+)\s*\(return\)\s*\[[\s\S]*?\]\s*\n',
-            r'(\d+)\s*\(return\)\s*\[[^\]]*\]',
-        ]
-        
-        for pattern in note_patterns:
-            matches = re.findall(pattern, content, re.DOTALL)
-            if matches:
-                print(f"  模式 '{pattern[:30]}...' 找到 {len(matches)} 个匹配")
-                if matches:
-                    print(f"    示例: {matches[0] if isinstance(matches[0], str) else matches[0][0]}")
-        
-        unusual_patterns = [
-            r'\(\s*return\s*\)', 
-            r'\(\s*return\)',    
-            r'\(return\s*\)',   
-        ]
-        
-        for pattern in unusual_patterns:
-            matches = re.findall(pattern, content)
-            if matches:
-                print(f"  异常格式 '{pattern}' 找到 {len(matches)} 个匹配")
+    for pattern in note_patterns:
+        matches = re.findall(pattern, content, re.DOTALL)
+        if matches:
+            report.append(f"  模式 '{pattern[:30]}...' 找到 {len(matches)} 个匹配")
+            report.append(f"    示例: {matches[0] if isinstance(matches[0], str) else matches[0][0]}")
+    
+    unusual_patterns = [
+        r'\(\s*return\s*\)', 
+        r'\(\s*return\)',    
+        r'\(return\s*\)',   
+    ]
+    
+    for pattern in unusual_patterns:
+        matches = re.findall(pattern, content)
+        if matches:
+            report.append(f"  异常格式 '{pattern}' 找到 {len(matches)} 个匹配")
+    
+    return {
+        "file": os.path.basename(input_path),
+        "report": report,
+        "seconds": time.perf_counter() - started
+    }
 
 if __name__ == "__main__":
-    analyze_note_patterns()
-    deep_clean_notes()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="分析并深度清理章节文件中的注释")
+    parser.add_argument("files", nargs="*",
+                        help="输入文件的 glob 模式，默认处理 extracted_chapters 下的四个章节文件")
+    parser.add_argument("--workers", type=int, default=1, help="并行处理的进程数")
+    parser.add_argument("--output-dir", default="deep_cleaned_chapters", help="清理结果的输出目录")
+    parser.add_argument("--force", action="store_true", help="忽略构建清单，重新清理所有文件")
+    args = parser.parse_args()
+    
+    analyze_note_patterns(input_files=args.files, workers=args.workers)
+    deep_clean_notes(output_dir=args.output_dir, input_files=args.files, workers=args.workers, force=args.force)
\ No newline at end of file
@@ -1,81 +1,287 @@
 import re
 import os
+import bisect
+import json
+import hashlib
+from build_manifest import file_sha256, load_manifest, save_manifest, is_up_to_date, record_artifact
 
-def extract_chapter_ranges(input_file_path, output_dir="extracted_chapters"):
+# 章节标题行，例如 "Chapter IV: The Cruelty, Follies And Murder Of Commodus.—Part I."
+CHAPTER_HEADING_PATTERN = re.compile(
+    rb'^\s*(?:CHAPTER|Chapter)\s+([IVXLCDM]+)\b[:.]?\s*(.*?)\s*$'
+)
+
+# (输出名称, 起始章节, 结束章节)，结束章节包含在内
+DEFAULT_CHAPTER_RANGES = [
+    ('IV-VI', 'IV', 'VI'),
+    ('VI-X', 'VI', 'X'),
+    ('XIII-XIV', 'XIII', 'XIV'),
+    ('XIV-XVII', 'XIV', 'XVII')
+]
+
+# 章节标题最多占用的行数（较长的标题会换行）
+HEADING_MAX_LINES = 3
+
+# 章节索引格式版本，格式变化时递增以使旧的索引失效
+CHAPTER_INDEX_VERSION = 2
+# 提取逻辑版本，输出格式变化时递增以重新生成章节文件
+EXTRACTOR_VERSION = 1
+
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+
+
+def roman_to_int(numeral):
+    """
+    罗马数字转换为整数
+    """
+    total = 0
+    previous = 0
+    for char in reversed(numeral.upper()):
+        value = ROMAN_VALUES[char]
+        if value < previous:
+            total -= value
+        else:
+            total += value
+            previous = value
+    return total
+
+
+def build_chapter_index(input_file_path):
+    """
+    单次流式扫描源文件，建立章节字节偏移索引
+
+    按行读取二进制内容，只把符合标题上下文的行当作章节标题：
+    前面是空行（或文件开头），标题最多占 HEADING_MAX_LINES 行，之后是空行，
+    再之后是正文而不是另一个章节标题。目录条目和段落中的 "Chapter XV" 引用因此被排除。
+    剩余标题中取章节编号不下降的最长序列，每个章节记录其第一次出现的位置，
+    个别乱序的标题只会被跳过，而不会截断索引。
+    """
+    headings = []
+    encoding = 'utf-8'
+    offset = 0
+    previous_blank = True
+    pending = None
+    digest = hashlib.sha256()
+
+    with open(input_file_path, 'rb') as file:
+        for line in file:
+            digest.update(line)
+            if encoding == 'utf-8':
+                try:
+                    line.decode('utf-8')
+                except UnicodeDecodeError:
+                    encoding = 'latin-1'
+
+            blank = not line.strip()
+            if pending is not None:
+                if not pending['gap']:
+                    if blank:
+                        pending['gap'] = True
+                    else:
+                        pending['lines'] += 1
+                        if pending['lines'] > HEADING_MAX_LINES:
+                            pending = None
+                elif not blank:
+                    if not CHAPTER_HEADING_PATTERN.match(line):
+                        headings.append(pending['heading'])
+                    pending = None
+
+            match = CHAPTER_HEADING_PATTERN.match(line)
+            if match and previous_blank:
+                numeral = match.group(1).decode('ascii')
+                pending = {
+                    'heading': {
+                        'numeral': numeral,
+                        'number': roman_to_int(numeral),
+                        'title': match.group(2),
+                        'start': offset,
+                        'end': None
+                    },
+                    'lines': 1,
+                    'gap': False
+                }
+
+            previous_blank = blank
+            offset += len(line)
+
+    chapters = []
+    for heading in longest_chapter_sequence(headings):
+        if chapters and chapters[-1]['number'] == heading['number']:
+            continue
+        if chapters:
+            chapters[-1]['end'] = heading['start']
+        chapters.append(heading)
+
+    if chapters:
+        chapters[-1]['end'] = offset
+
+    # 标题在确定编码后再解码
+    for chapter in chapters:
+        chapter['title'] = chapter['title'].decode(encoding)
+
+    return {
+        'encoding': encoding,
+        'size': offset,
+        'sha256': digest.hexdigest(),
+        'chapters': chapters
+    }
+
+
+def longest_chapter_sequence(headings):
+    """
+    按出现顺序，取章节编号不下降的最长标题序列（同一章节的各 Part 可以重复）
+    """
+    tails = []
+    tail_indices = []
+    previous = [None] * len(headings)
+    for i, heading in enumerate(headings):
+        position = bisect.bisect_right(tails, heading['number'])
+        if position > 0:
+            previous[i] = tail_indices[position - 1]
+        if position == len(tails):
+            tails.append(heading['number'])
+            tail_indices.append(i)
+        else:
+            tails[position] = heading['number']
+            tail_indices[position] = i
+
+    sequence = []
+    i = tail_indices[-1] if tail_indices else None
+    while i is not None:
+        sequence.append(headings[i])
+        i = previous[i]
+    return sequence[::-1]
+
+
+def load_chapter_index(input_file_path, index_path=None):
+    """
+    读取或重建章节索引（源文件旁的 .chapters.json）
+
+    索引以源文件的大小、修改时间和内容哈希为键：
+    大小和修改时间都未变时直接使用；只有修改时间变化时比较哈希，
+    内容相同则沿用旧索引并刷新修改时间；否则重新扫描源文件。
+    """
+    if index_path is None:
+        index_path = f"{input_file_path}.chapters.json"
+
+    stat = os.stat(input_file_path)
+    cached = None
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r', encoding='utf-8') as file:
+                cached = json.load(file)
+        except (json.JSONDecodeError, OSError):
+            cached = None
+
+    if cached and cached.get('version') == CHAPTER_INDEX_VERSION and cached.get('size') == stat.st_size:
+        if cached.get('mtime_ns') == stat.st_mtime_ns:
+            return cached
+        if cached.get('sha256') == file_sha256(input_file_path):
+            cached['mtime_ns'] = stat.st_mtime_ns
+            save_chapter_index(cached, index_path)
+            return cached
+
+    print(f"正在建立章节索引: {input_file_path}")
+    index = build_chapter_index(input_file_path)
+    index['version'] = CHAPTER_INDEX_VERSION
+    index['mtime_ns'] = stat.st_mtime_ns
+    save_chapter_index(index, index_path)
+    return index
+
+
+def save_chapter_index(index, index_path):
+    """
+    保存章节索引
+    """
+    with open(index_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, indent=2)
+
+
+def read_chapter_span(input_file_path, index, start_chapter, end_chapter):
+    """
+    根据索引读取从起始章节到结束章节（包含）的文本
+    """
+    by_numeral = {chapter['numeral']: chapter for chapter in index['chapters']}
+    start = by_numeral.get(start_chapter.upper())
+    end = by_numeral.get(end_chapter.upper())
+    if start is None or end is None or end['end'] < start['start']:
+        return None
+
+    with open(input_file_path, 'rb') as file:
+        file.seek(start['start'])
+        data = file.read(end['end'] - start['start'])
+
+    # 与文本模式读取保持一致：统一换行符
+    return data.decode(index['encoding']).replace('\r\n', '\n').replace('\r', '\n')
+
+
+def extract_chapter_ranges(input_file_path, output_dir="extracted_chapters", chapter_ranges=None, force=False):
     """
     提取指定章节范围的所有内容
+
+    章节索引缓存在源文件旁，之后每个范围直接按字节偏移读取。
+    源文件和提取逻辑都未变化的范围会被跳过（见 build_manifest）。
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-    except UnicodeDecodeError:
-        with open(input_file_path, 'r', encoding='latin-1') as file:
-            content = file.read()
-    
-    chapter_ranges = [
-        ('IV-VI', 'CHAPTER IV', 'CHAPTER VII'),  
-        ('VI-X', 'CHAPTER VI', 'CHAPTER XI'),    
-        ('XIII-XIV', 'CHAPTER XIII', 'CHAPTER XV'), 
-        ('XIV-XVII', 'CHAPTER XIV', 'CHAPTER XVIII') 
-    ]
-    
+
+    if chapter_ranges is None:
+        chapter_ranges = DEFAULT_CHAPTER_RANGES
+
+    index = load_chapter_index(input_file_path)
+    print(f"索引完成: 找到 {len(index['chapters'])} 个章节 (编码: {index['encoding']})")
+
+    manifest = load_manifest()
+
     for range_name, start_chapter, end_chapter in chapter_ranges:
+        output_filename = f"{output_dir}/chapters_{range_name}.txt"
+        version = f"extract-{EXTRACTOR_VERSION}:{start_chapter.upper()}-{end_chapter.upper()}"
+        if not force and is_up_to_date(manifest, output_filename, index['sha256'], version):
+            print(f"跳过 {range_name} 章节（未变化）")
+            continue
+
         print(f"正在提取 {range_name} 章节...")
-        
-        # 构建正则表达式模式
-        pattern = f"{re.escape(start_chapter)}.*?{re.escape(end_chapter)}"
-        match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-        
-        if match:
-            extracted_content = match.group(0)
-            
+
+        extracted_content = read_chapter_span(input_file_path, index, start_chapter, end_chapter)
+
+        if extracted_content is not None:
             # 保存到文件
-            output_filename = f"{output_dir}/chapters_{range_name}.txt"
             with open(output_filename, 'w', encoding='utf-8') as output_file:
                 output_file.write(extracted_content)
-            
+            record_artifact(manifest, output_filename, index['sha256'], version)
+
             print(f"成功保存: {output_filename}")
             print(f"提取内容长度: {len(extracted_content)} 字符")
         else:
             print(f"警告: 未找到 {range_name} 章节")
-    
+
+    save_manifest(manifest)
     print("\n所有章节提取完成！")
 
 def find_all_chapter_titles(input_file_path):
     """
     查找并打印所有章节标题，用于调试
     """
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-    except UnicodeDecodeError:
-        with open(input_file_path, 'r', encoding='latin-1') as file:
-            content = file.read()
-    
-    # 查找所有章节标题
-    chapter_pattern = r'CHAPTER\s+[IVXLCDM]+'
-    chapters = re.findall(chapter_pattern, content, re.IGNORECASE)
-    
+    index = load_chapter_index(input_file_path)
+    chapters = index['chapters']
+
     print(f"在文件中找到 {len(chapters)} 个章节标题:")
     for i, chapter in enumerate(chapters):
-        print(f"  {i+1}. {chapter}")
+        print(f"  {i+1}. CHAPTER {chapter['numeral']}: {chapter['title']} "
+              f"(字节 {chapter['start']}-{chapter['end']})")
 
 # 使用方法
 if __name__ == "__main__":
     input_file = "decline_fall_full.txt"  # 您的文件路径
-    
+
     if os.path.exists(input_file):
         print("文件找到，开始提取章节...")
-        
+
         # 可选：先查看所有章节标题，确认格式
         # find_all_chapter_titles(input_file)
-        
+
         # 提取章节范围
         extract_chapter_ranges(input_file)
-        
+
     else:
         print(f"错误: 找不到文件 {input_file}")
         print("请确保文件路径正确")
\ No newline at end of file
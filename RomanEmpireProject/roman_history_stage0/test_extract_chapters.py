@@ -0,0 +1,56 @@
+from extract_chapters import build_chapter_index
+
+# 目录、段落中对其他章节的引用、换行的标题和分为多个 Part 的章节
+SOURCE = """Contents
+
+Chapter I: The Extent Of The Empire.
+Chapter II: The Union And Internal Prosperity.
+Chapter III: The Constitution In The Age Of The Antonines.
+Chapter XV: The Progress Of The Christian Religion.
+
+
+Chapter I: The Extent Of The Empire.—Part I.
+
+
+The Extent And Military Force Of The Empire In The Age Of The Antonines.
+
+In the second century of the Christian Æra, the empire of Rome comprehended
+the fairest part of the earth. The reader will find the sequel in
+Chapter XV
+of this history, where the progress of the new religion is related.
+
+
+Chapter I: The Extent Of The Empire.—Part II.
+
+
+The Romans were not ignorant of the advantages of a naval power.
+
+
+Chapter II: The Union And Internal Prosperity Of The Roman Empire, In The
+Age Of The Antonines.—Part I.
+
+
+Of The Union And Internal Prosperity Of The Roman Empire.
+
+
+Chapter III: The Constitution In The Age Of The Antonines.
+
+
+Of The Constitution Of The Roman Empire.
+"""
+
+
+def test_headings_are_validated_by_line_context(tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_bytes(SOURCE.encode('utf-8'))
+    data = SOURCE.encode('utf-8')
+
+    index = build_chapter_index(str(source))
+
+    chapters = index['chapters']
+    assert [chapter['numeral'] for chapter in chapters] == ['I', 'II', 'III']
+    assert chapters[0]['start'] == data.index(b"Chapter I: The Extent Of The Empire.\xe2\x80\x94Part I.")
+    assert chapters[1]['start'] == data.index(b"Chapter II: The Union And Internal Prosperity Of")
+    assert chapters[2]['start'] == data.index(b"Chapter III: The Constitution In The Age Of The Antonines.\n\n\n")
+    assert chapters[0]['end'] == chapters[1]['start']
+    assert chapters[2]['end'] == len(data)
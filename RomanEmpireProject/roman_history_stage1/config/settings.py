@@ -9,6 +9,56 @@ AI_API_KEY = os.getenv('AI_API_KEY', 'your-api-key-here')
 AI_BASE_URL = os.getenv('AI_BASE_URL', 'https://api.openai.com/v1')
 AI_MODEL = os.getenv('AI_MODEL', 'gpt-4')
 
+# HTTP Connection Pool
+AI_HTTP_POOL_SIZE = int(os.getenv('AI_HTTP_POOL_SIZE', '16'))
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', '10'))
+AI_HTTP_READ_TIMEOUT = float(os.getenv('AI_HTTP_READ_TIMEOUT', '60'))
+AI_HTTP_CONNECT_RETRIES = int(os.getenv('AI_HTTP_CONNECT_RETRIES', '2'))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '3'))
+
+# Provider Rate Limits (0 disables pacing); headroom keeps us just under them
+AI_RATE_LIMIT_RPM = float(os.getenv('AI_RATE_LIMIT_RPM', '0'))
+AI_RATE_LIMIT_TPM = float(os.getenv('AI_RATE_LIMIT_TPM', '0'))
+AI_RATE_LIMIT_HEADROOM = float(os.getenv('AI_RATE_LIMIT_HEADROOM', '0.9'))
+
+# Offline Batch Mode (OpenAI-compatible /batches endpoint)
+AI_BATCH_MODE = os.getenv('AI_BATCH_MODE', '0') == '1'
+AI_BATCH_BASE_URL = os.getenv('AI_BATCH_BASE_URL', AI_BASE_URL)
+AI_BATCH_POLL_SECONDS = float(os.getenv('AI_BATCH_POLL_SECONDS', '30'))
+AI_BATCH_COMPLETION_WINDOW = os.getenv('AI_BATCH_COMPLETION_WINDOW', '24h')
+AI_BATCH_DIR = os.getenv('AI_BATCH_DIR', 'roman_history_stage1/data/batches')
+
+# Completion Cache
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', '1') != '0'
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', 'roman_history_stage1/data/cache/completions.sqlite3')
+AI_CACHE_MAX_MB = int(os.getenv('AI_CACHE_MAX_MB', '200'))
+AI_CACHE_MAX_AGE_DAYS = float(os.getenv('AI_CACHE_MAX_AGE_DAYS', '30'))
+
+# Tokenizer (encoding follows AI_MODEL unless TOKENIZER_ENCODING is set; the BPE file
+# is cached in TOKENIZER_CACHE_DIR so it can be pre-warmed or committed for offline runs)
+TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', '')
+TOKENIZER_CACHE_DIR = os.getenv('TOKENIZER_CACHE_DIR', 'roman_history_stage1/data/tiktoken')
+
+# Chunking (token budgets per chunk and tokens shared between consecutive chunks)
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '12000'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '0'))
+
+# Cross-stage chunk dedup (MinHash similarity at or above the threshold reuses a summary)
+CHUNK_DEDUP_ENABLED = os.getenv('CHUNK_DEDUP_ENABLED', '1') != '0'
+CHUNK_DEDUP_THRESHOLD = float(os.getenv('CHUNK_DEDUP_THRESHOLD', '0.8'))
+
+# Concurrency
+CHUNK_MAX_CONCURRENCY = int(os.getenv('CHUNK_MAX_CONCURRENCY', '4'))
+
+# Final summary reduction: chunk summaries are condensed in groups of up to FAN_IN
+# (at most MAX_DEPTH levels) until they fit TOKEN_BUDGET tokens in the final prompt
+SUMMARY_REDUCE_FAN_IN = int(os.getenv('SUMMARY_REDUCE_FAN_IN', '8'))
+SUMMARY_REDUCE_MAX_DEPTH = int(os.getenv('SUMMARY_REDUCE_MAX_DEPTH', '3'))
+SUMMARY_REDUCE_CONCURRENCY = int(os.getenv('SUMMARY_REDUCE_CONCURRENCY', str(CHUNK_MAX_CONCURRENCY)))
+SUMMARY_REDUCE_TOKEN_BUDGET = int(os.getenv('SUMMARY_REDUCE_TOKEN_BUDGET', '12000'))
+# Requests in flight across all stages at once
+AI_MAX_CONCURRENT_REQUESTS = int(os.getenv('AI_MAX_CONCURRENT_REQUESTS', '8'))
+
 # Project Constants
 HISTORY_START_YEAR = 180
 HISTORY_END_YEAR = 337
@@ -1,23 +1,57 @@
 # main.py
 import os
 import sys
+import argparse
 from src.stage_summarizer import StageSummarizer
 from src.theme_analyzer import ThemeAnalyzer
-from src.utils import create_timestamp, save_json
+from src.tokenizer import warm_encoding
+from src.utils import create_timestamp, save_json, load_json
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stage summaries and theme extraction")
+    parser.add_argument("--themes-only", action="store_true",
+                        help="Skip stage summarization and extract themes from the saved stage summaries")
+    parser.add_argument("--stage", action="append", dest="stages", metavar="STAGE_KEY",
+                        help="Only summarize this stage (repeatable) and exit; used by pipeline.py")
+    parser.add_argument("--combine-stages", action="store_true",
+                        help="Build all_stages_summary.json from the saved per-stage summaries, then extract themes")
+    parser.add_argument("--output", help="Final report path (default: outputs/final_analysis_<timestamp>.json)")
+    parser.add_argument("--warm-tokenizer", action="store_true",
+                        help="Download the tokenizer BPE file into TOKENIZER_CACHE_DIR and exit")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    
+    if args.warm_tokenizer:
+        print(f"Tokenizer ready: {warm_encoding()}")
+        return 0
+    
     print("=== Roman Empire Historical Analysis - Stage Summaries and Theme Extraction ===")
     
-    os.makedirs("data/summaries", exist_ok=True)
+    os.makedirs("roman_history_stage1/data/summaries", exist_ok=True)
+    
+    if args.stages:
+        print(f"Generating Stage Summaries: {', '.join(args.stages)}")
+        stage_summaries = StageSummarizer().summarize_all_stages(stage_keys=args.stages)
+        failed = stage_summaries['metadata']['failed_stages']
+        return 1 if failed else 0
     
     # 1. Stage Summarization
-    print("Step 1: Generating Stage Summaries")
-    summarizer = StageSummarizer()
-    stage_summaries = summarizer.summarize_all_stages()
+    if args.themes_only:
+        print("Step 1: Loading Saved Stage Summaries")
+        stage_summaries = load_json("roman_history_stage1/data/summaries/all_stages_summary.json")
+    elif args.combine_stages:
+        print("Step 1: Combining Saved Stage Summaries")
+        stage_summaries = StageSummarizer().combine_saved_stages()
+    else:
+        print("Step 1: Generating Stage Summaries")
+        summarizer = StageSummarizer()
+        stage_summaries = summarizer.summarize_all_stages()
     
-    if not stage_summaries:
+    if not stage_summaries or not stage_summaries['stages']:
         print("Stage summarization failed, exiting")
-        return
+        return 1
     
     print(f"Successfully summarized {len(stage_summaries['stages'])} stages")
     
@@ -45,13 +79,17 @@ def main():
         "core_themes": core_themes
     }
     
-    save_json(final_report, f"roman_history_stage1/outputs/final_analysis_{create_timestamp()}.json")
+    save_json(final_report, args.output or f"roman_history_stage1/outputs/final_analysis_{create_timestamp()}.json")
     
     print("\n=== Analysis Complete ===")
     print("Output Files:")
     print("- Stage summaries: data/summaries/")
     print("- Core themes: data/summaries/core_themes.json")
     print("- Full report: outputs/final_analysis_*.json")
+    
+    if theme_analyzer.ai_client.cache is not None:
+        print(f"Completion cache: {theme_analyzer.ai_client.cache.stats()}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,125 @@
+# src/batch_client.py
+import json
+import os
+import time
+import uuid
+from typing import Dict
+from config.settings import (
+    AI_BATCH_BASE_URL, AI_BATCH_POLL_SECONDS, AI_BATCH_COMPLETION_WINDOW, AI_BATCH_DIR
+)
+from src.utils import create_timestamp
+
+# Batch states after which polling stops
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+class BatchClient:
+    """
+    OpenAI-compatible Batch API client: writes prompts as a JSONL batch file,
+    uploads it, polls until the batch finishes and returns completions by custom_id.
+    Point AI_BATCH_BASE_URL at a local stand-in server to test without a provider.
+    """
+
+    def __init__(self, session, model: str, temperature: float, max_tokens: int):
+        self.session = session
+        self.base_url = AI_BATCH_BASE_URL
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.poll_seconds = AI_BATCH_POLL_SECONDS
+
+    def write_batch_file(self, prompts: Dict[str, str], name: str) -> str:
+        """Write one chat/completions request per prompt"""
+        os.makedirs(AI_BATCH_DIR, exist_ok=True)
+        # Concurrent batches can share a name and second, so add a short unique suffix
+        path = os.path.join(AI_BATCH_DIR, f"{name}_{create_timestamp()}_{uuid.uuid4().hex[:6]}.jsonl")
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for custom_id, prompt in prompts.items():
+                request = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": self.temperature,
+                        "max_tokens": self.max_tokens
+                    }
+                }
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        print(f"Batch file written: {path} ({len(prompts)} requests)")
+        return path
+
+    def submit(self, path: str) -> str:
+        """Upload the batch file and create the batch, returning its id"""
+        with open(path, 'rb') as f:
+            upload = self.session.post(
+                f"{self.base_url}/files",
+                data={"purpose": "batch"},
+                files={"file": (os.path.basename(path), f, "application/jsonl")},
+                # Let requests set the multipart content type
+                headers={"Content-Type": None},
+                timeout=300
+            )
+        upload.raise_for_status()
+
+        batch = self.session.post(
+            f"{self.base_url}/batches",
+            json={
+                "input_file_id": upload.json()["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": AI_BATCH_COMPLETION_WINDOW
+            },
+            timeout=60
+        )
+        batch.raise_for_status()
+        return batch.json()["id"]
+
+    def wait(self, batch_id: str) -> Dict:
+        """Poll the batch until it reaches a final status"""
+        while True:
+            response = self.session.get(f"{self.base_url}/batches/{batch_id}", timeout=60)
+            response.raise_for_status()
+            batch = response.json()
+
+            counts = batch.get("request_counts", {})
+            print(f"Batch {batch_id}: {batch['status']} "
+                  f"({counts.get('completed', 0)}/{counts.get('total', '?')} completed)")
+
+            if batch["status"] in BATCH_FINAL_STATUSES:
+                return batch
+            time.sleep(self.poll_seconds)
+
+    def download_results(self, batch: Dict) -> Dict[str, str]:
+        """Return completion content by custom_id; failed requests are reported and left out"""
+        results = {}
+        if not batch.get("output_file_id"):
+            return results
+
+        response = self.session.get(f"{self.base_url}/files/{batch['output_file_id']}/content", timeout=300)
+        response.raise_for_status()
+
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = (record.get("response") or {}).get("body") or {}
+            if record.get("error") or not body.get("choices"):
+                print(f"Batch request {record.get('custom_id')} failed: {record.get('error') or body}")
+                continue
+            results[record["custom_id"]] = body["choices"][0]["message"]["content"]
+
+        return results
+
+    def run(self, prompts: Dict[str, str], name: str = "batch") -> Dict[str, str]:
+        """Submit prompts as one batch and block until their completions are available"""
+        path = self.write_batch_file(prompts, name)
+        batch_id = self.submit(path)
+        print(f"Submitted batch {batch_id}")
+
+        batch = self.wait(batch_id)
+        if batch["status"] != "completed":
+            raise Exception(f"Batch {batch_id} ended with status {batch['status']}")
+
+        return self.download_results(batch)
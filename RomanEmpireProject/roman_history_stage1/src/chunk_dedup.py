@@ -0,0 +1,105 @@
+# src/chunk_dedup.py
+import hashlib
+import re
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+WORD_PATTERN = re.compile(r'\w+')
+
+def chunk_shingles(text: str, size: int = 5) -> set:
+    """64-bit hashes of the lower-cased word n-grams in text"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        words = words + [''] * (size - len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=8).digest(), 'big')
+        for i in range(len(words) - size + 1)
+    }
+
+def minhash_signature(shingles: set, size: int = 128) -> Tuple[int, ...]:
+    """Bottom-k MinHash: the `size` smallest shingle hashes"""
+    return tuple(sorted(shingles)[:size])
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...], size: int = 128) -> float:
+    """Estimated Jaccard similarity of two bottom-k signatures"""
+    if not a or not b:
+        return 0.0
+    union = sorted(set(a) | set(b))[:size]
+    both = set(a) & set(b)
+    return sum(1 for h in union if h in both) / len(union)
+
+class SharedChunk:
+    """A chunk summarized once; other stages wait on its future for the summary"""
+
+    def __init__(self, stage_key: str, chunk_index: int, chunk_hash: str, signature: Tuple[int, ...]):
+        self.stage_key = stage_key
+        self.chunk_index = chunk_index
+        self.chunk_hash = chunk_hash
+        self.signature = signature
+        self.future = Future()
+
+class ChunkDedupIndex:
+    """
+    Cross-stage index of chunk texts, so overlapping chapter ranges are summarized once.
+
+    claim() matches a chunk against chunks of other stages, first by exact hash and
+    then by MinHash similarity of word shingles. The first stage to claim a chunk
+    owns it and resolves it with its summary; later stages reuse that summary.
+    Claims are made when a chunk's task starts, so an owner is always running.
+    """
+
+    def __init__(self, threshold: float = 0.8, shingle_size: int = 5, signature_size: int = 128):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.signature_size = signature_size
+        self._by_hash: Dict[str, List[SharedChunk]] = {}
+        self._entries: List[SharedChunk] = []
+        self._lock = threading.Lock()
+
+    def claim(self, stage_key: str, chunk_index: int, chunk_hash: str, text: str) -> Tuple[SharedChunk, float, bool]:
+        """
+        Return (entry, similarity, owner). When owner is True the caller must
+        resolve() or release() the entry; otherwise entry.future yields the summary.
+        """
+        signature = minhash_signature(chunk_shingles(text, self.shingle_size), self.signature_size)
+
+        with self._lock:
+            match = self._match(stage_key, chunk_hash, signature)
+            if match is not None:
+                return match[0], match[1], False
+
+            entry = SharedChunk(stage_key, chunk_index, chunk_hash, signature)
+            self._by_hash.setdefault(chunk_hash, []).append(entry)
+            self._entries.append(entry)
+            return entry, 1.0, True
+
+    def add_summary(self, stage_key: str, chunk_index: int, chunk_hash: str, text: str, summary: str):
+        """Register a chunk that is already summarized (e.g. from a checkpoint)"""
+        entry, _, owner = self.claim(stage_key, chunk_index, chunk_hash, text)
+        if owner:
+            self.resolve(entry, summary)
+
+    def resolve(self, entry: SharedChunk, summary: str):
+        entry.future.set_result(summary)
+
+    def release(self, entry: SharedChunk, error: Exception):
+        """Drop an entry whose summary failed; waiting stages fall back to their own request"""
+        with self._lock:
+            self._by_hash[entry.chunk_hash].remove(entry)
+            self._entries.remove(entry)
+        entry.future.set_exception(error)
+
+    def _match(self, stage_key: str, chunk_hash: str, signature: Tuple[int, ...]) -> Optional[Tuple[SharedChunk, float]]:
+        for entry in self._by_hash.get(chunk_hash, []):
+            if entry.stage_key != stage_key:
+                return entry, 1.0
+
+        best = None
+        for entry in self._entries:
+            if entry.stage_key == stage_key:
+                continue
+            similarity = estimate_similarity(signature, entry.signature, self.signature_size)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (entry, similarity)
+        return best
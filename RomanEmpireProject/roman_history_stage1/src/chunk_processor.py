@@ -1,66 +1,165 @@
 # src/chunk_processor.py
-import tiktoken
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Tuple
+from config.settings import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from src.stage_text import StageText, StageChunk
+from src.tokenizer import get_encoding
+
+# Break points, as the byte position where the next piece starts
+PARAGRAPH_BREAK_PATTERN = re.compile(rb'\n\s*\n')
+SENTENCE_BREAK_PATTERN = re.compile(rb'[.!?]["\')\]]*(?=\s)')
+WHITESPACE_BYTES = b' \t\r\n\x0b\x0c'
+
+# Chapter heading lines ("Chapter VI: ...—Part II."); chunks never cross into a new chapter
+CHAPTER_HEADING_PATTERN = re.compile(rb'^[ \t]*Chapter ([IVXLCDM]+)\b', re.MULTILINE)
+
+# Source bytes encoded at a time, in chunk budgets of roughly 4 bytes per token
+SPLIT_WINDOW_CHUNKS = 8
 
 class ChunkProcessor:
-    def __init__(self, max_tokens=12000):
+    def __init__(self, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
         self.max_tokens = max_tokens
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.overlap_tokens = overlap_tokens
+    
+    @property
+    def encoding(self):
+        """Shared encoder for AI_MODEL, loaded the first time text is counted or split"""
+        return get_encoding()
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
         return len(self.encoding.encode(text))
     
-    def split_text(self, text: str, chunk_size: int = None) -> list:
+    def split_text(self, text: str, chunk_size: int = None, overlap: int = None) -> list:
         """
-        Split long text into AI-processable chunks
+        Split long text into AI-processable chunks (see split_source)
+        """
+        return [chunk.text for chunk in self.split_source(StageText.from_string(text), chunk_size, overlap)]
+    
+    def split_source(self, source: StageText, chunk_size: int = None, overlap: int = None) -> List[StageChunk]:
+        """
+        Split a stage text into chunks of at most chunk_size tokens, returned as
+        byte-offset views into the source.
+        
+        Each chapter is split on its own, starting at its heading, so a chapter
+        shared by two stages (e.g. VI in IV-VI and VI-X) is cut at the same
+        places in both and its chunks can be deduplicated.
+        
+        The text is encoded a window at a time; each chunk ends at the last
+        paragraph break inside its token budget (if that keeps it at least half
+        full), otherwise at the last sentence break, otherwise exactly at the
+        budget. The unfinished tail of a window is re-encoded with the next one.
+        Consecutive chunks of a chapter share `overlap` tokens.
         """
         if chunk_size is None:
             chunk_size = self.max_tokens
+        if overlap is None:
+            overlap = self.overlap_tokens
+        overlap = max(0, min(overlap, chunk_size // 2))
         
-        paragraphs = text.split('\n\n')
         chunks = []
-        current_chunk = []
-        current_size = 0
+        for span_start, span_end in self.chapter_spans(source):
+            self._split_span(source, span_start, span_end, chunk_size, overlap, chunks)
+        return chunks
+    
+    @staticmethod
+    def chapter_spans(source: StageText) -> List[Tuple[int, int]]:
+        """Byte ranges of the chapters in a stage text (text before the first heading joins the first chapter)"""
+        starts = [0]
+        numeral = None
+        for match in CHAPTER_HEADING_PATTERN.finditer(source.buffer):
+            if numeral is not None and match.group(1) != numeral:
+                starts.append(match.start())
+            numeral = match.group(1)
+        return list(zip(starts, starts[1:] + [source.size]))
+    
+    def _split_span(self, source: StageText, span_start: int, span_end: int, chunk_size: int, overlap: int,
+                    chunks: List[StageChunk]):
+        """Append the chunks of source[span_start:span_end] to chunks"""
+        window_start = span_start
+        window_bytes = chunk_size * 4 * SPLIT_WINDOW_CHUNKS
         
-        for paragraph in paragraphs:
-            paragraph_tokens = self.count_tokens(paragraph)
+        while window_start < span_end:
+            window_end = source.char_boundary(min(window_start + window_bytes, span_end))
+            if window_end <= window_start:
+                window_end = span_end
+            final = window_end >= span_end
             
-            if paragraph_tokens > chunk_size:
-                sentences = paragraph.split('. ')
-                for sentence in sentences:
-                    sentence_tokens = self.count_tokens(sentence)
-                    if current_size + sentence_tokens > chunk_size:
-                        if current_chunk:
-                            chunks.append('\n\n'.join(current_chunk))
-                            current_chunk = []
-                            current_size = 0
-                        if sentence_tokens > chunk_size:
-                            sub_chunks = self.split_by_characters(sentence, chunk_size)
-                            chunks.extend(sub_chunks)
-                        else:
-                            current_chunk.append(sentence)
-                            current_size = sentence_tokens
-                    else:
-                        current_chunk.append(sentence)
-                        current_size += sentence_tokens
-            else:
-                if current_size + paragraph_tokens > chunk_size:
-                    if current_chunk:
-                        chunks.append('\n\n'.join(current_chunk))
-                    current_chunk = [paragraph]
-                    current_size = paragraph_tokens
+            data = source.buffer[window_start:window_end]
+            tokens = self.encoding.encode(data.decode("utf-8"))
+            # Byte offset where each token starts within the window, plus the window end
+            offsets = [0, *accumulate(len(piece) for piece in self.encoding.decode_tokens_bytes(tokens))]
+            
+            paragraph_breaks = self._token_boundaries(PARAGRAPH_BREAK_PATTERN, data, offsets)
+            any_breaks = sorted(set(paragraph_breaks).union(
+                self._token_boundaries(SENTENCE_BREAK_PATTERN, data, offsets)
+            ))
+            
+            start = 0
+            while start < len(tokens):
+                limit = start + chunk_size
+                if limit >= len(tokens):
+                    if not final:
+                        # Too close to the window edge; continue in the next window
+                        break
+                    end = len(tokens)
                 else:
-                    current_chunk.append(paragraph)
-                    current_size += paragraph_tokens
-        
-        if current_chunk:
-            chunks.append('\n\n'.join(current_chunk))
-        
-        return chunks
+                    end = self._last_boundary(paragraph_breaks, start + chunk_size // 2, limit)
+                    if end is None:
+                        end = self._last_boundary(any_breaks, start, limit)
+                    if end is None:
+                        end = limit
+                
+                self._append_chunk(chunks, source, window_start + offsets[start], window_start + offsets[end], end - start)
+                
+                if end >= len(tokens):
+                    break
+                start = max(end - overlap, start + 1)
+            
+            if final:
+                break
+            if start == 0:
+                # Fewer than chunk_size tokens in the window; widen it
+                window_bytes *= 2
+            else:
+                window_start = source.char_boundary(window_start + offsets[start])
+    
+    @staticmethod
+    def _append_chunk(chunks: List[StageChunk], source: StageText, start: int, end: int, tokens: int):
+        """Add a chunk view with surrounding whitespace trimmed, skipping blank ones"""
+        while start < end and source.buffer[start] in WHITESPACE_BYTES:
+            start += 1
+        while end > start and source.buffer[end - 1] in WHITESPACE_BYTES:
+            end -= 1
+        if end > start:
+            chunks.append(StageChunk(source, start, end, tokens))
+    
+    @staticmethod
+    def _token_boundaries(pattern: re.Pattern, data: bytes, offsets: List[int]) -> List[int]:
+        """Token indices at which a match of pattern ends, i.e. where the next piece starts"""
+        boundaries = []
+        for match in pattern.finditer(data):
+            index = bisect_left(offsets, match.end())
+            if not boundaries or boundaries[-1] != index:
+                boundaries.append(index)
+        return boundaries
     
-    def split_by_characters(self, text: str, max_chars: int) -> list:
-        """Split text by character count"""
-        return [text[i:i+max_chars] for i in range(0, len(text), max_chars)]
+    @staticmethod
+    def _last_boundary(boundaries: List[int], low: int, high: int):
+        """Largest boundary in the sorted list within (low, high], or None"""
+        i = bisect_right(boundaries, high)
+        if i and boundaries[i - 1] > low:
+            return boundaries[i - 1]
+        return None
+    
+    def chunk_prompt_tokens(self, chunk: StageChunk, chunk_index: int, total_chunks: int) -> int:
+        """
+        Tokens in a chunk's summary prompt: the count split_source stored for the
+        chunk plus the prompt around it, so the chunk text is not encoded again
+        """
+        return chunk.tokens + self.count_tokens(self.create_chunk_summary_prompt("", chunk_index, total_chunks))
     
     def create_chunk_summary_prompt(self, chunk: str, chunk_index: int, total_chunks: int) -> str:
         """
@@ -77,4 +176,4 @@ Please extract key information from this text chunk, focusing on:
 Summarize the main content of this chunk in concise bullet points:
 
 {chunk}
-"""
\ No newline at end of file
+"""
@@ -1,16 +1,27 @@
 # src/stage_summarizer.py
 import os
 import json
-from typing import Dict, List
-from config.settings import STAGE_SUMMARY_PROMPT
-from src.ai_client import AIClient
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple, Union
+from config.settings import (
+    STAGE_SUMMARY_PROMPT, CHUNK_MAX_CONCURRENCY, CHUNK_DEDUP_ENABLED, CHUNK_DEDUP_THRESHOLD,
+    SUMMARY_REDUCE_FAN_IN, SUMMARY_REDUCE_MAX_DEPTH, SUMMARY_REDUCE_CONCURRENCY, SUMMARY_REDUCE_TOKEN_BUDGET
+)
+from src.ai_client import AIClient, BatchIncompleteError
+from src.chunk_dedup import ChunkDedupIndex, SharedChunk
 from src.chunk_processor import ChunkProcessor
-from src.utils import save_json
+from src.stage_text import StageText, StageChunk
+from src.utils import save_json, load_json
 
 class StageSummarizer:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = CHUNK_MAX_CONCURRENCY):
         self.ai_client = AIClient()
         self.chunk_processor = ChunkProcessor()
+        self.max_concurrency = max(1, max_concurrency)
+        # Shared across stages so overlapping chapter ranges are summarized once
+        self.dedup_index = ChunkDedupIndex(CHUNK_DEDUP_THRESHOLD) if CHUNK_DEDUP_ENABLED else None
         
         # Stage configuration for 180-337 CE
         self.stage_config = {
@@ -36,15 +47,14 @@ class StageSummarizer:
             }
         }
     
-    def load_stage_content(self, stage_key: str) -> str:
-        """Load stage content from file"""
+    def open_stage_text(self, stage_key: str) -> Optional[StageText]:
+        """Memory-map stage content without reading it into a string"""
         file_path = f"roman_history_stage1/data/stages/{self.stage_config[stage_key]['file']}"
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return StageText.open(file_path)
         except FileNotFoundError:
             print(f"File not found: {file_path}")
-            return ""
+            return None
     
     def summarize_large_stage(self, stage_key: str) -> Dict:
         """
@@ -52,26 +62,32 @@ class StageSummarizer:
         """
         print(f"Processing stage: {self.stage_config[stage_key]['name']}")
         
-        content = self.load_stage_content(stage_key)
-        if not content:
+        source = self.open_stage_text(stage_key)
+        if source is None or not source.size:
             return {}
         
-        total_tokens = self.chunk_processor.count_tokens(content)
-        print(f"Text length: {len(content)} characters, approx {total_tokens} tokens")
-        
-        if total_tokens <= 12000:
-            print("Text length manageable, summarizing directly...")
-            return self.direct_summary(stage_key, content)
-        
-        print("Text too long, using hierarchical summarization strategy...")
-        return self.hierarchical_summary(stage_key, content)
+        with source:
+            # One windowed pass over the mapped file gives both the token count and the chunks
+            chunks = self.chunk_processor.split_source(source)
+            total_tokens = sum(chunk.tokens for chunk in chunks) - self.chunk_processor.overlap_tokens * max(0, len(chunks) - 1)
+            print(f"Text length: {source.size} bytes, approx {total_tokens} tokens")
+            
+            if len(chunks) <= 1:
+                print("Text length manageable, summarizing directly...")
+                return self.direct_summary(stage_key, source)
+            
+            print("Text too long, using hierarchical summarization strategy...")
+            return self.hierarchical_summary(stage_key, source, chunks)
     
-    def direct_summary(self, stage_key: str, content: str) -> Dict:
+    def direct_summary(self, stage_key: str, content: Union[str, StageText]) -> Dict:
         """Direct summary for manageable text length"""
+        if isinstance(content, str):
+            content = StageText.from_string(content)
+        
         prompt = STAGE_SUMMARY_PROMPT.format(
             start_year=self.stage_config[stage_key]['years'].split('-')[0],
             end_year=self.stage_config[stage_key]['years'].split('-')[1],
-            content=content[:10000]  # Limit length
+            content=content.prefix(10000)  # Limit length
         )
         
         response = self.ai_client.call_ai(prompt)
@@ -84,33 +100,19 @@ class StageSummarizer:
             "strategy": "direct"
         }
     
-    def hierarchical_summary(self, stage_key: str, content: str) -> Dict:
+    def hierarchical_summary(self, stage_key: str, content: Union[str, StageText], chunks: List[StageChunk] = None) -> Dict:
         """
         Hierarchical summarization for very long texts:
         1. Extract key information by chunks
         2. Generate final summary based on chunk summaries
         """
-        chunks = self.chunk_processor.split_text(content)
+        if isinstance(content, str):
+            content = StageText.from_string(content)
+        if chunks is None:
+            chunks = self.chunk_processor.split_source(content)
         print(f"Split text into {len(chunks)} chunks")
         
-        chunk_summaries = []
-        for i, chunk in enumerate(chunks):
-            print(f"Processing chunk {i+1}/{len(chunks)}...")
-            
-            chunk_prompt = self.chunk_processor.create_chunk_summary_prompt(
-                chunk, i+1, len(chunks)
-            )
-            
-            chunk_response = self.ai_client.call_ai(chunk_prompt)
-            chunk_summaries.append({
-                "chunk_index": i+1,
-                "summary": chunk_response
-            })
-            
-            if (i + 1) % 3 == 0:
-                self._save_chunk_summaries(stage_key, chunk_summaries)
-        
-        self._save_chunk_summaries(stage_key, chunk_summaries)
+        chunk_summaries = self._summarize_chunks(stage_key, chunks)
         
         final_summary = self._create_final_summary(stage_key, chunk_summaries)
         
@@ -120,9 +122,210 @@ class StageSummarizer:
             "years": self.stage_config[stage_key]['years'],
             "summary": final_summary,
             "chunk_count": len(chunks),
+            "shared_chunks": [
+                {
+                    "chunk_index": cs["chunk_index"],
+                    "source_stage": cs["shared_from"]["stage"],
+                    "source_chunk_index": cs["shared_from"]["chunk_index"],
+                    "similarity": cs["shared_from"]["similarity"]
+                }
+                for cs in chunk_summaries if "shared_from" in cs
+            ],
             "strategy": "hierarchical"
         }
     
+    def _summarize_chunks(self, stage_key: str, chunks: List[StageChunk]) -> List[Dict]:
+        """
+        Summarize chunks with up to max_concurrency requests in flight.
+        Results are kept in chunk_index order and checkpointed every 3 completed chunks;
+        chunks already in a matching checkpoint are reused instead of re-requested.
+        """
+        chunk_summaries = self._load_chunk_checkpoint(stage_key, chunks)
+        if chunk_summaries:
+            print(f"[{stage_key}] Resuming from checkpoint: {len(chunk_summaries)}/{len(chunks)} chunks already summarized")
+        done = {cs["chunk_index"] for cs in chunk_summaries}
+        
+        if self.dedup_index is not None:
+            for cs in chunk_summaries:
+                self.dedup_index.add_summary(
+                    stage_key, cs["chunk_index"], cs["chunk_hash"], chunks[cs["chunk_index"] - 1].text, cs["summary"]
+                )
+        
+        if self.ai_client.batch_mode:
+            return self._summarize_chunks_batch(stage_key, chunks, chunk_summaries, done)
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        futures = []
+        try:
+            futures = [
+                executor.submit(self._summarize_chunk, stage_key, chunk, i+1, len(chunks))
+                for i, chunk in enumerate(chunks)
+                if i+1 not in done
+            ]
+            
+            for future in as_completed(futures):
+                chunk_summaries.append(future.result())
+                chunk_summaries.sort(key=lambda cs: cs["chunk_index"])
+                print(f"[{stage_key}] {len(chunk_summaries)}/{len(chunks)} chunks summarized")
+                
+                if len(chunk_summaries) % 3 == 0:
+                    self._save_chunk_summaries(stage_key, chunk_summaries)
+        except Exception:
+            # Keep every chunk that finished on disk before giving up, including those that
+            # completed after the last checkpoint or while the pool was shutting down
+            executor.shutdown(wait=True, cancel_futures=True)
+            saved = {cs["chunk_index"] for cs in chunk_summaries}
+            for future in futures:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    if future.result()["chunk_index"] not in saved:
+                        chunk_summaries.append(future.result())
+            chunk_summaries.sort(key=lambda cs: cs["chunk_index"])
+            self._save_chunk_summaries(stage_key, chunk_summaries)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+        
+        self._save_chunk_summaries(stage_key, chunk_summaries)
+        return chunk_summaries
+    
+    def _summarize_chunks_batch(self, stage_key: str, chunks: List[StageChunk], chunk_summaries: List[Dict], done: set) -> List[Dict]:
+        """
+        Submit every pending chunk prompt as one offline batch and merge the
+        completions into chunk_summaries; completed chunks are checkpointed even
+        if part of the batch failed. Chunks another stage already claimed are
+        not submitted; their summaries are taken once this stage's batch is done.
+        """
+        prompts = {}
+        owned = {}
+        shared = {}
+        for i, chunk in enumerate(chunks):
+            if i+1 in done:
+                continue
+            chunk_text = chunk.text
+            if self.dedup_index is not None:
+                entry, similarity, owner = self.dedup_index.claim(stage_key, i+1, self._chunk_hash(chunk_text), chunk_text)
+                if not owner:
+                    shared[i+1] = (entry, similarity)
+                    continue
+                owned[i+1] = entry
+            prompts[f"{stage_key}-chunk-{i+1}"] = self.chunk_processor.create_chunk_summary_prompt(chunk_text, i+1, len(chunks))
+        
+        completions = {}
+        error = None
+        try:
+            if prompts:
+                completions = self.ai_client.call_ai_batch(prompts, name=f"{stage_key}_chunks")
+        except BatchIncompleteError as e:
+            completions = e.results
+            error = e
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            for i, chunk in enumerate(chunks):
+                custom_id = f"{stage_key}-chunk-{i+1}"
+                if custom_id in completions:
+                    if i+1 in owned:
+                        self.dedup_index.resolve(owned[i+1], completions[custom_id])
+                    chunk_summaries.append(self._chunk_record(chunk, i+1, completions[custom_id]))
+                elif i+1 in owned:
+                    self.dedup_index.release(owned[i+1], error or Exception("no batch result"))
+            chunk_summaries.sort(key=lambda cs: cs["chunk_index"])
+            self._save_chunk_summaries(stage_key, chunk_summaries)
+        
+        for chunk_index, (entry, similarity) in shared.items():
+            chunk_summaries.append(
+                self._shared_chunk_record(stage_key, chunks[chunk_index - 1], chunk_index, len(chunks), entry, similarity)
+            )
+        if shared:
+            chunk_summaries.sort(key=lambda cs: cs["chunk_index"])
+            self._save_chunk_summaries(stage_key, chunk_summaries)
+        
+        return chunk_summaries
+    
+    def _summarize_chunk(self, stage_key: str, chunk: StageChunk, chunk_index: int, total_chunks: int) -> Dict:
+        """Summarize a single chunk, or reuse the summary of the same chunk in another stage"""
+        chunk_text = chunk.text
+        
+        entry = None
+        if self.dedup_index is not None:
+            entry, similarity, owner = self.dedup_index.claim(
+                stage_key, chunk_index, self._chunk_hash(chunk_text), chunk_text
+            )
+            if not owner:
+                return self._shared_chunk_record(stage_key, chunk, chunk_index, total_chunks, entry, similarity)
+        
+        try:
+            summary = self._request_chunk_summary(stage_key, chunk, chunk_index, total_chunks)
+        except Exception as e:
+            if entry is not None:
+                self.dedup_index.release(entry, e)
+            raise
+        
+        if entry is not None:
+            self.dedup_index.resolve(entry, summary)
+        return self._chunk_record(chunk, chunk_index, summary)
+    
+    def _request_chunk_summary(self, stage_key: str, chunk: StageChunk, chunk_index: int, total_chunks: int) -> str:
+        print(f"[{stage_key}] Processing chunk {chunk_index}/{total_chunks}...")
+        
+        chunk_prompt = self.chunk_processor.create_chunk_summary_prompt(
+            chunk.text, chunk_index, total_chunks
+        )
+        return self.ai_client.call_ai(
+            chunk_prompt, prompt_tokens=self.chunk_processor.chunk_prompt_tokens(chunk, chunk_index, total_chunks)
+        )
+    
+    def _shared_chunk_record(self, stage_key: str, chunk: StageChunk, chunk_index: int, total_chunks: int,
+                             entry: SharedChunk, similarity: float) -> Dict:
+        """Wait for the summary of a matching chunk from another stage; summarize it here if that failed"""
+        try:
+            summary = entry.future.result()
+        except Exception:
+            return self._chunk_record(
+                chunk, chunk_index, self._request_chunk_summary(stage_key, chunk, chunk_index, total_chunks)
+            )
+        
+        print(f"[{stage_key}] Chunk {chunk_index}/{total_chunks} reuses {entry.stage_key} chunk "
+              f"{entry.chunk_index} (similarity {similarity:.2f})")
+        record = self._chunk_record(chunk, chunk_index, summary)
+        record["shared_from"] = {
+            "stage": entry.stage_key,
+            "chunk_index": entry.chunk_index,
+            "similarity": round(similarity, 3)
+        }
+        return record
+    
+    def _chunk_record(self, chunk: StageChunk, chunk_index: int, summary: str) -> Dict:
+        return {
+            "chunk_index": chunk_index,
+            "chunk_hash": self._chunk_hash(chunk.text),
+            "source_offsets": [chunk.start, chunk.end],
+            "summary": summary
+        }
+    
+    @staticmethod
+    def _chunk_hash(chunk: str) -> str:
+        """Hash of the chunk text, used to match checkpoints against the current split"""
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+    
+    def _load_chunk_checkpoint(self, stage_key: str, chunks: List[StageChunk]) -> List[Dict]:
+        """Return checkpointed chunk summaries whose chunk text is unchanged"""
+        checkpoint = load_json(f"roman_history_stage1/data/summaries/{stage_key}_chunk_summaries.json")
+        if not isinstance(checkpoint, list):
+            return []
+        
+        reusable = []
+        for cs in checkpoint:
+            index = cs.get("chunk_index")
+            if not isinstance(index, int) or not 1 <= index <= len(chunks):
+                continue
+            if cs.get("chunk_hash") == self._chunk_hash(chunks[index - 1].text) and cs.get("summary"):
+                reusable.append(cs)
+        
+        return sorted(reusable, key=lambda cs: cs["chunk_index"])
+    
     def _save_chunk_summaries(self, stage_key: str, chunk_summaries: List[Dict]):
         """Save chunk summaries"""
         save_json(
@@ -131,10 +334,15 @@ class StageSummarizer:
         )
     
     def _create_final_summary(self, stage_key: str, chunk_summaries: List[Dict]) -> str:
-        """Create final summary from chunk summaries"""
-        combined_summaries = "\n\n".join([
-            f"Chunk {cs['chunk_index']}:\n{cs['summary']}" 
+        """Create final summary from chunk summaries, condensed first if they exceed the token budget"""
+        parts = [
+            (f"Chunk {cs['chunk_index']}", cs['chunk_index'], cs['chunk_index'], cs['summary'])
             for cs in chunk_summaries
+        ]
+        parts = self._reduce_summaries(stage_key, parts)
+        combined_summaries = "\n\n".join([
+            f"{label}:\n{summary}"
+            for label, _, _, summary in parts
         ])
         
         final_prompt = f"""
@@ -149,30 +357,164 @@ Please write a 300-500 word comprehensive summary highlighting the core characte
         
         return self.ai_client.call_ai(final_prompt)
     
-    def summarize_all_stages(self) -> Dict:
-        """Summarize all stages"""
-        all_summaries = {}
+    def _reduce_summaries(self, stage_key: str, parts: List[Tuple[str, int, int, str]]) -> List[Tuple[str, int, int, str]]:
+        """
+        Map-reduce over (label, first_chunk, last_chunk, summary) parts: pack them
+        into groups of up to SUMMARY_REDUCE_FAN_IN that fit the token budget,
+        condense each group in parallel and repeat until the whole fits, for at
+        most SUMMARY_REDUCE_MAX_DEPTH levels. Anything still over budget is trimmed,
+        so the final prompt never outgrows the budget.
+        """
+        budget = SUMMARY_REDUCE_TOKEN_BUDGET
+        fan_in = max(2, SUMMARY_REDUCE_FAN_IN)
+        sizes = [self.chunk_processor.count_tokens(summary) for _, _, _, summary in parts]
         
-        for stage_key in self.stage_config.keys():
-            print(f"\n=== Processing {stage_key} ===")
-            stage_summary = self.summarize_large_stage(stage_key)
-            all_summaries[stage_key] = stage_summary
+        for level in range(1, SUMMARY_REDUCE_MAX_DEPTH + 1):
+            if sum(sizes) <= budget or len(parts) <= 1:
+                return parts
+            
+            groups = []
+            group_tokens = 0
+            for part, size in zip(parts, sizes):
+                if groups and len(groups[-1]) < fan_in and group_tokens + size <= budget:
+                    groups[-1].append(part)
+                    group_tokens += size
+                else:
+                    groups.append([part])
+                    group_tokens = size
+            if len(groups) == len(parts):
+                # Nothing can be combined within the budget
+                break
             
-            save_json(
-                stage_summary,
-                f"data/summaries/{stage_key}_summary.json"
+            print(f"[{stage_key}] Reducing {len(parts)} summaries in {len(groups)} groups (level {level})")
+            prompts = [self._create_reduce_prompt(stage_key, group) for group in groups]
+            summaries = self._run_reduce_prompts(stage_key, level, prompts)
+            
+            parts = []
+            for group, summary in zip(groups, summaries):
+                first, last = group[0][1], group[-1][2]
+                label = f"Chunk {first}" if first == last else f"Chunks {first}-{last}"
+                parts.append((label, first, last, summary))
+            sizes = [self.chunk_processor.count_tokens(summary) for _, _, _, summary in parts]
+        
+        if sum(sizes) <= budget:
+            return parts
+        
+        # Still too long after the deepest level: trim every part to an equal share
+        share = max(1, budget // len(parts))
+        print(f"[{stage_key}] Summaries still exceed {budget} tokens; trimming each to {share} tokens")
+        encoding = self.chunk_processor.encoding
+        return [
+            (label, first, last, encoding.decode(encoding.encode(summary)[:share]))
+            for label, first, last, summary in parts
+        ]
+    
+    def _create_reduce_prompt(self, stage_key: str, group: List[Tuple[str, int, int, str]]) -> str:
+        """Prompt condensing a group of chunk analyses into one"""
+        combined = "\n\n".join(f"{label}:\n{summary}" for label, _, _, summary in group)
+        return f"""
+The following are analyses of consecutive chunks of "The History of the Decline and Fall of the Roman Empire" covering {self.stage_config[stage_key]['years']} CE.
+
+Condense them into one set of concise bullet points that keeps every important event, figure, and political, military or economic change, in chronological order:
+
+{combined}
+"""
+    
+    def _run_reduce_prompts(self, stage_key: str, level: int, prompts: List[str]) -> List[str]:
+        """Complete one reduction level's prompts in parallel (one batch in batch mode), in order"""
+        if self.ai_client.batch_mode:
+            completions = self.ai_client.call_ai_batch(
+                {f"{stage_key}-reduce{level}-{i+1}": prompt for i, prompt in enumerate(prompts)},
+                name=f"{stage_key}_reduce{level}"
             )
+            return [completions[f"{stage_key}-reduce{level}-{i+1}"] for i in range(len(prompts))]
+        
+        with ThreadPoolExecutor(max_workers=max(1, SUMMARY_REDUCE_CONCURRENCY)) as executor:
+            return list(executor.map(
+                lambda prompt: self.ai_client.call_ai(prompt, prompt_tokens=self.chunk_processor.count_tokens(prompt)),
+                prompts
+            ))
+    
+    def summarize_all_stages(self, max_parallel_stages: int = None, stage_keys: List[str] = None) -> Dict:
+        """
+        Summarize all stages (or just stage_keys) concurrently.
+        Every stage shares the client's request budget; a failed stage is reported
+        in the metadata and the stages that succeeded are still saved.
+        all_stages_summary.json is only written when every stage was requested.
+        """
+        partial = stage_keys is not None
+        if stage_keys is None:
+            stage_keys = list(self.stage_config.keys())
+        all_summaries = {}
+        failed_stages = {}
+        
+        with ThreadPoolExecutor(max_workers=max_parallel_stages or len(stage_keys)) as executor:
+            futures = {
+                executor.submit(self._summarize_stage_timed, stage_key): stage_key
+                for stage_key in stage_keys
+            }
             
-            print(f"Completed {stage_key} summary")
+            for future in as_completed(futures):
+                stage_key = futures[future]
+                try:
+                    stage_summary, elapsed = future.result()
+                except Exception as e:
+                    print(f"Stage {stage_key} failed: {e}")
+                    failed_stages[stage_key] = str(e)
+                    continue
+                
+                all_summaries[stage_key] = stage_summary
+                save_json(stage_summary, self._stage_summary_path(stage_key))
+                
+                print(f"Completed {stage_key} summary in {elapsed:.1f}s "
+                      f"({len(all_summaries) + len(failed_stages)}/{len(stage_keys)} stages finished)")
+        
+        # Keep the configured stage order in the output
+        all_summaries = {key: all_summaries[key] for key in stage_keys if key in all_summaries}
         
-        combined_result = {
+        combined_result = self._combine_stage_summaries(all_summaries, failed_stages)
+        if not partial:
+            save_json(combined_result, "roman_history_stage1/data/summaries/all_stages_summary.json")
+        return combined_result
+    
+    def combine_saved_stages(self) -> Dict:
+        """Rebuild all_stages_summary.json from the per-stage summary files"""
+        all_summaries = {}
+        failed_stages = {}
+        for stage_key in self.stage_config:
+            stage_summary = load_json(self._stage_summary_path(stage_key))
+            if stage_summary:
+                all_summaries[stage_key] = stage_summary
+            else:
+                failed_stages[stage_key] = "no saved stage summary"
+        
+        combined_result = self._combine_stage_summaries(all_summaries, failed_stages)
+        save_json(combined_result, "roman_history_stage1/data/summaries/all_stages_summary.json")
+        return combined_result
+    
+    @staticmethod
+    def _stage_summary_path(stage_key: str) -> str:
+        return f"roman_history_stage1/data/summaries/{stage_key}_summary.json"
+    
+    def _combine_stage_summaries(self, all_summaries: Dict, failed_stages: Dict) -> Dict:
+        return {
             "metadata": {
                 "analysis_type": "stage_summaries",
                 "total_stages": len(all_summaries),
-                "period_covered": "180-337 CE"
+                "period_covered": "180-337 CE",
+                "failed_stages": failed_stages,
+                # stage -> chunks whose summary was reused from another stage
+                "shared_chunks": {
+                    key: summary["shared_chunks"]
+                    for key, summary in all_summaries.items() if summary.get("shared_chunks")
+                }
             },
             "stages": all_summaries
         }
-        
-        save_json(combined_result, "roman_history_stage1/data/summaries/all_stages_summary.json")
-        return combined_result
\ No newline at end of file
+    
+    def _summarize_stage_timed(self, stage_key: str):
+        """Summarize one stage and return it with the elapsed seconds"""
+        print(f"\n=== Processing {stage_key} ===")
+        started = time.perf_counter()
+        stage_summary = self.summarize_large_stage(stage_key)
+        return stage_summary, time.perf_counter() - started
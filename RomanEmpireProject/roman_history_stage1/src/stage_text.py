@@ -0,0 +1,66 @@
+# src/stage_text.py
+import mmap
+from typing import Optional
+
+class StageText:
+    """
+    Read-only view of a UTF-8 stage text, memory-mapped from its file (or held
+    as bytes when built from a string). Only the byte ranges asked for are
+    decoded, so large sources never have to sit in memory as one string.
+    """
+
+    def __init__(self, buffer, path: Optional[str] = None):
+        self.buffer = buffer
+        self.path = path
+        self.size = len(buffer)
+
+    @classmethod
+    def open(cls, path: str) -> "StageText":
+        """Map a file read-only; empty files (which cannot be mapped) become empty texts"""
+        with open(path, 'rb') as f:
+            if not f.seek(0, 2):
+                return cls(b"", path)
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), path)
+
+    @classmethod
+    def from_string(cls, text: str) -> "StageText":
+        return cls(text.encode("utf-8"))
+
+    def char_boundary(self, offset: int) -> int:
+        """Move a byte offset back to the start of the UTF-8 character it falls in"""
+        offset = max(0, min(offset, self.size))
+        while 0 < offset < self.size and 0x80 <= self.buffer[offset] < 0xC0:
+            offset -= 1
+        return offset
+
+    def read(self, start: int, end: int) -> str:
+        """Decode the bytes between two offsets, with newlines normalised as in text mode"""
+        text = self.buffer[self.char_boundary(start):self.char_boundary(end)].decode("utf-8")
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def prefix(self, max_chars: int) -> str:
+        """The first max_chars characters, decoding at most 4 bytes per character"""
+        return self.read(0, max_chars * 4)[:max_chars]
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class StageChunk:
+    """A chunk of a StageText, kept as byte offsets and decoded on demand"""
+
+    def __init__(self, source: StageText, start: int, end: int, tokens: int):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+
+    @property
+    def text(self) -> str:
+        return self.source.read(self.start, self.end)
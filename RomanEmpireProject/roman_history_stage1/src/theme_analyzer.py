@@ -4,6 +4,7 @@ import json
 from typing import Dict, List
 from config.settings import THEME_EXTRACTION_PROMPT
 from src.ai_client import AIClient
+from src.stage_summarizer import StageSummarizer
 from src.utils import save_json, load_json
 
 class ThemeAnalyzer:
@@ -88,8 +89,9 @@ class ThemeAnalyzer:
         summarizer = StageSummarizer()
         
         for stage_key in summarizer.stage_config.keys():
-            content = summarizer.load_stage_content(stage_key)
-            if content:
-                sample_parts.append(f"=== {stage_key} ===\n{content[:2000]}")
+            source = summarizer.open_stage_text(stage_key)
+            if source is not None and source.size:
+                with source:
+                    sample_parts.append(f"=== {stage_key} ===\n{source.prefix(2000)}")
         
         return "\n\n".join(sample_parts)
\ No newline at end of file
@@ -0,0 +1,47 @@
+# src/tokenizer.py
+import os
+import threading
+from typing import Dict
+from config.settings import AI_MODEL, TOKENIZER_ENCODING, TOKENIZER_CACHE_DIR
+
+# Loaded encodings by name; tiktoken is only imported on first use
+_encodings: Dict[str, object] = {}
+_encodings_lock = threading.Lock()
+
+def encoding_name_for_model(model: str = AI_MODEL) -> str:
+    """Encoding that matches the model, or TOKENIZER_ENCODING if set; cl100k_base for unknown models"""
+    if TOKENIZER_ENCODING:
+        return TOKENIZER_ENCODING
+    from tiktoken.model import encoding_name_for_model as tiktoken_encoding_name
+    try:
+        return tiktoken_encoding_name(model)
+    except KeyError:
+        return "cl100k_base"
+
+def get_encoding(name: str = None):
+    """
+    Return the process-wide tiktoken encoding, loading it on first call.
+    The BPE file is kept in TOKENIZER_CACHE_DIR, so once it has been warmed
+    (or copied there) loading works offline.
+    """
+    if name is None:
+        name = encoding_name_for_model()
+
+    encoding = _encodings.get(name)
+    if encoding is not None:
+        return encoding
+
+    with _encodings_lock:
+        if name not in _encodings:
+            if TOKENIZER_CACHE_DIR:
+                os.environ.setdefault("TIKTOKEN_CACHE_DIR", TOKENIZER_CACHE_DIR)
+                os.makedirs(os.environ["TIKTOKEN_CACHE_DIR"], exist_ok=True)
+            import tiktoken
+            _encodings[name] = tiktoken.get_encoding(name)
+        return _encodings[name]
+
+def warm_encoding() -> str:
+    """Download the BPE file for AI_MODEL into the cache directory; returns the encoding name"""
+    name = encoding_name_for_model()
+    get_encoding(name)
+    return name
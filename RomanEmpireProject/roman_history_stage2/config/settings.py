@@ -9,13 +9,71 @@ AI_API_KEY = os.getenv('AI_API_KEY', 'your-api-key-here')
 AI_BASE_URL = os.getenv('AI_BASE_URL', 'https://api.openai.com/v1')
 AI_MODEL = os.getenv('AI_MODEL', 'gpt-4')
 
+# HTTP Connection Pool
+AI_HTTP_POOL_SIZE = int(os.getenv('AI_HTTP_POOL_SIZE', '16'))
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', '10'))
+AI_HTTP_READ_TIMEOUT = float(os.getenv('AI_HTTP_READ_TIMEOUT', '180'))
+AI_HTTP_CONNECT_RETRIES = int(os.getenv('AI_HTTP_CONNECT_RETRIES', '2'))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '3'))
+
+# Stream completions (SSE) so long JSON responses are parsed as they arrive
+AI_STREAM_RESPONSES = os.getenv('AI_STREAM_RESPONSES', '1') == '1'
+
+# Provider Rate Limits (0 disables pacing); headroom keeps us just under them
+AI_RATE_LIMIT_RPM = float(os.getenv('AI_RATE_LIMIT_RPM', '0'))
+AI_RATE_LIMIT_TPM = float(os.getenv('AI_RATE_LIMIT_TPM', '0'))
+AI_RATE_LIMIT_HEADROOM = float(os.getenv('AI_RATE_LIMIT_HEADROOM', '0.9'))
+
+# Offline Batch Mode (OpenAI-compatible /batches endpoint)
+AI_BATCH_MODE = os.getenv('AI_BATCH_MODE', '0') == '1'
+AI_BATCH_BASE_URL = os.getenv('AI_BATCH_BASE_URL', AI_BASE_URL)
+AI_BATCH_POLL_SECONDS = float(os.getenv('AI_BATCH_POLL_SECONDS', '30'))
+AI_BATCH_COMPLETION_WINDOW = os.getenv('AI_BATCH_COMPLETION_WINDOW', '24h')
+AI_BATCH_DIR = os.getenv('AI_BATCH_DIR', 'roman_history_stage2/data/batches')
+
+# Completion Cache
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', '1') != '0'
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', 'roman_history_stage2/data/cache/completions.sqlite3')
+AI_CACHE_MAX_MB = int(os.getenv('AI_CACHE_MAX_MB', '200'))
+AI_CACHE_MAX_AGE_DAYS = float(os.getenv('AI_CACHE_MAX_AGE_DAYS', '30'))
+
+# Run event and period analysis at the same time (they only share read-only inputs)
+ANALYSIS_CONCURRENT = os.getenv('ANALYSIS_CONCURRENT', '1') == '1'
+
+# Terrain Heightmap (sizes in pixels; kernel widths as a fraction of the map width)
+TERRAIN_WIDTH = int(os.getenv('TERRAIN_WIDTH', '4096'))
+TERRAIN_HEIGHT = int(os.getenv('TERRAIN_HEIGHT', '4096'))
+TERRAIN_SIGMA_MIN = float(os.getenv('TERRAIN_SIGMA_MIN', '0.01'))
+TERRAIN_SIGMA_MAX = float(os.getenv('TERRAIN_SIGMA_MAX', '0.12'))
+# Kernel sigmas snap to this many evenly spaced levels (19 = every half scope point)
+TERRAIN_SIGMA_LEVELS = int(os.getenv('TERRAIN_SIGMA_LEVELS', '19'))
+TERRAIN_BASE_SCALE = float(os.getenv('TERRAIN_BASE_SCALE', '2.0'))
+TERRAIN_CORE_RADIUS = float(os.getenv('TERRAIN_CORE_RADIUS', '0.2'))
+TERRAIN_OUTPUT_DIR = os.getenv('TERRAIN_OUTPUT_DIR', 'roman_history_stage2/outputs/terrain')
+TERRAIN_TILE_SIZE = int(os.getenv('TERRAIN_TILE_SIZE', '512'))
+TERRAIN_STORE_DIR = os.getenv('TERRAIN_STORE_DIR', 'roman_history_stage2/outputs/terrain/tiles')
+
+# Terrain Animation (one heightmap per year); events lacking temporal_scope use the defaults
+ANIMATION_YEARS_PER_DURATION = float(os.getenv('ANIMATION_YEARS_PER_DURATION', '1.0'))
+ANIMATION_FADE_YEARS = int(os.getenv('ANIMATION_FADE_YEARS', '5'))
+ANIMATION_DEFAULT_IMMEDIACY = float(os.getenv('ANIMATION_DEFAULT_IMMEDIACY', '1.0'))
+ANIMATION_DEFAULT_PERSISTENCE = float(os.getenv('ANIMATION_DEFAULT_PERSISTENCE', '0.5'))
+ANIMATION_FRAME_FORMATS = tuple(os.getenv('ANIMATION_FRAME_FORMATS', 'png').split(','))
+ANIMATION_PNG_COMPRESSION = int(os.getenv('ANIMATION_PNG_COMPRESSION', '1'))
+TERRAIN_FRAMES_DIR = os.getenv('TERRAIN_FRAMES_DIR', 'roman_history_stage2/outputs/terrain/frames')
+
+# Cascade Propagation (theme intensity per year)
+CASCADE_PERSISTENCE = float(os.getenv('CASCADE_PERSISTENCE', '0.8'))
+CASCADE_COUPLING = float(os.getenv('CASCADE_COUPLING', '0.15'))
+CASCADE_RELATIONSHIP_DELAY = int(os.getenv('CASCADE_RELATIONSHIP_DELAY', '1'))
+
 # Project Constants
 HISTORY_START_YEAR = 180
 HISTORY_END_YEAR = 337
 BOOK_TITLE = "The History of the Decline and Fall of the Roman Empire"
 
 # File Paths
-STAGE1_INPUT_PATH = "roman_history_stage2/data/input/final_analysis_20251108_020704.json"
+STAGE1_INPUT_PATH = os.getenv('STAGE1_INPUT_PATH', "roman_history_stage2/data/input/final_analysis_20251108_020704.json")
 PROCESSED_DATA_PATH = "roman_history_stage2/data/processed/stage2_output.json"
 
 # Four Historical Periods
@@ -0,0 +1,52 @@
+# config/terrain_layout.py
+# Map layout for the terrain heightmap: where regions sit and where each theme shows
+
+# Longitude/latitude covered by the heightmap (west, east, south, north)
+MAP_BOUNDS = (-12.0, 48.0, 22.0, 58.0)
+
+# Heart of the empire; events are pulled towards or pushed away from it by centrality
+MAP_CENTER = "Rome"
+
+# Approximate (longitude, latitude) of regions named in events
+REGION_COORDINATES = {
+    "Rome": (12.5, 41.9),
+    "Italy": (12.0, 43.5),
+    "Gaul": (2.5, 46.5),
+    "Britain": (-1.5, 52.5),
+    "Spain": (-4.0, 40.0),
+    "North Africa": (9.0, 35.0),
+    "Egypt": (31.0, 27.0),
+    "Syria": (37.0, 35.0),
+    "Danube Border": (22.0, 44.5),
+    "Rhine Border": (7.5, 50.0),
+    "Persia": (44.6, 33.1),
+    "Asia Minor": (32.0, 39.0),
+    "Mesopotamia": (43.0, 36.0),
+    "Armenia": (44.0, 40.0),
+    "Greece": (22.0, 38.5),
+    "Balkans": (22.0, 42.0),
+    "Antioch": (36.2, 36.2),
+    "Palmyra": (38.3, 34.6),
+    "Nicaea": (29.7, 40.4),
+    "Constantinople": (29.0, 41.0)
+}
+
+# Other spellings found in event location descriptions
+REGION_ALIASES = {
+    "Persian": "Persia",
+    "Danube": "Danube Border",
+    "Rhine": "Rhine Border",
+    "Balkan": "Balkans",
+    "Africa": "North Africa"
+}
+
+# Where each core theme's period rating raises or lowers the base terrain:
+# "core" around MAP_CENTER, "frontier" away from it, "uniform" everywhere
+THEME_FOOTPRINTS = {
+    "external_threat": "frontier",
+    "internal_stability": "core",
+    "economic_development": "uniform",
+    "socio_cultural_vitality": "uniform",
+    "religious_influence": "uniform",
+    "governance_efficiency": "core"
+}
@@ -1,39 +1,51 @@
 # main.py
 import os
 import sys
+import argparse
+import threading
+from concurrent.futures import Future, as_completed
 from src.theme_mapper import ThemeMapper
 from src.event_analyzer import EventAnalyzer
 from src.period_analyzer import PeriodAnalyzer
+from src.ai_client import AIClient
+from src.event_table import EventTable
+from src.terrain_rasterizer import TerrainRasterizer, save_heightmap
+from src.heightmap_store import HeightmapStore
+from src.terrain_animation import TerrainAnimator
+from src.cascade_simulator import CascadeSimulator
 from src.utils import load_json, save_json, create_timestamp, combine_stage_summaries, get_period_summaries
-from config.settings import STAGE1_INPUT_PATH
+from config.settings import (STAGE1_INPUT_PATH, ANALYSIS_CONCURRENT, TERRAIN_OUTPUT_DIR, TERRAIN_WIDTH,
+                             TERRAIN_HEIGHT, TERRAIN_TILE_SIZE, TERRAIN_STORE_DIR, TERRAIN_FRAMES_DIR,
+                             ANIMATION_FRAME_FORMATS, ANIMATION_PNG_COMPRESSION)
 
-def main():
-    print("=== Roman Empire Historical Terrain Mapping Project - Stage 2 ===")
-    print("Event Analysis and Period Rating")
-    
-    # Create necessary directories
-    os.makedirs("roman_history_stage2/data/processed", exist_ok=True)
-    os.makedirs("roman_history_stage2/outputs", exist_ok=True)
-    
-    # 1. Load stage1 output
-    print("1. Loading stage1 output data...")
-    stage1_data = load_json(STAGE1_INPUT_PATH)
-    if not stage1_data:
-        print("Error: Cannot load stage1 output file")
-        return
-    
-    print(f"✓ Successfully loaded stage1 data, containing {len(stage1_data.get('core_themes', {}).get('themes', []))} original themes")
-    
-    # 2. Theme mapping
+STEPS = ("themes", "events", "periods", "report", "terrain", "tiles", "animation", "cascades")
+
+# Where each step leaves its result for the report and terrain steps
+THEME_MAPPING_PATH = "roman_history_stage2/data/processed/theme_mapping_process.json"
+EVENTS_PATH = "roman_history_stage2/data/processed/historical_events.json"
+PERIODS_PATH = "roman_history_stage2/data/processed/period_analysis.json"
+INTENSITY_PATH = "roman_history_stage2/data/processed/theme_intensity.json"
+HEIGHTMAP_NAME = "heightmap"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Event analysis and period rating")
+    parser.add_argument("--step", choices=STEPS,
+                        help="Run a single step (results are read from and written to data/processed); used by pipeline.py")
+    parser.add_argument("--output", help="Final report path (default: outputs/stage2_final_analysis_<timestamp>.json)")
+    parser.add_argument("--events", default=EVENTS_PATH,
+                        help="Event file for the terrain, tiles, animation and cascades steps (extracted or curated schema)")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run event and period analysis one after the other (overrides ANALYSIS_CONCURRENT)")
+    return parser.parse_args()
+
+def run_theme_mapping(stage1_data):
     print("\n2. Performing theme mapping...")
     theme_mapper = ThemeMapper()
     mapping_result = theme_mapper.map_themes_from_stage1(stage1_data)
     print(f"✓ Completed theme mapping: 10 themes → 6 core themes")
-    
-    # Get core theme descriptions for prompts
-    core_themes_description = theme_mapper.get_core_themes_for_prompt()
-    
-    # 3. Event analysis
+    return mapping_result
+
+def run_event_analysis(stage1_data, core_themes_description):
     print("\n3. Performing event analysis...")
     event_analyzer = EventAnalyzer()
     
@@ -45,9 +57,9 @@ def main():
         print(f"✓ Successfully extracted {len(events_data.get('events', []))} historical events")
     else:
         print("✗ Event analysis failed")
-        return
-    
-    # 4. Period analysis
+    return events_data
+
+def run_period_analysis(stage1_data, core_themes_description):
     print("\n4. Performing period analysis...")
     period_analyzer = PeriodAnalyzer()
     
@@ -59,9 +71,51 @@ def main():
         print("✓ Successfully completed period rating analysis")
     else:
         print("✗ Period analysis failed")
-        return
+    return period_data
+
+def run_in_background(func, *args) -> Future:
+    """
+    Run func on a daemon thread. Unlike an executor's workers, a daemon thread
+    does not keep the process alive, so a failure elsewhere can exit at once.
+    """
+    future = Future()
     
-    # 5. Generate final report
+    def target():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+def run_analyses_concurrently(stage1_data, core_themes_description):
+    """
+    Run event and period analysis at the same time; both only read stage1_data.
+    Returns (events_data, period_data), or None as soon as either one fails,
+    without waiting for the other call to finish.
+    """
+    futures = {
+        run_in_background(run_event_analysis, stage1_data, core_themes_description): "events",
+        run_in_background(run_period_analysis, stage1_data, core_themes_description): "periods"
+    }
+    
+    results = {}
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"✗ {name.capitalize()} analysis raised an error: {e}")
+            result = None
+        if not result:
+            print(f"✗ Stopping: {name} analysis failed")
+            return None
+        results[name] = result
+    
+    return results["events"], results["periods"]
+
+def write_report(mapping_result, events_data, period_data, output_path=None):
     print("\n5. Generating final report...")
     final_report = {
         "metadata": {
@@ -76,14 +130,153 @@ def main():
         "period_analysis": period_data
     }
     
-    save_json(final_report, f"roman_history_stage2/outputs/stage2_final_analysis_{create_timestamp()}.json")
+    save_json(final_report, output_path or f"roman_history_stage2/outputs/stage2_final_analysis_{create_timestamp()}.json")
+
+def run_terrain(events_data, period_data):
+    print("\n6. Rasterizing terrain heightmap...")
+    table = EventTable.from_events(events_data.get("events", []))
+    rasterizer = TerrainRasterizer()
+    heights = rasterizer.rasterize(table, period_data)
+    
+    info = save_heightmap(heights, os.path.join(TERRAIN_OUTPUT_DIR, HEIGHTMAP_NAME), metadata={
+        "event_count": len(table),
+        "period": "180-337 CE"
+    })
+    print(f"✓ Rasterized {len(table)} events onto a {info['width']}x{info['height']} heightmap")
+    return info
+
+def run_tile_store(events_data, period_data):
+    print("\nUpdating tiled heightmap store...")
+    table = EventTable.from_events(events_data.get("events", []))
+    store = HeightmapStore.open(TERRAIN_STORE_DIR, TERRAIN_WIDTH, TERRAIN_HEIGHT, TERRAIN_TILE_SIZE)
+    result = store.update(table, period_data)
+    
+    print(f"✓ Tile store generation {result['generation']}: tiles rewritten per level {result['tiles_written']}")
+    return result
+
+def run_animation(events_data, period_data):
+    print("\nRendering year-by-year terrain frames...")
+    animator = TerrainAnimator(EventTable.from_events(events_data.get("events", [])), period_data)
+    # One 16-bit scale for every frame, so heights compare across years
+    height_range = animator.height_range()
+    
+    frames = []
+    for year, heights, changed in animator.frames():
+        save_heightmap(heights, os.path.join(TERRAIN_FRAMES_DIR, f"heightmap_{year}"), height_range,
+                       metadata={"year": year, "kernels_changed": changed},
+                       formats=ANIMATION_FRAME_FORMATS, compression=ANIMATION_PNG_COMPRESSION, verbose=False)
+        frames.append({"year": year, "file": f"heightmap_{year}", "kernels_changed": changed})
+    
+    save_json({"height_range": height_range, "formats": list(ANIMATION_FRAME_FORMATS), "frames": frames},
+              os.path.join(TERRAIN_FRAMES_DIR, "frames.json"))
+    print(f"✓ Rendered {len(frames)} frames ({frames[0]['year']}-{frames[-1]['year']})" if frames else "✗ No frames rendered")
+    return frames
+
+def run_cascades(events_data, period_data):
+    print("\nPropagating cascade effects through the core themes...")
+    simulator = CascadeSimulator(EventTable.from_events(events_data.get("events", [])),
+                                 (period_data or {}).get("theme_relationships", []))
+    result = simulator.simulate()
+    save_json(simulator.to_series(result), INTENSITY_PATH)
+    
+    print(f"✓ Theme intensity for {simulator.years} years saved to {INTENSITY_PATH}")
+    return result
+
+def main():
+    args = parse_args()
+    
+    print("=== Roman Empire Historical Terrain Mapping Project - Stage 2 ===")
+    print("Event Analysis and Period Rating")
+    
+    # Create necessary directories
+    os.makedirs("roman_history_stage2/data/processed", exist_ok=True)
+    os.makedirs("roman_history_stage2/outputs", exist_ok=True)
+    
+    if args.step == "report":
+        mapping_result = load_json(THEME_MAPPING_PATH)
+        events_data = load_json(EVENTS_PATH)
+        period_data = load_json(PERIODS_PATH)
+        if not (mapping_result and events_data and period_data):
+            print("Error: run the themes, events and periods steps first")
+            return 1
+        write_report(mapping_result, events_data, period_data, args.output)
+        return 0
+    
+    if args.step in ("terrain", "tiles", "animation", "cascades"):
+        events_data = load_json(args.events)
+        events_data = events_data.get("historical_events", events_data)
+        period_data = load_json(PERIODS_PATH)
+        if not events_data.get("events"):
+            print("Error: no events to rasterize; run the events step first")
+            return 1
+        if args.step == "terrain":
+            run_terrain(events_data, period_data)
+        elif args.step == "tiles":
+            run_tile_store(events_data, period_data)
+        elif args.step == "animation":
+            run_animation(events_data, period_data)
+        else:
+            run_cascades(events_data, period_data)
+        return 0
+    
+    # 1. Load stage1 output
+    print("1. Loading stage1 output data...")
+    stage1_data = load_json(STAGE1_INPUT_PATH)
+    if not stage1_data:
+        print("Error: Cannot load stage1 output file")
+        return 1
+    
+    print(f"✓ Successfully loaded stage1 data, containing {len(stage1_data.get('core_themes', {}).get('themes', []))} original themes")
+    
+    # Core theme descriptions for prompts come from the fixed theme definitions
+    core_themes_description = ThemeMapper().get_core_themes_for_prompt()
+    
+    if args.step == "themes":
+        run_theme_mapping(stage1_data)
+        return 0
+    if args.step == "events":
+        return 0 if run_event_analysis(stage1_data, core_themes_description) else 1
+    if args.step == "periods":
+        return 0 if run_period_analysis(stage1_data, core_themes_description) else 1
+    
+    # 2. Theme mapping
+    mapping_result = run_theme_mapping(stage1_data)
+    
+    if ANALYSIS_CONCURRENT and not args.sequential:
+        # 3 + 4. Event and period analysis, side by side
+        analyses = run_analyses_concurrently(stage1_data, core_themes_description)
+        if not analyses:
+            return 1
+        events_data, period_data = analyses
+    else:
+        # 3. Event analysis
+        events_data = run_event_analysis(stage1_data, core_themes_description)
+        if not events_data:
+            return 1
+        
+        # 4. Period analysis
+        period_data = run_period_analysis(stage1_data, core_themes_description)
+        if not period_data:
+            return 1
+    
+    # 5. Generate final report
+    write_report(mapping_result, events_data, period_data, args.output)
+    
+    # 6. Terrain heightmap
+    run_terrain(events_data, period_data)
     
     print("\n=== Stage 2 Completed ===")
     print("Output Files:")
     print("- Theme mapping process: data/processed/theme_mapping_process.json")
-    print("- Historical events: data/processed/historical_events.json") 
+    print("- Historical events: data/processed/historical_events.json")
     print("- Period analysis: data/processed/period_analysis.json")
     print("- Complete report: outputs/stage2_final_analysis_*.json")
+    print("- Terrain heightmap: outputs/terrain/heightmap.png / .raw / .json")
+    
+    cache = AIClient().cache
+    if cache is not None:
+        print(f"Completion cache: {cache.stats()}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
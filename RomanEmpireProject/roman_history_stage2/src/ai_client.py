@@ -1,49 +1,265 @@
 # src/ai_client.py
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import threading
 import time
-from typing import Dict, Any
-from config.settings import AI_API_KEY, AI_BASE_URL, AI_MODEL
+from typing import Dict, Any, Iterator
+from config.settings import (
+    AI_API_KEY, AI_BASE_URL, AI_MODEL,
+    AI_HTTP_POOL_SIZE, AI_HTTP_CONNECT_TIMEOUT, AI_HTTP_READ_TIMEOUT,
+    AI_HTTP_CONNECT_RETRIES, AI_MAX_RETRIES, AI_STREAM_RESPONSES,
+    AI_RATE_LIMIT_RPM, AI_RATE_LIMIT_TPM, AI_RATE_LIMIT_HEADROOM,
+    AI_BATCH_MODE,
+    AI_CACHE_ENABLED, AI_CACHE_PATH, AI_CACHE_MAX_MB, AI_CACHE_MAX_AGE_DAYS
+)
+from src.completion_cache import get_completion_cache
+from src.rate_limiter import get_rate_limiter, parse_retry_after, backoff_delay
+from src.batch_client import BatchClient
+
+# Statuses that mean "slow down" rather than "bad request"
+RATE_LIMIT_STATUSES = (429, 503)
+
+class BatchIncompleteError(Exception):
+    """Raised when a batch finished without results for some prompts"""
+    def __init__(self, results: Dict[str, str], missing: list):
+        super().__init__(f"AI batch returned no result for {len(missing)} prompts: {', '.join(missing[:5])}")
+        self.results = results
+        self.missing = missing
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+def get_http_session(api_key: str) -> requests.Session:
+    """
+    Return the process-wide keep-alive session for an API key.
+    Connections are pooled per host; only failed connects are retried here,
+    request-level retries stay in AIClient.call_ai.
+    """
+    with _sessions_lock:
+        if api_key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=AI_HTTP_POOL_SIZE,
+                pool_maxsize=AI_HTTP_POOL_SIZE,
+                max_retries=Retry(
+                    total=AI_HTTP_CONNECT_RETRIES,
+                    connect=AI_HTTP_CONNECT_RETRIES,
+                    read=0,
+                    status=0,
+                    backoff_factor=0.5,
+                    allowed_methods=None,
+                    # 429/Retry-After handling belongs to the rate limiter
+                    respect_retry_after_header=False,
+                    raise_on_status=False
+                )
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            })
+            _sessions[api_key] = session
+        return _sessions[api_key]
 
 class AIClient:
     def __init__(self):
         self.api_key = AI_API_KEY
         self.base_url = AI_BASE_URL
         self.model = AI_MODEL
+        self.session = get_http_session(self.api_key)
+        self.timeout = (AI_HTTP_CONNECT_TIMEOUT, AI_HTTP_READ_TIMEOUT)
+        self.rate_limiter = get_rate_limiter(AI_RATE_LIMIT_RPM, AI_RATE_LIMIT_TPM, AI_RATE_LIMIT_HEADROOM)
+        self.temperature = 0.3
+        self.max_tokens = 4000
+        self.cache = get_completion_cache(
+            AI_CACHE_PATH,
+            max_bytes=AI_CACHE_MAX_MB * 1024 * 1024,
+            max_age_seconds=AI_CACHE_MAX_AGE_DAYS * 24 * 3600
+        ) if AI_CACHE_ENABLED else None
+        self.batch_mode = AI_BATCH_MODE
+        self.streaming = AI_STREAM_RESPONSES and not AI_BATCH_MODE
+        
+    def call_ai(self, prompt: str, max_retries: int = AI_MAX_RETRIES, prompt_tokens: int = None) -> str:
+        if self.batch_mode:
+            return self.call_ai_batch({"request-1": prompt})["request-1"]
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model, self.temperature, self.max_tokens, prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        
+        # Reserve prompt plus completion budget; roughly 4 characters per token if not counted
+        if prompt_tokens is None:
+            prompt_tokens = len(prompt) // 4
+        reserved_tokens = prompt_tokens + self.max_tokens
         
-    def call_ai(self, prompt: str, max_retries: int = 3) -> str:
         for attempt in range(max_retries):
+            retry_after = None
+            self.rate_limiter.acquire(reserved_tokens)
             try:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "model": self.model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.3,
-                    "max_tokens": 4000
-                }
-                
-                response = requests.post(
+                response = self.session.post(
                     f"{self.base_url}/chat/completions",
-                    headers=headers,
                     json=payload,
-                    timeout=180
+                    timeout=self.timeout
                 )
+                if response.status_code in RATE_LIMIT_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        self.rate_limiter.pause(retry_after)
+                    self.rate_limiter.settle(reserved_tokens, 0)
                 response.raise_for_status()
                 
                 result = response.json()
-                return result["choices"][0]["message"]["content"]
+                content = result["choices"][0]["message"]["content"]
+                used_tokens = result.get("usage", {}).get("total_tokens")
+                if used_tokens:
+                    self.rate_limiter.settle(reserved_tokens, used_tokens)
+                if cache_key is not None:
+                    self.cache.put(cache_key, content)
+                return content
                 
             except requests.exceptions.RequestException as e:
                 print(f"API call failed (attempt {attempt + 1}/{max_retries}): {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    # Retry-After already paused the limiter; otherwise back off with jitter
+                    if retry_after is None:
+                        time.sleep(backoff_delay(attempt))
                 else:
                     raise Exception(f"AI API call failed: {e}")
     
+    def stream_ai(self, prompt: str, max_retries: int = AI_MAX_RETRIES, prompt_tokens: int = None) -> Iterator[str]:
+        """
+        Yield the completion as text deltas from a streamed (SSE) response.
+        Closing the generator early closes the connection, which stops generation.
+        Only completions that streamed to the end are cached; a cache hit is
+        yielded as a single delta. Retries happen only before the first delta.
+        """
+        if self.batch_mode:
+            yield self.call_ai(prompt, max_retries, prompt_tokens)
+            return
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model, self.temperature, self.max_tokens, prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        
+        if prompt_tokens is None:
+            prompt_tokens = len(prompt) // 4
+        reserved_tokens = prompt_tokens + self.max_tokens
+        
+        for attempt in range(max_retries):
+            retry_after = None
+            started = False
+            self.rate_limiter.acquire(reserved_tokens)
+            try:
+                with self.session.post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    timeout=self.timeout,
+                    stream=True
+                ) as response:
+                    if response.status_code in RATE_LIMIT_STATUSES:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        if retry_after is not None:
+                            self.rate_limiter.pause(retry_after)
+                        self.rate_limiter.settle(reserved_tokens, 0)
+                    response.raise_for_status()
+                    
+                    parts = []
+                    # Only a stream that reached [DONE] or a finish_reason is a whole completion
+                    finished = False
+                    for line in response.iter_lines():
+                        if not line.startswith(b"data:"):
+                            continue
+                        data = line[len(b"data:"):].strip().decode("utf-8")
+                        if data == "[DONE]":
+                            finished = True
+                            break
+                        
+                        chunk = json.loads(data)
+                        used_tokens = (chunk.get("usage") or {}).get("total_tokens")
+                        if used_tokens:
+                            self.rate_limiter.settle(reserved_tokens, used_tokens)
+                        for choice in chunk.get("choices", []):
+                            if choice.get("finish_reason"):
+                                finished = True
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                started = True
+                                parts.append(delta)
+                                yield delta
+                    
+                    if not finished:
+                        raise requests.exceptions.ConnectionError("stream closed before the completion finished")
+                    if cache_key is not None:
+                        self.cache.put(cache_key, "".join(parts))
+                    return
+                
+            except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+                print(f"API stream failed (attempt {attempt + 1}/{max_retries}): {e}")
+                if started:
+                    raise Exception(f"AI API stream interrupted: {e}")
+                if attempt < max_retries - 1:
+                    if retry_after is None:
+                        time.sleep(backoff_delay(attempt))
+                else:
+                    raise Exception(f"AI API call failed: {e}")
+    
+    def call_ai_batch(self, prompts: Dict[str, str], name: str = "batch") -> Dict[str, str]:
+        """
+        Complete prompts (keyed by custom_id) through the batch endpoint.
+        Cached prompts are not resubmitted and new completions are cached;
+        raises if any prompt did not come back.
+        """
+        results = {}
+        pending = {}
+        for custom_id, prompt in prompts.items():
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.get(self.cache.make_key(self.model, self.temperature, self.max_tokens, prompt))
+            if cached is not None:
+                results[custom_id] = cached
+            else:
+                pending[custom_id] = prompt
+        
+        if pending:
+            batch_client = BatchClient(self.session, self.model, self.temperature, self.max_tokens)
+            completed = batch_client.run(pending, name)
+            for custom_id, content in completed.items():
+                if self.cache is not None:
+                    key = self.cache.make_key(self.model, self.temperature, self.max_tokens, pending[custom_id])
+                    self.cache.put(key, content)
+                results[custom_id] = content
+        
+        missing = [custom_id for custom_id in prompts if custom_id not in results]
+        if missing:
+            raise BatchIncompleteError(results, missing)
+        return results
+    
     def extract_json_from_response(self, response: str) -> Dict[str, Any]:
         try:
             return json.loads(response)
@@ -0,0 +1,191 @@
+# src/cascade_simulator.py
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config.settings import (HISTORY_START_YEAR, HISTORY_END_YEAR, CASCADE_PERSISTENCE,
+                             CASCADE_COUPLING, CASCADE_RELATIONSHIP_DELAY)
+from src.event_table import EventTable, THEME_KEYS
+
+# Intensities follow the event impact sign (positive = better for the empire),
+# while theme_relationships speak of the quantity a theme is named after:
+# "increased external threats lead to decreased internal stability" is a
+# negative relationship, but in impact terms both themes get worse together.
+# A theme whose named quantity grows as conditions worsen has polarity -1.
+THEME_POLARITY = {
+    "external_threat": -1
+}
+
+RELATIONSHIP_SIGNS = {
+    "positive": 1,
+    "negative": -1
+}
+
+def sparse_matvec(rows: np.ndarray, cols: np.ndarray, values: np.ndarray,
+                  vector: np.ndarray, size: int) -> np.ndarray:
+    """A @ vector for a sparse A given as (row, col, value) triplets; repeated entries add up"""
+    # bincount returns integers when there are no triplets at all
+    return np.bincount(rows, weights=values * vector[cols], minlength=size).astype(np.float64, copy=False)
+
+class CascadeSimulator:
+    """
+    Propagates event impacts through the core themes, year by year.
+    
+    The state is one intensity per (year, theme), flattened to
+    year_index * len(THEME_KEYS) + theme. Two sparse matrices drive it:
+      - the influence matrix (states x events): where each event lands, i.e.
+        its theme contributions spread over its year span plus its
+        cascade_effects, `impact_delay` years after it starts
+      - the propagation matrix (states x states): every (year, theme) passes
+        CASCADE_PERSISTENCE of its intensity to the same theme next year, and
+        CASCADE_COUPLING (signed) to each theme it is related to in
+        theme_relationships, `delay` years later (CASCADE_RELATIONSHIP_DELAY
+        unless the relationship gives one)
+    Every propagation edge points forward in time, so intensity = impulses +
+    propagation @ intensity is solved exactly in one pass over the years, each
+    year a sparse matrix-vector product over the edges that end in it.
+    Persistence plus the couplings into a theme should stay below 1, or the
+    series grows without bound.
+    """
+    
+    def __init__(self, table: EventTable, theme_relationships: Optional[List[Dict]] = None,
+                 start_year: int = HISTORY_START_YEAR, end_year: int = HISTORY_END_YEAR,
+                 persistence: float = CASCADE_PERSISTENCE, coupling: float = CASCADE_COUPLING,
+                 relationship_delay: int = CASCADE_RELATIONSHIP_DELAY):
+        self.table = table
+        self.theme_relationships = theme_relationships or []
+        self.start_year = start_year
+        self.end_year = end_year
+        self.persistence = persistence
+        self.coupling = coupling
+        self.relationship_delay = relationship_delay
+        self.years = end_year - start_year + 1
+        self.size = self.years * len(THEME_KEYS)
+    
+    def influence_matrix(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(state, event, value) triplets of every event's direct and cascade impulses inside the timeline"""
+        events = self.table.events
+        themes = len(THEME_KEYS)
+        known = np.flatnonzero(events["year_start"] >= 0)
+        
+        # One row per event-year, as in EventTable.theme_timeline
+        starts = events["year_start"][known]
+        spans = np.maximum(events["year_end"][known] - starts, 0) + 1
+        rows = np.repeat(np.arange(len(known)), spans)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(spans) - spans, spans)
+        years = starts[rows] + offsets - self.start_year
+        values = self.table.theme_contributions()[known][rows] / spans[rows, None]
+        
+        entry, theme = np.nonzero(values * ((years >= 0) & (years < self.years))[:, None])
+        states = [years[entry] * themes + theme]
+        sources = [known[rows[entry]]]
+        weights = [values[entry, theme]]
+        
+        cascades = self.table.cascades
+        if len(cascades):
+            years = events["year_start"][cascades["event"]] + cascades["delay"] - self.start_year
+            inside = np.flatnonzero((events["year_start"][cascades["event"]] >= 0) & (cascades["theme"] >= 0)
+                                    & (years >= 0) & (years < self.years))
+            states.append(years[inside] * themes + cascades["theme"][inside])
+            sources.append(cascades["event"][inside])
+            weights.append(self.table.cascade_contributions()[inside])
+        
+        return (np.concatenate(states).astype(np.int64), np.concatenate(sources).astype(np.int64),
+                np.concatenate(weights))
+    
+    def theme_couplings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (source theme, target theme, delay, weight) per distinct coupling:
+        persistence on the diagonal plus the theme_relationships, with repeated
+        (source, target, delay) combinations summed
+        """
+        theme_index = {key: i for i, key in enumerate(THEME_KEYS)}
+        diagonal = np.arange(len(THEME_KEYS))
+        sources, targets = [diagonal], [diagonal]
+        delays, weights = [np.ones(len(THEME_KEYS), dtype=np.int64)], [np.full(len(THEME_KEYS), self.persistence)]
+        
+        links = []
+        for relationship in self.theme_relationships:
+            theme_a, theme_b = relationship.get("theme_a"), relationship.get("theme_b")
+            sign = RELATIONSHIP_SIGNS.get(str(relationship.get("relationship", "")).strip().lower())
+            if theme_a not in theme_index or theme_b not in theme_index or sign is None:
+                continue
+            sign *= THEME_POLARITY.get(theme_a, 1) * THEME_POLARITY.get(theme_b, 1)
+            links.append((theme_index[theme_a], theme_index[theme_b],
+                          max(int(relationship.get("delay", self.relationship_delay)), 1),
+                          sign * self.coupling))
+        if links:
+            links = np.array(links)
+            sources.append(links[:, 0].astype(np.int64))
+            targets.append(links[:, 1].astype(np.int64))
+            delays.append(links[:, 2].astype(np.int64))
+            weights.append(links[:, 3])
+        
+        sources, targets = np.concatenate(sources), np.concatenate(targets)
+        delays, weights = np.concatenate(delays), np.concatenate(weights)
+        keys, inverse = np.unique(np.stack([sources, targets, delays], axis=1), axis=0, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=weights, minlength=len(keys))
+        kept = weights != 0
+        return keys[kept, 0], keys[kept, 1], keys[kept, 2], weights[kept]
+    
+    def propagation_matrix(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (target state, source state, value) triplets sorted by target, plus the
+        offset of each target year's first edge (years + 1 entries)
+        """
+        themes = len(THEME_KEYS)
+        sources, targets, delays, weights = self.theme_couplings()
+        
+        # Each coupling repeats for every target year its delay can reach
+        counts = np.maximum(self.years - delays, 0)
+        coupling = np.repeat(np.arange(len(delays)), counts)
+        target_years = (np.arange(len(coupling)) - np.repeat(np.cumsum(counts) - counts, counts)
+                        + delays[coupling])
+        rows = target_years * themes + targets[coupling]
+        cols = (target_years - delays[coupling]) * themes + sources[coupling]
+        
+        order = np.argsort(rows, kind="stable")
+        rows, cols, values = rows[order], cols[order], weights[coupling][order]
+        year_offsets = np.searchsorted(rows, np.arange(self.years + 1) * themes)
+        return rows, cols, values, year_offsets
+    
+    def impulses(self, event_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """(years, themes) direct and cascade impulses, optionally with each event scaled by event_weights"""
+        states, sources, values = self.influence_matrix()
+        if event_weights is None:
+            event_weights = np.ones(len(self.table))
+        return sparse_matvec(states, sources, values, np.asarray(event_weights, dtype=np.float64),
+                             self.size).reshape(self.years, len(THEME_KEYS))
+    
+    def simulate(self, event_weights: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Intensity per (year, theme) after propagation. Returns "intensity",
+        "impulses" and "propagated" (their difference), each (years, themes).
+        """
+        themes = len(THEME_KEYS)
+        impulses = self.impulses(event_weights)
+        rows, cols, values, year_offsets = self.propagation_matrix()
+        
+        intensity = impulses.ravel().copy()
+        for year in range(1, self.years):
+            edges = slice(year_offsets[year], year_offsets[year + 1])
+            incoming = sparse_matvec(rows[edges] - year * themes, cols[edges], values[edges], intensity, themes)
+            intensity[year * themes:(year + 1) * themes] += incoming
+        
+        intensity = intensity.reshape(self.years, themes)
+        return {"intensity": intensity, "impulses": impulses, "propagated": intensity - impulses}
+    
+    def to_series(self, result: Optional[Dict[str, np.ndarray]] = None) -> Dict:
+        """Simulation result as JSON-ready per-theme series"""
+        result = result or self.simulate()
+        return {
+            "start_year": self.start_year,
+            "end_year": self.end_year,
+            "parameters": {
+                "persistence": self.persistence,
+                "coupling": self.coupling,
+                "relationship_delay": self.relationship_delay
+            },
+            "themes": THEME_KEYS,
+            "years": list(range(self.start_year, self.end_year + 1)),
+            **{name: {key: [round(float(value), 4) for value in series[:, i]] for i, key in enumerate(THEME_KEYS)}
+               for name, series in result.items()}
+        }
@@ -0,0 +1,135 @@
+# src/completion_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+class CompletionCache:
+    """
+    Content-addressed on-disk cache for LLM completions (SQLite).
+
+    Entries are keyed on a hash of model, temperature, max_tokens and prompt,
+    expire after max_age_seconds and are evicted least-recently-used first
+    once the stored responses exceed max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 200 * 1024 * 1024, max_age_seconds: float = 30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Pipeline steps run in separate processes against the same file
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        """Hash the request parameters that determine the completion"""
+        request = json.dumps(
+            {"model": model, "temperature": temperature, "max_tokens": max_tokens, "prompt": prompt},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[2] > self.max_age_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            self.bytes_read += row[1]
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Store a completion and evict old entries if over budget"""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._conn.commit()
+            self.bytes_written += size
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM completions WHERE created < ?", (time.time() - self.max_age_seconds,)
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                stale_keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY accessed"):
+                    stale_keys.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM completions WHERE key = ?", stale_keys)
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss and byte counters for this process, plus current cache size"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "entries": entries,
+            "stored_bytes": total
+        }
+
+_caches: Dict[str, CompletionCache] = {}
+_caches_lock = threading.Lock()
+
+def get_completion_cache(path: str, max_bytes: int, max_age_seconds: float) -> CompletionCache:
+    """Return the process-wide cache for a path so every AIClient shares counters"""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = CompletionCache(path, max_bytes, max_age_seconds)
+        return _caches[path]
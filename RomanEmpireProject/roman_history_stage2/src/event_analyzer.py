@@ -1,10 +1,19 @@
 # src/event_analyzer.py
 import json
-from typing import Dict, List
+from contextlib import closing
+from typing import Dict, List, Optional
 from config.settings import HISTORICAL_PERIODS, GEOGRAPHIC_REGIONS
 from src.ai_client import AIClient
+from src.event_table import EventTable
+from src.json_stream import JsonArrayStreamParser, MalformedStreamError
 from src.utils import save_json
 
+# Accepted event count and the fields every event must carry
+MIN_EVENTS = 20
+MAX_EVENTS = 40
+REQUIRED_EVENT_FIELDS = ["year", "name", "primary_themes", "base_impact",
+                         "geographic_scope", "temporal_scope", "description"]
+
 class EventAnalyzer:
     def __init__(self):
         self.ai_client = AIClient()
@@ -88,6 +97,9 @@ Remember: respond **only with valid JSON**, no text or comments outside JSON.
         prompt = self.create_events_prompt(stage_summaries, core_themes_description)
         
         print("Analyzing historical events...")
+        if self.ai_client.streaming:
+            return self._extract_events_streaming(prompt)
+        
         response = self.ai_client.call_ai(prompt)
 
         # print raw output for debugging if needed
@@ -105,6 +117,60 @@ Remember: respond **only with valid JSON**, no text or comments outside JSON.
             print("✗ Event analysis failed — no valid JSON or missing fields.")
         return {}
     
+    def _extract_events_streaming(self, prompt: str) -> Dict:
+        """
+        Stream the completion and validate each event as soon as it closes; impacts
+        are computed for all events at once when the stream ends.
+        The stream is closed at the first sign of a bad response (no events array,
+        junk between events, an invalid event or too many events).
+        """
+        parser = JsonArrayStreamParser("events")
+        events = []
+        preview = []
+        
+        try:
+            with closing(self.ai_client.stream_ai(prompt)) as stream:
+                for delta in stream:
+                    if sum(len(part) for part in preview) < 500:
+                        preview.append(delta)
+                    
+                    for event in parser.feed(delta):
+                        problem = self._check_event(event)
+                        if problem:
+                            raise MalformedStreamError(f"event {len(events) + 1}: {problem}")
+                        events.append(event)
+                        print(f"  Event {len(events)}: {event['year']} {event['name']}")
+                        
+                        if len(events) > MAX_EVENTS:
+                            raise MalformedStreamError(f"Abnormal event count: more than {MAX_EVENTS}")
+                parser.finish()
+        except MalformedStreamError as e:
+            print("\n--- RAW MODEL RESPONSE ---\n", "".join(preview)[:500], "...\n")
+            print(f"✗ Event analysis aborted — {e}")
+            return {}
+        
+        events_data = {"events": events}
+        if self._validate_events(events_data):
+            events_data = self._calculate_comprehensive_impact(events_data)
+            save_json(events_data, "roman_history_stage2/data/processed/historical_events.json")
+            return events_data
+        else:
+            print("✗ Event analysis failed — no valid JSON or missing fields.")
+        return {}
+    
+    def _check_event(self, event) -> Optional[str]:
+        """Return why a single event is unusable, or None if it is fine"""
+        if not isinstance(event, dict):
+            return "not a JSON object"
+        for field in REQUIRED_EVENT_FIELDS:
+            if field not in event:
+                return f"missing field: {field}"
+        if not isinstance(event["geographic_scope"], dict) or "scope_score" not in event["geographic_scope"]:
+            return "missing geographic_scope.scope_score"
+        if not isinstance(event["temporal_scope"], dict) or "duration_score" not in event["temporal_scope"]:
+            return "missing temporal_scope.duration_score"
+        return None
+    
     def _validate_events(self, events_data: Dict) -> bool:
         """Validate event data"""
         if not isinstance(events_data, dict) or "events" not in events_data:
@@ -112,15 +178,12 @@ Remember: respond **only with valid JSON**, no text or comments outside JSON.
             return False
         
         events = events_data["events"]
-        if len(events) < 20 or len(events) > 40:
+        if len(events) < MIN_EVENTS or len(events) > MAX_EVENTS:
             print(f"Abnormal event count: {len(events)}")
             return False
         
-        required_fields = ["year", "name", "primary_themes", "base_impact", 
-                          "geographic_scope", "temporal_scope", "description"]
-        
         for event in events:
-            for field in required_fields:
+            for field in REQUIRED_EVENT_FIELDS:
                 if field not in event:
                     print(f"Event missing field: {field}")
                     return False
@@ -128,14 +191,9 @@ Remember: respond **only with valid JSON**, no text or comments outside JSON.
         return True
     
     def _calculate_comprehensive_impact(self, events_data: Dict) -> Dict:
-        """Calculate comprehensive impact values"""
-        for event in events_data["events"]:
-            geo_score = event["geographic_scope"]["scope_score"]
-            duration_score = event["temporal_scope"]["duration_score"]
-            base_impact = event["base_impact"]
-            
-            # Calculate comprehensive impact
-            comprehensive_impact = base_impact * (geo_score / 10) * (duration_score / 10)
-            event["comprehensive_impact"] = round(comprehensive_impact, 2)
+        """Calculate comprehensive impact values for all events at once"""
+        table = EventTable.from_events(events_data["events"])
+        for event, impact in zip(events_data["events"], table.events["comprehensive_impact"]):
+            event["comprehensive_impact"] = round(float(impact), 2)
         
         return events_data
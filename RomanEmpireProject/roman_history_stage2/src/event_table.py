@@ -0,0 +1,239 @@
+# src/event_table.py
+import copy
+import re
+import numpy as np
+from typing import Dict, List, Tuple
+from config.settings import HISTORY_START_YEAR, HISTORY_END_YEAR
+from config.themes_mapping import CORE_TERRAIN_THEMES
+from src.utils import load_json, save_json
+
+# Column order of per-theme arrays; also the order of the curated `type_ratings`
+THEME_KEYS = list(CORE_TERRAIN_THEMES)
+
+# Event schemas: LLM-extracted (EventAnalyzer output) and the curated event list
+SCHEMA_EXTRACTED = 0
+SCHEMA_CURATED = 1
+
+EVENT_DTYPE = np.dtype([
+    ("year_start", "i4"),               # -1 when the year label cannot be read
+    ("year_end", "i4"),
+    ("base_impact", "f8"),              # signed, -10..10
+    ("scope_score", "f8"),              # geographic scope, 1..10
+    ("duration_score", "f8"),
+    ("centrality", "f8"),               # 0..1, 1 = heart of the empire, for both schemas
+    ("theme_weights", "f8", (len(THEME_KEYS),)),
+    ("comprehensive_impact", "f8"),
+    ("schema", "u1"),
+    ("name", "O"),
+    ("source", "O")                     # the original event dict, for export
+])
+
+CASCADE_DTYPE = np.dtype([
+    ("event", "i4"),                    # row in the event table
+    ("theme", "i4"),                    # index into THEME_KEYS, -1 if unknown
+    ("delay", "i4"),                    # years after the event starts
+    ("strength", "f8"),
+    ("affected_theme", "O")
+])
+
+YEAR_PATTERN = re.compile(r'\d{3,4}')
+CENTURY_PATTERN = re.compile(r'(early|mid|late)?\W*(\d+)(?:st|nd|rd|th)\s+century', re.IGNORECASE)
+
+def parse_year_span(label) -> Tuple[int, int]:
+    """
+    First and last year of an event's year label: 193, "193–211", "c.235",
+    "260s–273" or "Late 3rd Century" (thirds of the century). (-1, -1) if unreadable.
+    """
+    if isinstance(label, (int, float)):
+        return int(label), int(label)
+    
+    years = [int(y) for y in YEAR_PATTERN.findall(str(label))]
+    if years:
+        return years[0], years[-1]
+    
+    match = CENTURY_PATTERN.search(str(label))
+    if match:
+        first = (int(match.group(2)) - 1) * 100 + 1
+        part = (match.group(1) or "").lower()
+        if part == "early":
+            return first, first + 32
+        if part == "mid":
+            return first + 33, first + 65
+        if part == "late":
+            return first + 66, first + 99
+        return first, first + 99
+    return -1, -1
+
+class EventTable:
+    """
+    Columnar table of historical events over a NumPy structured array.
+    
+    Loads both event schemas into the same columns, computes comprehensive
+    impact, per-theme contributions and cascade effects as array operations,
+    and exports each event back in the schema it was loaded from.
+    
+    Theme weights: an extracted event splits its impact equally over its
+    primary_themes; a curated event splits it in proportion to its type_ratings.
+    """
+    
+    def __init__(self, events: np.ndarray, cascades: np.ndarray):
+        self.events = events
+        self.cascades = cascades
+        self.update_impact()
+    
+    @classmethod
+    def from_events(cls, events: List[Dict]) -> "EventTable":
+        table = np.zeros(len(events), dtype=EVENT_DTYPE)
+        cascades = []
+        theme_index = {key: i for i, key in enumerate(THEME_KEYS)}
+        
+        for row, event in enumerate(events):
+            record = table[row]
+            record["year_start"], record["year_end"] = parse_year_span(event.get("year"))
+            record["name"] = event.get("name", "")
+            record["source"] = event
+            
+            if "type_ratings" in event:
+                record["schema"] = SCHEMA_CURATED
+                record["base_impact"] = event.get("impact", 0)
+                record["scope_score"] = event.get("geographic_scope", 0)
+                record["duration_score"] = event.get("duration_score", 0)
+                # The curated scale runs the other way: 0 (Rome) to 10 (the far frontier)
+                record["centrality"] = 1 - event.get("location", {}).get("centrality", 0) / 10
+                ratings = np.asarray(event["type_ratings"][:len(THEME_KEYS)], dtype="f8")
+                record["theme_weights"][:len(ratings)] = ratings
+            else:
+                record["schema"] = SCHEMA_EXTRACTED
+                geographic_scope = event.get("geographic_scope", {})
+                record["base_impact"] = event.get("base_impact", 0)
+                record["scope_score"] = geographic_scope.get("scope_score", 0)
+                record["duration_score"] = event.get("temporal_scope", {}).get("duration_score", 0)
+                record["centrality"] = geographic_scope.get("centrality", 0)
+                for theme in event.get("primary_themes", []):
+                    if theme in theme_index:
+                        record["theme_weights"][theme_index[theme]] = 1
+                
+                for cascade in event.get("cascade_effects", []):
+                    theme = cascade.get("affected_theme")
+                    cascades.append((row, theme_index.get(theme, -1), cascade.get("impact_delay", 0),
+                                     cascade.get("impact_strength", 0), theme))
+        
+        # Normalise weights per event; events with no known theme keep all zeros
+        weights = table["theme_weights"]
+        totals = weights.sum(axis=1, keepdims=True)
+        np.divide(weights, totals, out=weights, where=totals > 0)
+        
+        return cls(table, np.array(cascades, dtype=CASCADE_DTYPE))
+    
+    @classmethod
+    def load(cls, file_path: str) -> "EventTable":
+        """Load {"events": [...]}, or a report holding it under "historical_events" """
+        data = load_json(file_path)
+        if "historical_events" in data:
+            data = data["historical_events"]
+        return cls.from_events(data.get("events", []))
+    
+    def __len__(self):
+        return len(self.events)
+    
+    def update_impact(self):
+        """Comprehensive impact = base_impact * scope/10 * duration/10, for every event"""
+        events = self.events
+        events["comprehensive_impact"] = (
+            events["base_impact"] * (events["scope_score"] / 10) * (events["duration_score"] / 10)
+        )
+    
+    def theme_contributions(self) -> np.ndarray:
+        """(events, themes) share of each event's comprehensive impact per core theme"""
+        return self.events["comprehensive_impact"][:, None] * self.events["theme_weights"]
+    
+    def cascade_contributions(self) -> np.ndarray:
+        """Effect of each cascade, scaled by its source event's scope and duration"""
+        source = self.events[self.cascades["event"]]
+        return self.cascades["strength"] * (source["scope_score"] / 10) * (source["duration_score"] / 10)
+    
+    def theme_timeline(self, start_year: int = HISTORY_START_YEAR, end_year: int = HISTORY_END_YEAR,
+                       include_cascades: bool = True) -> np.ndarray:
+        """
+        (years, themes) net effect per year from start_year to end_year. An event's
+        contribution is spread evenly over its year span; a cascade lands on its
+        affected theme `delay` years after its event starts. Events with
+        unreadable years are left out.
+        """
+        timeline = np.zeros((end_year - start_year + 1, len(THEME_KEYS)))
+        events = self.events
+        known = np.flatnonzero(events["year_start"] >= 0)
+        
+        starts = events["year_start"][known]
+        spans = np.maximum(events["year_end"][known] - starts, 0) + 1
+        rows = np.repeat(np.arange(len(known)), spans)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(spans) - spans, spans)
+        years = starts[rows] + offsets
+        values = self.theme_contributions()[known][rows] / spans[rows, None]
+        
+        inside = (years >= start_year) & (years <= end_year)
+        np.add.at(timeline, years[inside] - start_year, values[inside])
+        
+        if include_cascades and len(self.cascades):
+            cascades = self.cascades
+            years = events["year_start"][cascades["event"]] + cascades["delay"]
+            inside = ((events["year_start"][cascades["event"]] >= 0) & (cascades["theme"] >= 0)
+                      & (years >= start_year) & (years <= end_year))
+            np.add.at(timeline, (years[inside] - start_year, cascades["theme"][inside]),
+                      self.cascade_contributions()[inside])
+        
+        return timeline
+    
+    def theme_totals(self, include_cascades: bool = True) -> Dict[str, float]:
+        """Net effect per core theme over all events"""
+        totals = self.theme_contributions().sum(axis=0)
+        if include_cascades and len(self.cascades):
+            known = self.cascades["theme"] >= 0
+            np.add.at(totals, self.cascades["theme"][known], self.cascade_contributions()[known])
+        return {key: round(float(value), 2) for key, value in zip(THEME_KEYS, totals)}
+    
+    def to_events(self, include_impact: bool = False) -> List[Dict]:
+        """
+        Events as dicts in their original schema, with the table's current values.
+        Extracted events always carry comprehensive_impact (as EventAnalyzer writes
+        them); curated events only when include_impact is set.
+        """
+        cascades_by_event = {}
+        for cascade in self.cascades:
+            cascades_by_event.setdefault(int(cascade["event"]), []).append({
+                "affected_theme": cascade["affected_theme"],
+                "impact_delay": _json_number(cascade["delay"]),
+                "impact_strength": _json_number(cascade["strength"])
+            })
+        
+        exported = []
+        for row, record in enumerate(self.events):
+            event = copy.deepcopy(record["source"])
+            impact = round(float(record["comprehensive_impact"]), 2)
+            
+            if record["schema"] == SCHEMA_CURATED:
+                event["impact"] = _json_number(record["base_impact"])
+                event["geographic_scope"] = _json_number(record["scope_score"])
+                event["duration_score"] = _json_number(record["duration_score"])
+                event.setdefault("location", {})["centrality"] = _json_number(round((1 - record["centrality"]) * 10, 6))
+                if include_impact:
+                    event["comprehensive_impact"] = impact
+            else:
+                event["base_impact"] = _json_number(record["base_impact"])
+                event.setdefault("geographic_scope", {})["scope_score"] = _json_number(record["scope_score"])
+                event["geographic_scope"]["centrality"] = _json_number(record["centrality"])
+                event.setdefault("temporal_scope", {})["duration_score"] = _json_number(record["duration_score"])
+                event["comprehensive_impact"] = impact
+                if "cascade_effects" in event or row in cascades_by_event:
+                    event["cascade_effects"] = cascades_by_event.get(row, [])
+            
+            exported.append(event)
+        return exported
+    
+    def save(self, file_path: str, include_impact: bool = False):
+        save_json({"events": self.to_events(include_impact)}, file_path)
+
+def _json_number(value):
+    """Plain int for whole numbers, float otherwise, so exported JSON keeps its look"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
@@ -0,0 +1,228 @@
+# src/heightmap_store.py
+import json
+import math
+import os
+import numpy as np
+from typing import Dict, Optional, Set, Tuple
+from src.event_table import EventTable
+from src.terrain_rasterizer import TerrainRasterizer
+
+MANIFEST_NAME = "store.json"
+KERNELS_NAME = "kernels.npy"
+FORMAT_VERSION = 1
+
+# A kernel is treated as touching pixels within this many sigmas of its centre
+KERNEL_CUTOFF_SIGMAS = 5.0
+
+KERNEL_DTYPE = np.dtype([("x", "f8"), ("y", "f8"), ("sigma", "f8"), ("amplitude", "f8")])
+
+def changed_kernels(previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """
+    Kernels whose count differs between two kernel lists, compared as multisets:
+    two events with identical kernels count twice, so adding or removing one
+    of them is still a change
+    """
+    kernels, inverse = np.unique(np.concatenate([previous, current]), return_inverse=True)
+    inverse = inverse.ravel()
+    before = np.bincount(inverse[:len(previous)], minlength=len(kernels))
+    after = np.bincount(inverse[len(previous):], minlength=len(kernels))
+    return kernels[before != after]
+
+class HeightmapStore:
+    """
+    Tiled on-disk heightmap with a mip pyramid, for grids too large to hold or
+    rewrite whole (e.g. 16384 x 16384).
+    
+    Layout of the store directory:
+      store.json         manifest: size, tile size, levels, generation
+      level_<k>.f32      level k (level 0 = full size, each next level half the
+                         size), float32 little-endian, tile-major: tile (ty, tx)
+                         starts at byte ((ty * tiles_x) + tx) * tile_size**2 * 4
+                         and holds tile_size rows of tile_size samples
+      level_<k>.gen      uint32 per tile: the generation that last wrote it
+      kernels.npy        the event kernels the tiles were rendered from
+    
+    update() re-renders only the level-0 tiles that changed kernels touch (all
+    of them when the period ratings or the rasterizer layout change), then the
+    pyramid tiles above them.
+    Viewers can stream the tiles they show and re-read those whose generation
+    is newer than the one they have.
+    """
+    
+    def __init__(self, path: str, width: int, height: int, tile_size: int = 512):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.levels = []
+        self.generation = 0
+        self.base_key = None
+        
+        tiles_x, tiles_y = math.ceil(width / tile_size), math.ceil(height / tile_size)
+        level_width, level_height = width, height
+        while True:
+            self.levels.append({
+                "file": f"level_{len(self.levels)}.f32",
+                "versions": f"level_{len(self.levels)}.gen",
+                "width": level_width,
+                "height": level_height,
+                "tiles_x": tiles_x,
+                "tiles_y": tiles_y
+            })
+            if tiles_x == 1 and tiles_y == 1:
+                break
+            tiles_x, tiles_y = math.ceil(tiles_x / 2), math.ceil(tiles_y / 2)
+            level_width, level_height = math.ceil(level_width / 2), math.ceil(level_height / 2)
+    
+    @classmethod
+    def open(cls, path: str, width: int, height: int, tile_size: int = 512) -> "HeightmapStore":
+        """Open the store at path, starting it afresh if missing or of another size"""
+        store = cls(path, width, height, tile_size)
+        manifest = store._read_manifest()
+        if (manifest and manifest.get("format_version") == FORMAT_VERSION
+                and (manifest["width"], manifest["height"], manifest["tile_size"]) == (width, height, tile_size)):
+            store.generation = manifest["generation"]
+            store.base_key = manifest.get("base_key")
+            mode = "r+"
+        else:
+            mode = "w+"
+            if os.path.exists(os.path.join(path, KERNELS_NAME)):
+                os.remove(os.path.join(path, KERNELS_NAME))
+        
+        os.makedirs(path, exist_ok=True)
+        store._tiles = [store._map(level["file"], "<f4", level, mode, (tile_size, tile_size))
+                        for level in store.levels]
+        store._versions = [store._map(level["versions"], "<u4", level, mode, ())
+                           for level in store.levels]
+        return store
+    
+    def _map(self, name: str, dtype: str, level: Dict, mode: str, tile_shape: Tuple) -> np.memmap:
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode=mode,
+                         shape=(level["tiles_y"], level["tiles_x"]) + tile_shape)
+    
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.path, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def _write_manifest(self):
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "width": self.width,
+            "height": self.height,
+            "tile_size": self.tile_size,
+            "dtype": "<f4",
+            "generation": self.generation,
+            "base_key": self.base_key,
+            "levels": self.levels
+        }
+        temp_path = os.path.join(self.path, MANIFEST_NAME + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, os.path.join(self.path, MANIFEST_NAME))
+    
+    def tile(self, level: int, ty: int, tx: int) -> np.ndarray:
+        """One tile (a view into the memory map)"""
+        return self._tiles[level][ty, tx]
+    
+    def tile_generation(self, level: int, ty: int, tx: int) -> int:
+        return int(self._versions[level][ty, tx])
+    
+    def read_window(self, level: int, rows: Tuple[int, int], cols: Tuple[int, int]) -> np.ndarray:
+        """Pixels [rows[0], rows[1]) x [cols[0], cols[1]) of a level, read from only the tiles they cover"""
+        size = self.tile_size
+        window = np.empty((rows[1] - rows[0], cols[1] - cols[0]), dtype=np.float32)
+        for ty in range(rows[0] // size, (rows[1] - 1) // size + 1):
+            for tx in range(cols[0] // size, (cols[1] - 1) // size + 1):
+                y0, y1 = max(rows[0], ty * size), min(rows[1], (ty + 1) * size)
+                x0, x1 = max(cols[0], tx * size), min(cols[1], (tx + 1) * size)
+                window[y0 - rows[0]:y1 - rows[0], x0 - cols[0]:x1 - cols[0]] = \
+                    self._tiles[level][ty, tx, y0 - ty * size:y1 - ty * size, x0 - tx * size:x1 - tx * size]
+        return window
+    
+    def update(self, table: EventTable, period_ratings: Optional[Dict] = None,
+               rasterizer: Optional[TerrainRasterizer] = None) -> Dict:
+        """
+        Bring the tiles in line with the events and period ratings, rendering only
+        what changed. Returns the number of tiles written per level.
+        """
+        rasterizer = rasterizer or TerrainRasterizer(self.width, self.height)
+        splats = rasterizer.event_splats(table)
+        kernels = np.zeros(len(splats["x"]), dtype=KERNEL_DTYPE)
+        for field in KERNEL_DTYPE.names:
+            kernels[field] = splats[field]
+        
+        # Anything that changes the terrain under every kernel: the rasterizer's
+        # layout and the period scores; when it differs, every tile is re-rendered
+        scores = rasterizer.theme_scores(period_ratings) if period_ratings else None
+        base_key = json.dumps({
+            "layout": rasterizer.layout(),
+            "scores": {theme: round(score, 9) for theme, score in scores.items()} if scores else None
+        }, sort_keys=True)
+        
+        previous = self._load_kernels()
+        if previous is None or base_key != self.base_key:
+            dirty = {(ty, tx) for ty in range(self.levels[0]["tiles_y"]) for tx in range(self.levels[0]["tiles_x"])}
+        else:
+            dirty = self._touched_tiles(changed_kernels(previous, kernels))
+        
+        written = [0] * len(self.levels)
+        if dirty:
+            self.generation += 1
+            grid = rasterizer.work_grid(table, period_ratings)
+            size = self.tile_size
+            for ty, tx in sorted(dirty):
+                self._tiles[0][ty, tx] = rasterizer.render_window(
+                    grid, (ty * size, (ty + 1) * size), (tx * size, (tx + 1) * size))
+                self._versions[0][ty, tx] = self.generation
+            written[0] = len(dirty)
+            
+            for level in range(1, len(self.levels)):
+                dirty = {(ty // 2, tx // 2) for ty, tx in dirty}
+                for ty, tx in sorted(dirty):
+                    self._tiles[level][ty, tx] = self._downsample_children(level, ty, tx)
+                    self._versions[level][ty, tx] = self.generation
+                written[level] = len(dirty)
+            
+            for array in self._tiles + self._versions:
+                array.flush()
+        
+        np.save(os.path.join(self.path, KERNELS_NAME), kernels)
+        self.base_key = base_key
+        self._write_manifest()
+        return {"generation": self.generation, "tiles_written": written}
+    
+    def _load_kernels(self) -> Optional[np.ndarray]:
+        try:
+            return np.load(os.path.join(self.path, KERNELS_NAME))
+        except FileNotFoundError:
+            return None
+    
+    def _touched_tiles(self, kernels: np.ndarray) -> Set[Tuple[int, int]]:
+        """Level-0 tiles within KERNEL_CUTOFF_SIGMAS of any of the given kernels"""
+        size = self.tile_size
+        tiles_y, tiles_x = self.levels[0]["tiles_y"], self.levels[0]["tiles_x"]
+        reach = KERNEL_CUTOFF_SIGMAS * kernels["sigma"]
+        first_x = np.clip(np.floor((kernels["x"] - reach) / size), 0, tiles_x - 1).astype(int)
+        last_x = np.clip(np.floor((kernels["x"] + reach) / size), 0, tiles_x - 1).astype(int)
+        first_y = np.clip(np.floor((kernels["y"] - reach) / size), 0, tiles_y - 1).astype(int)
+        last_y = np.clip(np.floor((kernels["y"] + reach) / size), 0, tiles_y - 1).astype(int)
+        
+        touched = np.zeros((tiles_y, tiles_x), dtype=bool)
+        for y0, y1, x0, x1 in zip(first_y, last_y, first_x, last_x):
+            touched[y0:y1 + 1, x0:x1 + 1] = True
+        return {(int(ty), int(tx)) for ty, tx in zip(*np.nonzero(touched))}
+    
+    def _downsample_children(self, level: int, ty: int, tx: int) -> np.ndarray:
+        """A tile of `level` as the 2x2 mean of the (up to four) tiles below it"""
+        size = self.tile_size
+        below = self._tiles[level - 1]
+        children = np.zeros((size * 2, size * 2), dtype=np.float32)
+        for dy in range(2):
+            for dx in range(2):
+                cy, cx = ty * 2 + dy, tx * 2 + dx
+                if cy < below.shape[0] and cx < below.shape[1]:
+                    children[dy * size:(dy + 1) * size, dx * size:(dx + 1) * size] = below[cy, cx]
+        return children.reshape(size, 2, size, 2).mean(axis=(1, 3))
@@ -0,0 +1,130 @@
+# src/json_stream.py
+import json
+import re
+from typing import Any, List
+
+class MalformedStreamError(ValueError):
+    """Raised as soon as a streamed response can no longer become the expected JSON"""
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a streamed object of the form {"<key>": [{...}, {...}]}.
+
+    feed() takes raw text deltas and returns each array element as soon as its
+    closing brace arrives. It raises MalformedStreamError once the text cannot
+    have that shape: too much prose before the JSON, no "<key>" array, junk
+    between elements, or an element that is not valid JSON.
+    """
+
+    def __init__(self, key: str, max_preamble: int = 300):
+        self.key = key
+        self.key_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self.max_preamble = max_preamble
+        self.buffer = ""
+        self.state = "preamble"
+        self.pos = 0
+        self.count = 0
+        # Element scanning state
+        self.start = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.need_separator = False
+
+    @property
+    def done(self) -> bool:
+        """True once the array has closed"""
+        return self.state == "done"
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume a text delta and return the elements completed by it"""
+        elements = []
+        self.buffer += text
+
+        if self.state == "preamble":
+            self._find_array()
+        if self.state in ("array", "element"):
+            self._scan(elements)
+
+        return elements
+
+    def finish(self):
+        """Raise if the stream ended before the array closed (e.g. a truncated completion)"""
+        if self.state == "preamble":
+            raise MalformedStreamError(f'response contains no "{self.key}" array')
+        if self.state != "done":
+            raise MalformedStreamError(f'response ended inside the "{self.key}" array after {self.count} elements')
+
+    def _find_array(self):
+        brace = self.buffer.find("{")
+        if brace < 0 or brace > self.max_preamble:
+            if len(self.buffer.lstrip()) > self.max_preamble:
+                raise MalformedStreamError("response does not start with a JSON object")
+            return
+
+        match = self.key_pattern.search(self.buffer, brace)
+        if match is None:
+            if len(self.buffer) - brace > self.max_preamble:
+                raise MalformedStreamError(f'JSON object does not open with a "{self.key}" array')
+            return
+
+        self.state = "array"
+        self.buffer = self.buffer[match.end():]
+        self.pos = 0
+
+    def _scan(self, elements: List[Any]):
+        buffer = self.buffer
+        i = self.pos
+
+        while i < len(buffer) and self.state != "done":
+            char = buffer[i]
+
+            if self.state == "array":
+                if char.isspace():
+                    pass
+                elif char == "{" and not self.need_separator:
+                    self.state = "element"
+                    self.start = i
+                    self.depth = 1
+                elif char == "," and self.need_separator:
+                    self.need_separator = False
+                elif char == "]":
+                    self.state = "done"
+                else:
+                    raise MalformedStreamError(
+                        f'unexpected {char!r} in "{self.key}" array after {self.count} elements'
+                    )
+
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        elements.append(json.loads(buffer[self.start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        raise MalformedStreamError(f"element {self.count + 1} is not valid JSON: {e}")
+                    self.count += 1
+                    self.state = "array"
+                    self.need_separator = True
+
+            i += 1
+
+        # Keep only the unfinished element so the buffer stays small
+        if self.state == "element":
+            self.buffer = buffer[self.start:]
+            self.pos = i - self.start
+            self.start = 0
+        else:
+            self.buffer = ""
+            self.pos = 0
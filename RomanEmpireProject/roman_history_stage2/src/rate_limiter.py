@@ -0,0 +1,99 @@
+# src/rate_limiter.py
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+class RateLimiter:
+    """
+    Token-bucket pacing for requests-per-minute and tokens-per-minute limits.
+
+    Both buckets refill continuously; acquire() blocks until one request and the
+    estimated tokens fit, and pause() holds every caller back (e.g. for Retry-After).
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, headroom: float = 0.9):
+        self.request_rate = requests_per_minute * headroom / 60.0
+        self.token_rate = tokens_per_minute * headroom / 60.0
+        self.request_capacity = max(1.0, requests_per_minute * headroom / 60.0 * 10) if requests_per_minute else 0
+        self.token_capacity = tokens_per_minute * headroom if tokens_per_minute else 0
+        self.request_level = self.request_capacity
+        self.token_level = self.token_capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.request_rate:
+            self.request_level = min(self.request_capacity, self.request_level + elapsed * self.request_rate)
+        if self.token_rate:
+            self.token_level = min(self.token_capacity, self.token_level + elapsed * self.token_rate)
+
+    def acquire(self, tokens: int = 0):
+        """Block until a request costing `tokens` may be sent"""
+        if self.token_capacity:
+            tokens = min(tokens, self.token_capacity)
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+
+                if wait <= 0:
+                    request_wait = (1 - self.request_level) / self.request_rate if self.request_rate and self.request_level < 1 else 0
+                    token_wait = (tokens - self.token_level) / self.token_rate if self.token_rate and self.token_level < tokens else 0
+                    wait = max(request_wait, token_wait)
+
+                    if wait <= 0:
+                        if self.request_rate:
+                            self.request_level -= 1
+                        if self.token_rate:
+                            self.token_level -= tokens
+                        return
+
+            time.sleep(wait)
+
+    def settle(self, reserved_tokens: int, used_tokens: int):
+        """Correct the token bucket once the provider reports actual usage"""
+        if not self.token_rate:
+            return
+        with self._lock:
+            self.token_level = min(self.token_capacity, self.token_level + reserved_tokens - used_tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds`"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter(requests_per_minute: float, tokens_per_minute: float, headroom: float) -> RateLimiter:
+    """Return the process-wide limiter so every AIClient paces against the same budget"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(requests_per_minute, tokens_per_minute, headroom)
+        return _limiter
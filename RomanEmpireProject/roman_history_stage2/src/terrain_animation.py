@@ -0,0 +1,128 @@
+# src/terrain_animation.py
+import numpy as np
+from typing import Dict, Iterator, Optional, Tuple
+from config.settings import (HISTORY_START_YEAR, HISTORY_END_YEAR, ANIMATION_YEARS_PER_DURATION,
+                             ANIMATION_FADE_YEARS, ANIMATION_DEFAULT_IMMEDIACY, ANIMATION_DEFAULT_PERSISTENCE)
+from src.event_table import EventTable
+from src.terrain_rasterizer import TerrainRasterizer
+
+class TerrainAnimator:
+    """
+    Year-by-year terrain, each frame built from the previous one.
+    
+    Every event kernel (and every cascade effect, placed where its event is)
+    is a track with a weight per year:
+      - 0 before it starts (cascades start impact_delay years after their event)
+      - `immediacy` in its first year, rising linearly to 1 by the end of its
+        active years (its year span, or duration_score * ANIMATION_YEARS_PER_DURATION
+        years if longer)
+      - then fading linearly over ANIMATION_FADE_YEARS to `persistence`, the
+        share of the effect the landscape keeps for good
+    Only tracks whose weight changed are rasterized for a frame, as a delta on
+    the running work grid; the base layer changes only at period boundaries.
+    """
+    
+    def __init__(self, table: EventTable, period_ratings: Optional[Dict] = None,
+                 rasterizer: Optional[TerrainRasterizer] = None,
+                 start_year: int = HISTORY_START_YEAR, end_year: int = HISTORY_END_YEAR):
+        self.table = table
+        self.period_ratings = period_ratings
+        self.rasterizer = rasterizer or TerrainRasterizer()
+        self.start_year = start_year
+        self.end_year = end_year
+        self.tracks = self._build_tracks()
+    
+    def _build_tracks(self) -> Dict[str, np.ndarray]:
+        events = self.table.events
+        splats = self.rasterizer.event_splats(self.table)
+        placed = events["year_start"][splats["event"]] >= 0
+        splats = {key: values[placed] for key, values in splats.items()}
+        
+        immediacy = np.full(len(events), ANIMATION_DEFAULT_IMMEDIACY)
+        persistence = np.full(len(events), ANIMATION_DEFAULT_PERSISTENCE)
+        for row, event in enumerate(events["source"]):
+            temporal_scope = event.get("temporal_scope")
+            if isinstance(temporal_scope, dict):
+                immediacy[row] = temporal_scope.get("immediacy", ANIMATION_DEFAULT_IMMEDIACY)
+                persistence[row] = temporal_scope.get("persistence", ANIMATION_DEFAULT_PERSISTENCE)
+        active_years = np.maximum(events["year_end"] - events["year_start"] + 1,
+                                  np.rint(events["duration_score"] * ANIMATION_YEARS_PER_DURATION)).astype(np.int64)
+        
+        # Cascades reuse their event's splats, scaled to the cascade's contribution
+        # (splat, cascade) pairs of the same event, joined on cascades sorted by event
+        cascades = self.table.cascades
+        order = np.argsort(cascades["event"], kind="stable")
+        cascade_events = cascades["event"][order]
+        first = np.searchsorted(cascade_events, splats["event"], side="left")
+        counts = np.searchsorted(cascade_events, splats["event"], side="right") - first
+        splat_index = np.repeat(np.arange(len(splats["event"]), dtype=np.int64), counts)
+        offsets = np.arange(len(splat_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cascade_index = order[np.repeat(first, counts) + offsets].astype(np.int64)
+        shares = np.bincount(splats["event"], minlength=len(events))
+        cascade_amplitude = (self.table.cascade_contributions()[cascade_index]
+                             / np.maximum(shares[splats["event"][splat_index]], 1))
+        
+        rows = np.concatenate([splats["event"], splats["event"][splat_index]])
+        return {
+            "x": np.concatenate([splats["x"], splats["x"][splat_index]]),
+            "y": np.concatenate([splats["y"], splats["y"][splat_index]]),
+            "sigma": np.concatenate([splats["sigma"], splats["sigma"][splat_index]]),
+            "amplitude": np.concatenate([splats["amplitude"], cascade_amplitude]),
+            "start": events["year_start"][rows] + np.concatenate([
+                np.zeros(len(splats["x"]), dtype=np.int64), cascades["delay"][cascade_index]]),
+            "active_years": np.maximum(active_years[rows], 1),
+            "immediacy": np.clip(immediacy[rows], 0, 1),
+            "persistence": np.clip(persistence[rows], 0, 1)
+        }
+    
+    def weights(self, year: int) -> np.ndarray:
+        """Weight of every track in the given year"""
+        tracks = self.tracks
+        elapsed = year - tracks["start"]
+        rising = tracks["immediacy"] + (1 - tracks["immediacy"]) * elapsed / np.maximum(tracks["active_years"] - 1, 1)
+        faded = np.clip((elapsed - tracks["active_years"] + 1) / max(ANIMATION_FADE_YEARS, 1), 0, 1)
+        settling = 1 - (1 - tracks["persistence"]) * faded
+        return np.where(elapsed < 0, 0.0,
+                        np.where(elapsed < tracks["active_years"], np.minimum(rising, 1.0), settling))
+    
+    def work_frames(self) -> Iterator[Tuple[int, np.ndarray, int]]:
+        """
+        Yield (year, work grid, tracks changed) for every year. The grid is the
+        running total and is updated in place; copy it to keep a frame.
+        """
+        rasterizer = self.rasterizer
+        grid = np.zeros(rasterizer.work_shape(), dtype=np.float64)
+        previous_weights = np.zeros(len(self.tracks["x"]))
+        previous_scores = None
+        
+        for year in range(self.start_year, self.end_year + 1):
+            weights = self.weights(year)
+            changed = np.flatnonzero(weights != previous_weights)
+            if len(changed):
+                delta = {key: values[changed] for key, values in self.tracks.items()}
+                delta["amplitude"] = delta["amplitude"] * (weights - previous_weights)[changed]
+                grid += rasterizer.kernel_grid(delta)
+            previous_weights = weights
+            
+            if self.period_ratings:
+                scores = rasterizer.theme_scores(self.period_ratings, year, year)
+                if scores != previous_scores:
+                    grid += rasterizer.base_layer(scores, grid.shape)
+                    if previous_scores is not None:
+                        grid -= rasterizer.base_layer(previous_scores, grid.shape)
+                previous_scores = scores
+            
+            yield year, grid, len(changed)
+    
+    def frames(self) -> Iterator[Tuple[int, np.ndarray, int]]:
+        """Yield (year, full-size float32 heightmap, tracks changed) for every year"""
+        for year, grid, changed in self.work_frames():
+            yield year, self.rasterizer.render_window(grid), changed
+    
+    def height_range(self) -> float:
+        """
+        Largest absolute height over all frames, so every frame can share one
+        16-bit scale. Bilinear rendering never exceeds the work grid's extremes,
+        so the cheap work frames are enough.
+        """
+        return max((float(np.abs(grid).max()) for _, grid, _ in self.work_frames()), default=0.0) or 1.0
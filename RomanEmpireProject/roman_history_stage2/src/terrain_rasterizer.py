@@ -0,0 +1,387 @@
+# src/terrain_rasterizer.py
+import hashlib
+import json
+import math
+import os
+import struct
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config.settings import (HISTORICAL_PERIODS, HISTORY_START_YEAR, HISTORY_END_YEAR,
+                             TERRAIN_WIDTH, TERRAIN_HEIGHT, TERRAIN_SIGMA_MIN, TERRAIN_SIGMA_MAX,
+                             TERRAIN_SIGMA_LEVELS, TERRAIN_BASE_SCALE, TERRAIN_CORE_RADIUS)
+from config.terrain_layout import MAP_BOUNDS, MAP_CENTER, REGION_COORDINATES, REGION_ALIASES, THEME_FOOTPRINTS
+from config.themes_mapping import CORE_TERRAIN_THEMES
+from src.event_table import EventTable
+
+# Kernels are blurred on a grid coarse enough that sigma spans at least this many cells
+MIN_SIGMA_CELLS = 8
+MIN_WORK_SIZE = 64
+
+# Largest value of the 8-byte hash that places events without a known region
+PLACEMENT_HASH_RANGE = float(2 ** 64)
+
+RATING_SIGNS = {"positive": 1.0, "negative": -1.0, "neutral": 0.0}
+
+def event_regions(event: Dict) -> List[str]:
+    """Known regions of an event: geographic_scope.regions, or names in a curated location description"""
+    scope = event.get("geographic_scope")
+    if isinstance(scope, dict):
+        names = scope.get("regions", [])
+    else:
+        description = event.get("location", {}).get("description", "")
+        names = [name for name in REGION_COORDINATES if name in description]
+        names += [region for alias, region in REGION_ALIASES.items()
+                  if alias in description and region not in names]
+    return [name for name in names if name in REGION_COORDINATES]
+
+def placement_angle(name: str, year: int) -> float:
+    """
+    Direction from the map centre for an event without a known region, from a
+    hash of its name and year: the same event always lands in the same place,
+    however many events come before it
+    """
+    digest = hashlib.blake2b(f"{name}|{int(year)}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / PLACEMENT_HASH_RANGE * 2 * math.pi
+
+class TerrainRasterizer:
+    """
+    Rasterizes events and period ratings into a 2-D height grid.
+    
+    Each event becomes a Gaussian bump (or pit) per region it names: peak height
+    from comprehensive_impact (split across its regions), sigma from its
+    geographic scope, snapped to one of sigma_levels evenly spaced values so
+    the number of blurs stays fixed however many events there are. Events
+    without a known region are placed around the map
+    centre, farther out the lower their centrality. Period ratings form the base
+    layer, each theme raising or lowering its footprint (see THEME_FOOTPRINTS).
+    
+    Kernels are grouped by sigma, splatted as impulses onto a grid just fine
+    enough for that sigma, blurred separably (two products with 1-D Gaussian
+    matrices) and upsampled once to the full size, so the cost barely grows
+    with the number of events.
+    """
+    
+    def __init__(self, width: int = TERRAIN_WIDTH, height: int = TERRAIN_HEIGHT,
+                 sigma_min: float = TERRAIN_SIGMA_MIN, sigma_max: float = TERRAIN_SIGMA_MAX,
+                 base_scale: float = TERRAIN_BASE_SCALE, core_radius: float = TERRAIN_CORE_RADIUS,
+                 sigma_levels: int = TERRAIN_SIGMA_LEVELS):
+        self.width = width
+        self.height = height
+        self.sigma_min = sigma_min
+        self.sigma_max = sigma_max
+        self.sigma_levels = sigma_levels
+        self.base_scale = base_scale
+        self.core_radius = core_radius
+        self.center = self.map_position(*REGION_COORDINATES[MAP_CENTER])
+    
+    def layout(self) -> Dict:
+        """Everything besides the events and ratings that shapes the output, for change detection"""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "sigma_min": self.sigma_min,
+            "sigma_max": self.sigma_max,
+            "sigma_levels": self.sigma_levels,
+            "base_scale": self.base_scale,
+            "core_radius": self.core_radius,
+            "map_bounds": list(MAP_BOUNDS),
+            "center": list(self.center),
+            "footprints": THEME_FOOTPRINTS
+        }
+    
+    def map_position(self, longitude: float, latitude: float) -> Tuple[float, float]:
+        """Pixel (x, y) of a longitude/latitude; y grows southwards"""
+        west, east, south, north = MAP_BOUNDS
+        return ((longitude - west) / (east - west) * self.width,
+                (north - latitude) / (north - south) * self.height)
+    
+    def event_splats(self, table: EventTable, start_year: Optional[int] = None,
+                     end_year: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Kernel centres, sigmas (pixels) and peak heights of the events starting
+        within [start_year, end_year]; without a range, all events are used.
+        """
+        events = table.events
+        selected = np.arange(len(events))
+        if start_year is not None or end_year is not None:
+            starts = events["year_start"]
+            selected = np.flatnonzero((starts >= (start_year if start_year is not None else 0))
+                                      & (starts <= (end_year if end_year is not None else np.iinfo("i4").max)))
+        
+        rows, xs, ys = [], [], []
+        spread = 0.45 * min(self.width, self.height)
+        for row in selected:
+            regions = event_regions(events["source"][row])
+            for region in regions:
+                x, y = self.map_position(*REGION_COORDINATES[region])
+                rows.append(row)
+                xs.append(x)
+                ys.append(y)
+            if not regions:
+                # Unplaced: around the centre, remoteness given by centrality
+                distance = (1 - np.clip(events["centrality"][row], 0, 1)) * spread
+                angle = placement_angle(events["name"][row], events["year_start"][row])
+                rows.append(row)
+                xs.append(self.center[0] + distance * math.cos(angle))
+                ys.append(self.center[1] + distance * math.sin(angle))
+        
+        rows = np.asarray(rows, dtype=np.int64)
+        shares = np.bincount(rows, minlength=len(events))[rows]
+        scope = np.clip(events["scope_score"][rows], 1, 10)
+        return {
+            "x": np.asarray(xs, dtype=np.float64),
+            "y": np.asarray(ys, dtype=np.float64),
+            "sigma": self.quantize_sigma((scope - 1) / 9),
+            "amplitude": events["comprehensive_impact"][rows] / np.maximum(shares, 1),
+            "event": rows
+        }
+    
+    def quantize_sigma(self, spread: np.ndarray) -> np.ndarray:
+        """Sigma in pixels for a 0..1 spread (sigma_min..sigma_max), snapped to the nearest of sigma_levels levels"""
+        steps = max(self.sigma_levels - 1, 1)
+        spread = np.rint(np.clip(spread, 0, 1) * steps) / steps
+        return (self.sigma_min + (self.sigma_max - self.sigma_min) * spread) * self.width
+    
+    def theme_scores(self, period_ratings: Dict, start_year: int = HISTORY_START_YEAR,
+                     end_year: int = HISTORY_END_YEAR) -> Dict[str, float]:
+        """
+        Signed -1..1 score per core theme, averaged over the periods that overlap
+        the year range (weighted by years of overlap). A higher score means better
+        conditions; neutral themes score 0.
+        """
+        ratings = period_ratings.get("period_ratings", period_ratings)
+        scores = dict.fromkeys(CORE_TERRAIN_THEMES, 0.0)
+        total_years = 0
+        for period_key, period in HISTORICAL_PERIODS.items():
+            if period_key not in ratings:
+                continue
+            first, last = (int(year) for year in period["years"].split("-"))
+            overlap = min(last, end_year) - max(first, start_year) + 1
+            if overlap <= 0:
+                continue
+            total_years += overlap
+            for theme, theme_info in CORE_TERRAIN_THEMES.items():
+                rating = ratings[period_key].get(theme)
+                if rating is not None:
+                    sign = RATING_SIGNS.get(theme_info.get("rating_direction"), 0.0)
+                    scores[theme] += overlap * sign * (rating - 5.5) / 4.5
+        
+        if total_years:
+            scores = {theme: score / total_years for theme, score in scores.items()}
+        return scores
+    
+    def base_layer(self, theme_scores: Dict[str, float], shape: Tuple[int, int]) -> np.ndarray:
+        """Period base terrain sampled on a grid of the given shape covering the map"""
+        rows, cols = shape
+        ys = (np.arange(rows, dtype=np.float32) + 0.5) * (self.height / rows)
+        xs = (np.arange(cols, dtype=np.float32) + 0.5) * (self.width / cols)
+        scale = self.core_radius * self.width
+        core_y = np.exp(-0.5 * ((ys - self.center[1]) / scale) ** 2)
+        core_x = np.exp(-0.5 * ((xs - self.center[0]) / scale) ** 2)
+        core = np.outer(core_y, core_x)
+        
+        weights = {"core": 0.0, "frontier": 0.0, "uniform": 0.0}
+        for theme, score in theme_scores.items():
+            weights[THEME_FOOTPRINTS.get(theme, "uniform")] += score
+        
+        base = (weights["uniform"] + weights["frontier"]) + (weights["core"] - weights["frontier"]) * core
+        return (self.base_scale * base).astype(np.float32)
+    
+    def rasterize(self, table: EventTable, period_ratings: Optional[Dict] = None,
+                  start_year: Optional[int] = None, end_year: Optional[int] = None) -> np.ndarray:
+        """Height grid (height x width, float32) for events starting in the year range"""
+        return self.render_window(self.work_grid(table, period_ratings, start_year, end_year))
+    
+    def work_grid(self, table: EventTable, period_ratings: Optional[Dict] = None,
+                  start_year: Optional[int] = None, end_year: Optional[int] = None) -> np.ndarray:
+        """
+        The terrain on the coarsest grid that still resolves every kernel;
+        render_window() samples any part of the full-size heightmap from it.
+        """
+        grid = self.kernel_grid(self.event_splats(table, start_year, end_year))
+        
+        if period_ratings:
+            scores = self.theme_scores(period_ratings,
+                                       HISTORY_START_YEAR if start_year is None else start_year,
+                                       HISTORY_END_YEAR if end_year is None else end_year)
+            grid += self.base_layer(scores, grid.shape)
+        return grid
+    
+    def work_shape(self) -> Tuple[int, int]:
+        """Work grid size: fine enough for the smallest possible sigma"""
+        factor = self._work_factor(self.sigma_min * self.width)
+        return math.ceil(self.height / factor), math.ceil(self.width / factor)
+    
+    def kernel_grid(self, splats: Dict[str, np.ndarray]) -> np.ndarray:
+        """Sum of the given kernels (as from event_splats) on the work grid"""
+        # Blurred kernels per working grid, keyed by downsampling factor
+        levels: Dict[int, np.ndarray] = {}
+        for sigma in np.unique(splats["sigma"]):
+            group = splats["sigma"] == sigma
+            factor = self._work_factor(sigma)
+            shape = (math.ceil(self.height / factor), math.ceil(self.width / factor))
+            impulses = self._splat_impulses(splats["x"][group], splats["y"][group],
+                                            splats["amplitude"][group], factor, shape)
+            blurred = self._gaussian_blur(impulses, sigma / factor)
+            levels[factor] = levels[factor] + blurred if factor in levels else blurred
+        
+        # Every level lands on the grid for the smallest possible sigma, so the
+        # result does not depend on which sigmas happen to be present
+        grid = np.zeros(self.work_shape(), dtype=np.float32)
+        for level in levels.values():
+            grid += self._resample(level, grid.shape)
+        return grid
+    
+    def render_window(self, grid: np.ndarray, rows: Tuple[int, int] = None, cols: Tuple[int, int] = None) -> np.ndarray:
+        """
+        Full-size heights for pixel rows [rows[0], rows[1]) and columns
+        [cols[0], cols[1]) (default: everything). Pixels past the map edge
+        repeat the edge.
+        """
+        return self._resample(grid, (self.height, self.width),
+                              (rows or (0, self.height), cols or (0, self.width)))
+    
+    def _work_factor(self, sigma: float) -> int:
+        """Largest power-of-two downsampling that keeps sigma at MIN_SIGMA_CELLS cells"""
+        factor = 1
+        while (sigma / (factor * 2) >= MIN_SIGMA_CELLS
+               and min(self.width, self.height) / (factor * 2) >= MIN_WORK_SIZE):
+            factor *= 2
+        return factor
+    
+    @staticmethod
+    def _splat_impulses(xs: np.ndarray, ys: np.ndarray, amplitudes: np.ndarray,
+                        factor: int, shape: Tuple[int, int]) -> np.ndarray:
+        """Impulses on the working grid, each shared bilinearly between four cells"""
+        rows, cols = shape
+        u = np.clip(xs / factor - 0.5, 0, cols - 1)
+        v = np.clip(ys / factor - 0.5, 0, rows - 1)
+        u0 = np.minimum(np.floor(u).astype(np.int64), cols - 2) if cols > 1 else np.zeros(len(u), np.int64)
+        v0 = np.minimum(np.floor(v).astype(np.int64), rows - 2) if rows > 1 else np.zeros(len(v), np.int64)
+        fu = u - u0
+        fv = v - v0
+        
+        impulses = np.zeros(shape, dtype=np.float32)
+        for dv, wv in ((0, 1 - fv), (1, fv)):
+            for du, wu in ((0, 1 - fu), (1, fu)):
+                np.add.at(impulses, (np.minimum(v0 + dv, rows - 1), np.minimum(u0 + du, cols - 1)),
+                          amplitudes * wv * wu)
+        return impulses
+    
+    @staticmethod
+    def _gaussian_matrix(size: int, sigma: float) -> np.ndarray:
+        """Peak-1 Gaussian weights between every pair of cells along one axis"""
+        offsets = np.arange(size, dtype=np.float32)
+        return np.exp(-0.5 * ((offsets[:, None] - offsets[None, :]) / np.float32(sigma)) ** 2)
+    
+    def _gaussian_blur(self, grid: np.ndarray, sigma: float) -> np.ndarray:
+        """Separable Gaussian convolution: blur columns, then rows"""
+        rows, cols = grid.shape
+        return self._gaussian_matrix(rows, sigma) @ grid @ self._gaussian_matrix(cols, sigma)
+    
+    @staticmethod
+    def _resample(grid: np.ndarray, shape: Tuple[int, int], window: Tuple[Tuple[int, int], ...] = None) -> np.ndarray:
+        """
+        Bilinear resampling between pixel centres, one axis at a time; window
+        limits the output to ((first row, end row), (first col, end col)) of shape
+        """
+        grid = grid.astype(np.float32, copy=False)
+        for axis, size in enumerate(shape):
+            source = grid.shape[axis]
+            start, stop = window[axis] if window else (0, size)
+            if source == size and (start, stop) == (0, size):
+                continue
+            factor = size // source
+            if factor * source == size and start % factor == 0 and stop % factor == 0:
+                grid = TerrainRasterizer._upsample_aligned(grid, axis, factor, start // factor, stop // factor)
+                continue
+            position = np.clip((np.arange(start, stop) + 0.5) * (source / size) - 0.5, 0, source - 1)
+            low = np.floor(position).astype(np.int64)
+            high = np.minimum(low + 1, source - 1)
+            weight = (position - low).astype(np.float32)
+            if axis == 0:
+                grid = grid[low] * (1 - weight)[:, None] + grid[high] * weight[:, None]
+            else:
+                grid = grid[:, low] * (1 - weight) + grid[:, high] * weight
+        return grid
+    
+    @staticmethod
+    def _upsample_aligned(grid: np.ndarray, axis: int, factor: int, first: int, last: int) -> np.ndarray:
+        """
+        _resample for a whole-number factor over source cells [first, last):
+        each of the `factor` output phases is one slice operation, with no gathers
+        """
+        grid = np.moveaxis(grid, axis, 0)
+        source = grid.shape[0]
+        # One edge copy before, enough after to cover windows past the map edge
+        padded = np.concatenate([grid[:1], grid, np.repeat(grid[-1:], max(1, last - source + 1), axis=0)])
+        
+        upsampled = np.empty(((last - first) * factor,) + grid.shape[1:], dtype=np.float32)
+        for phase in range(factor):
+            offset = (phase + 0.5) / factor - 0.5
+            if offset < 0:
+                below, above, t = padded[first:last], padded[first + 1:last + 1], offset + 1
+            else:
+                below, above, t = padded[first + 1:last + 1], padded[first + 2:last + 2], offset
+            upsampled[phase::factor] = below * np.float32(1 - t) + above * np.float32(t)
+        return np.moveaxis(upsampled, 0, axis)
+
+def heightmap_levels(heights: np.ndarray, height_range: Optional[float] = None) -> Tuple[np.ndarray, float]:
+    """
+    16-bit levels with zero height at mid-grey (32768) and +/-height_range at the
+    extremes (default: the largest absolute height). Returns (levels, height_range).
+    """
+    if height_range is None:
+        height_range = float(np.abs(heights).max()) or 1.0
+    scaled = heights * np.float32(32767.5 / height_range) + np.float32(32767.5)
+    return np.clip(np.rint(scaled), 0, 65535).astype(np.uint16), height_range
+
+def write_png16(file_path: str, levels: np.ndarray, compression: int = 6):
+    """Write a 16-bit greyscale PNG (Sub filter on every row, which suits smooth terrain)"""
+    rows, cols = levels.shape
+    data = np.ascontiguousarray(levels, dtype=">u2").view(np.uint8).reshape(rows, cols * 2)
+    filtered = np.empty((rows, cols * 2 + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:3] = data[:, :2]
+    np.subtract(data[:, 2:], data[:, :-2], out=filtered[:, 3:])
+    
+    def chunk(tag: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload))
+    
+    with open(file_path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", cols, rows, 16, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(filtered.tobytes(), compression)))
+        f.write(chunk(b"IEND", b""))
+
+def write_raw16(file_path: str, levels: np.ndarray):
+    """Write headerless little-endian 16-bit samples, row by row (terrain-tool RAW)"""
+    np.ascontiguousarray(levels, dtype="<u2").tofile(file_path)
+
+def save_heightmap(heights: np.ndarray, output_stem: str, height_range: Optional[float] = None,
+                   metadata: Optional[Dict] = None, formats: Tuple[str, ...] = ("png", "raw"),
+                   compression: int = 6, verbose: bool = True) -> Dict:
+    """Write <stem>.png and/or <stem>.raw, and a <stem>.json sidecar describing the height scale"""
+    os.makedirs(os.path.dirname(output_stem) or ".", exist_ok=True)
+    levels, height_range = heightmap_levels(heights, height_range)
+    if "png" in formats:
+        write_png16(f"{output_stem}.png", levels, compression)
+    if "raw" in formats:
+        write_raw16(f"{output_stem}.raw", levels)
+    
+    info = {
+        "width": int(heights.shape[1]),
+        "height": int(heights.shape[0]),
+        "format": "uint16, zero height = 32768, RAW little-endian",
+        "height_range": height_range,
+        "min_height": float(heights.min()),
+        "max_height": float(heights.max()),
+        **(metadata or {})
+    }
+    with open(f"{output_stem}.json", 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    
+    if verbose:
+        print(f"Heightmap saved to: {output_stem}.{' / .'.join(formats)}")
+    return info
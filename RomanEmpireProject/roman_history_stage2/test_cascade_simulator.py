@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from src.cascade_simulator import CascadeSimulator
+from src.event_table import EventTable, THEME_KEYS
+
+RELATIONSHIPS = [
+    {"theme_a": "external_threat", "theme_b": "internal_stability", "relationship": "negative"},
+    {"theme_a": "internal_stability", "theme_b": "economic_development", "relationship": "positive"},
+    {"theme_a": "economic_development", "theme_b": "socio_cultural_vitality", "relationship": "positive", "delay": 3},
+    {"theme_a": "religious_influence", "theme_b": "governance_efficiency", "relationship": "negative"}
+]
+
+
+def make_event(year, themes, base_impact, cascades=()):
+    return {
+        "year": year,
+        "name": f"Event {year}",
+        "primary_themes": list(themes),
+        "base_impact": base_impact,
+        "geographic_scope": {"scope_score": 6, "regions": ["Rome"], "centrality": 0.8},
+        "temporal_scope": {"duration_score": 5, "immediacy": 0.9, "persistence": 0.5},
+        "cascade_effects": [
+            {"affected_theme": theme, "impact_delay": delay, "impact_strength": strength}
+            for theme, delay, strength in cascades
+        ]
+    }
+
+
+def dense_solution(simulator):
+    """intensity = impulses + P @ intensity, solved with a dense matrix"""
+    rows, cols, values, _ = simulator.propagation_matrix()
+    propagation = np.zeros((simulator.size, simulator.size))
+    np.add.at(propagation, (rows, cols), values)
+    impulses = simulator.impulses().ravel()
+    return np.linalg.solve(np.eye(simulator.size) - propagation, impulses).reshape(simulator.years, len(THEME_KEYS))
+
+
+def test_matches_dense_solve():
+    table = EventTable.from_events([
+        make_event(192, ["internal_stability", "governance_efficiency"], -8,
+                   [("economic_development", 2, -5), ("external_threat", 4, -3)]),
+        make_event("235–284", ["external_threat"], -9, [("socio_cultural_vitality", 10, -4)]),
+        make_event(313, ["religious_influence"], 7),
+        make_event(330, ["economic_development"], 5, [("internal_stability", 20, 2)])
+    ])
+    simulator = CascadeSimulator(table, RELATIONSHIPS)
+
+    result = simulator.simulate()
+
+    assert result["intensity"].shape == (simulator.years, len(THEME_KEYS))
+    np.testing.assert_allclose(result["impulses"], table.theme_timeline(), atol=1e-12)
+    np.testing.assert_allclose(result["intensity"], dense_solution(simulator), atol=1e-10)
+    np.testing.assert_allclose(result["propagated"], result["intensity"] - result["impulses"])
+
+
+def test_relationship_signs_follow_theme_polarity():
+    sources, targets, delays, weights = CascadeSimulator(EventTable.from_events([]), RELATIONSHIPS,
+                                                         coupling=0.1).theme_couplings()
+    coupling = {(THEME_KEYS[a], THEME_KEYS[b], int(d)): w for a, b, d, w in zip(sources, targets, delays, weights)}
+
+    # More external threat (worse) with less stability (worse): same direction in impact terms
+    assert coupling[("external_threat", "internal_stability", 1)] == pytest.approx(0.1)
+    assert coupling[("economic_development", "socio_cultural_vitality", 3)] == pytest.approx(0.1)
+    assert coupling[("religious_influence", "governance_efficiency", 1)] == pytest.approx(-0.1)
+
+
+@pytest.mark.parametrize("events", [
+    [],
+    [make_event("unknown", ["external_threat"], -5)],
+    [make_event(100, ["external_threat"], -5, [("internal_stability", 2, -4)])]
+], ids=["empty", "unknown-year", "before-range"])
+def test_no_impulses_in_range(events):
+    simulator = CascadeSimulator(EventTable.from_events(events), RELATIONSHIPS)
+
+    result = simulator.simulate()
+
+    for series in result.values():
+        assert series.dtype == np.float64
+        assert series.shape == (simulator.years, len(THEME_KEYS))
+        assert not series.any()
+    assert simulator.to_series(result)["intensity"]["external_threat"] == [0.0] * simulator.years
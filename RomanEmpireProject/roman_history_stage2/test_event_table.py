@@ -0,0 +1,116 @@
+import copy
+import os
+import numpy as np
+import pytest
+from src.event_table import EventTable, THEME_KEYS, parse_year_span
+from src.utils import load_json
+
+CURATED_EVENTS = os.path.join(os.path.dirname(__file__), "..", "stage2_historicalevents.json")
+
+EXTRACTED = [
+    {
+        "year": "193–197",
+        "name": "Year of the Five Emperors",
+        "primary_themes": ["internal_stability", "governance_efficiency", "not_a_theme"],
+        "base_impact": -7,
+        "geographic_scope": {"scope_score": 8, "regions": ["Rome", "Pannonia"], "centrality": 0.9},
+        "temporal_scope": {"duration_score": 4.5, "immediacy": 1.0, "persistence": 0.4},
+        "cascade_effects": [
+            {"affected_theme": "economic_development", "impact_delay": 3, "impact_strength": -2.5},
+            {"affected_theme": "unknown_theme", "impact_delay": 1, "impact_strength": 4}
+        ]
+    },
+    {
+        "year": "Late 3rd Century",
+        "name": "Rise of the Tetrarchy",
+        "primary_themes": ["governance_efficiency"],
+        "base_impact": 6,
+        "geographic_scope": {"scope_score": 10, "regions": ["Empire"], "centrality": 0.7},
+        "temporal_scope": {"duration_score": 8, "immediacy": 0.5, "persistence": 0.9}
+    },
+    {
+        "year": "unknown",
+        "name": "Undated reform",
+        "primary_themes": ["economic_development"],
+        "base_impact": 2,
+        "geographic_scope": {"scope_score": 3, "regions": [], "centrality": 0.2},
+        "temporal_scope": {"duration_score": 2, "immediacy": 0.3, "persistence": 0.3},
+        "cascade_effects": []
+    }
+]
+
+
+@pytest.mark.parametrize("label, span", [
+    (193, (193, 193)),
+    ("193–211", (193, 211)),
+    ("c.235", (235, 235)),
+    ("260s–273", (260, 273)),
+    ("Late 3rd Century", (267, 300)),
+    ("unknown", (-1, -1))
+])
+def test_parse_year_span(label, span):
+    assert parse_year_span(label) == span
+
+
+def test_extracted_round_trip():
+    source = copy.deepcopy(EXTRACTED)
+    table = EventTable.from_events(source)
+
+    exported = table.to_events()
+
+    assert source == EXTRACTED
+    assert [event.pop("comprehensive_impact") for event in exported] == [-2.52, 4.8, 0.12]
+    assert exported == EXTRACTED
+
+
+def test_curated_round_trip():
+    events = load_json(CURATED_EVENTS)["historical_events"]["events"]
+    table = EventTable.from_events(events)
+
+    assert table.to_events() == events
+    with_impact = table.to_events(include_impact=True)
+    assert [event.pop("comprehensive_impact") for event in with_impact] == \
+        [round(float(value), 2) for value in table.events["comprehensive_impact"]]
+    assert with_impact == events
+
+
+def test_round_trip_carries_table_edits():
+    table = EventTable.from_events(EXTRACTED)
+    table.events["base_impact"][1] = 3
+    table.update_impact()
+
+    event = table.to_events()[1]
+
+    assert event["base_impact"] == 3
+    assert event["comprehensive_impact"] == 2.4
+
+
+def test_theme_timeline_sums_to_theme_totals():
+    table = EventTable.from_events(EXTRACTED)
+
+    timeline = table.theme_timeline()
+    direct = table.theme_timeline(include_cascades=False)
+
+    # The undated event and the cascade to an unknown theme are left out
+    dated = table.theme_contributions()[:2].sum(axis=0)
+    np.testing.assert_allclose(direct.sum(axis=0), dated)
+    expected = dated.copy()
+    expected[THEME_KEYS.index("economic_development")] += -2.5 * 0.8 * 0.45
+    np.testing.assert_allclose(timeline.sum(axis=0), expected)
+
+    # Spread evenly over 193–197, the cascade three years after the start
+    stability = THEME_KEYS.index("internal_stability")
+    np.testing.assert_allclose(direct[193 - 180:198 - 180, stability], -2.52 / 2 / 5)
+    assert direct[192 - 180, stability] == 0 and direct[198 - 180, stability] == 0
+    economy = THEME_KEYS.index("economic_development")
+    assert timeline[196 - 180, economy] == pytest.approx(-0.9)
+
+
+def test_theme_timeline_clips_to_range():
+    table = EventTable.from_events(EXTRACTED)
+
+    timeline = table.theme_timeline(start_year=195, end_year=196, include_cascades=False)
+
+    stability = THEME_KEYS.index("internal_stability")
+    assert timeline.shape == (2, len(THEME_KEYS))
+    np.testing.assert_allclose(timeline[:, stability], -2.52 / 2 / 5)
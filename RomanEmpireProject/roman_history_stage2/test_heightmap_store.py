@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from src.event_table import EventTable
+from src.heightmap_store import HeightmapStore, changed_kernels, KERNEL_DTYPE
+from src.terrain_rasterizer import TerrainRasterizer
+
+SIZE = 512
+TILE = 128
+
+PERIOD_RATINGS = {
+    "period_ratings": {
+        "period1": {"external_threat": 6, "internal_stability": 7, "economic_development": 5,
+                    "socio_cultural_vitality": 5, "religious_influence": 4, "governance_efficiency": 4}
+    }
+}
+
+
+def make_event(year, name, regions, base_impact, scope_score=2):
+    return {
+        "year": year,
+        "name": name,
+        "primary_themes": ["internal_stability"],
+        "base_impact": base_impact,
+        "geographic_scope": {"scope_score": scope_score, "regions": regions, "centrality": 0.5},
+        "temporal_scope": {"duration_score": 6, "immediacy": 0.5, "persistence": 0.5}
+    }
+
+
+EVENTS = [
+    make_event(193, "Year of the Five Emperors", ["Rome"], -8),
+    make_event(260, "Capture of Valerian", ["Syria"], -9, scope_score=3),
+    make_event(286, "Bagaudae revolt", ["Gaul"], -4),
+    make_event(330, "Founding of Constantinople", ["Constantinople"], 7)
+]
+
+
+def assert_matches_full_render(store, rasterizer, events, period_ratings=None):
+    expected = rasterizer.rasterize(EventTable.from_events(events), period_ratings)
+    stored = store.read_window(0, (0, SIZE), (0, SIZE))
+    # Tiles left alone only miss the tails of kernels beyond the cutoff
+    np.testing.assert_allclose(stored, expected, rtol=0, atol=1e-4 * np.abs(expected).max())
+
+
+def test_changed_kernels_counts_duplicates():
+    kernels = np.zeros(3, dtype=KERNEL_DTYPE)
+    kernels["x"] = [10, 10, 20]
+    kernels["amplitude"] = [1, 1, 2]
+
+    assert len(changed_kernels(kernels, kernels)) == 0
+    assert changed_kernels(kernels, kernels[1:])["x"].tolist() == [10]
+    assert changed_kernels(kernels[:2], kernels)["x"].tolist() == [20]
+
+
+def test_incremental_updates_match_full_render(tmp_path):
+    rasterizer = TerrainRasterizer(SIZE, SIZE)
+    store = HeightmapStore.open(str(tmp_path), SIZE, SIZE, TILE)
+    all_tiles = (SIZE // TILE) ** 2
+
+    first = store.update(EventTable.from_events(EVENTS), rasterizer=rasterizer)
+    assert first["tiles_written"] == [all_tiles, 4, 1]
+    assert_matches_full_render(store, rasterizer, EVENTS)
+
+    # A second, identical event doubles its bump; removing it undoes that
+    replaced = EVENTS[:3] + [make_event(325, "Council of Nicaea", ["Nicaea"], 5)]
+    for events in (EVENTS + [EVENTS[2]], EVENTS, replaced):
+        result = store.update(EventTable.from_events(events), rasterizer=rasterizer)
+        assert 0 < result["tiles_written"][0] < all_tiles
+        assert_matches_full_render(store, rasterizer, events)
+
+    unchanged = store.update(EventTable.from_events(replaced), rasterizer=rasterizer)
+    assert unchanged["tiles_written"] == [0, 0, 0]
+    assert unchanged["generation"] == result["generation"]
+
+
+def test_pyramid_levels_are_means_of_level_below(tmp_path):
+    store = HeightmapStore.open(str(tmp_path), SIZE, SIZE, TILE)
+    store.update(EventTable.from_events(EVENTS), PERIOD_RATINGS, TerrainRasterizer(SIZE, SIZE))
+
+    level0 = store.read_window(0, (0, SIZE), (0, SIZE))
+    level1 = store.read_window(1, (0, SIZE // 2), (0, SIZE // 2))
+
+    np.testing.assert_allclose(level1, level0.reshape(SIZE // 2, 2, SIZE // 2, 2).mean(axis=(1, 3)), atol=1e-6)
+
+
+@pytest.mark.parametrize("change", [
+    {"period_ratings": PERIOD_RATINGS},
+    {"rasterizer": TerrainRasterizer(SIZE, SIZE, base_scale=0.5)},
+    {"rasterizer": TerrainRasterizer(SIZE, SIZE, sigma_levels=4)}
+], ids=["ratings", "base-scale", "sigma-levels"])
+def test_base_change_rewrites_every_tile(tmp_path, change):
+    table = EventTable.from_events(EVENTS)
+    store = HeightmapStore.open(str(tmp_path), SIZE, SIZE, TILE)
+    store.update(table, PERIOD_RATINGS if "rasterizer" in change else None, TerrainRasterizer(SIZE, SIZE))
+
+    period_ratings = PERIOD_RATINGS if "rasterizer" in change else change["period_ratings"]
+    rasterizer = change.get("rasterizer", TerrainRasterizer(SIZE, SIZE))
+    store = HeightmapStore.open(str(tmp_path), SIZE, SIZE, TILE)
+    result = store.update(table, period_ratings, rasterizer)
+
+    assert result["tiles_written"] == [(SIZE // TILE) ** 2, 4, 1]
+    assert_matches_full_render(store, rasterizer, EVENTS, period_ratings)
+
+
+def test_reopened_store_keeps_its_state(tmp_path):
+    table = EventTable.from_events(EVENTS)
+    rasterizer = TerrainRasterizer(SIZE, SIZE)
+    generation = HeightmapStore.open(str(tmp_path), SIZE, SIZE, TILE).update(table, PERIOD_RATINGS, rasterizer)["generation"]
+
+    store = HeightmapStore.open(str(tmp_path), SIZE, SIZE, TILE)
+    result = store.update(table, PERIOD_RATINGS, rasterizer)
+
+    assert result == {"generation": generation, "tiles_written": [0, 0, 0]}
+    assert_matches_full_render(store, rasterizer, EVENTS, PERIOD_RATINGS)
+
+    # Another size starts over
+    resized = HeightmapStore.open(str(tmp_path), SIZE // 2, SIZE // 2, TILE)
+    assert resized.update(table, PERIOD_RATINGS, TerrainRasterizer(SIZE // 2, SIZE // 2))["tiles_written"] == [4, 1]
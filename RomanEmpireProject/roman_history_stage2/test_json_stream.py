@@ -0,0 +1,68 @@
+import json
+import pytest
+from src.json_stream import JsonArrayStreamParser, MalformedStreamError
+
+EVENTS = [
+    {"year": 193, "name": "Pertinax {murdered}", "quote": "he said \"enough\" ]"},
+    {"year": "235–284", "name": "Crisis", "cascade_effects": [{"affected_theme": "economic_development"}]},
+    {"year": 313, "name": "Edict of Milan", "regions": []}
+]
+
+RESPONSE = 'Here is the analysis:\n```json\n' + json.dumps({"events": EVENTS}, ensure_ascii=False, indent=2) + '\n```'
+
+
+def feed_in_pieces(parser, text, size):
+    elements = []
+    for i in range(0, len(text), size):
+        elements.append(parser.feed(text[i:i + size]))
+    return elements
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, len(RESPONSE)])
+def test_elements_arrive_as_they_close(size):
+    parser = JsonArrayStreamParser("events")
+
+    batches = feed_in_pieces(parser, RESPONSE, size)
+
+    assert [element for batch in batches for element in batch] == EVENTS
+    assert parser.done and parser.count == len(EVENTS)
+    parser.finish()
+
+    # Each element is returned by the delta holding its closing brace
+    if size == 1:
+        closing = [i for i, batch in enumerate(batches) if batch]
+        assert len(closing) == len(EVENTS)
+        assert all(RESPONSE[i] == "}" for i in closing)
+
+
+def test_truncated_stream_raises_on_finish():
+    parser = JsonArrayStreamParser("events")
+    text = RESPONSE[:RESPONSE.index('"Edict')]
+
+    elements = parser.feed(text)
+
+    assert elements == EVENTS[:2]
+    with pytest.raises(MalformedStreamError, match="after 2 elements"):
+        parser.finish()
+
+
+@pytest.mark.parametrize("text, message", [
+    ("I cannot help with that. " * 20, "does not start with a JSON object"),
+    ('{"summary": "' + "x" * 400, 'does not open with a "events" array'),
+    ('{"events": [{"year": 193} {"year": 194}]}', "unexpected '{'"),
+    ('{"events": [{"year": 193}, oops]}', "unexpected 'o'"),
+    ('{"events": [{"year": 193,}]}', "element 1 is not valid JSON")
+])
+def test_malformed_streams_fail_early(text, message):
+    parser = JsonArrayStreamParser("events")
+
+    with pytest.raises(MalformedStreamError, match=message):
+        feed_in_pieces(parser, text, 5)
+
+
+def test_missing_array_raises_on_finish():
+    parser = JsonArrayStreamParser("events")
+    parser.feed('{"period_ratings": {}}')
+
+    with pytest.raises(MalformedStreamError, match='no "events" array'):
+        parser.finish()
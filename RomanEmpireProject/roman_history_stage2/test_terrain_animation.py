@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import pytest
+from src.event_table import EventTable
+from src.terrain_animation import TerrainAnimator
+from src.terrain_rasterizer import TerrainRasterizer
+from src.utils import load_json
+
+SIZE = 256
+
+BUNDLED_EVENTS = os.path.join(os.path.dirname(__file__), "data", "processed", "historical_events.json")
+
+EVENTS = [
+    {
+        "year": 200,
+        "name": "Severan campaign",
+        "primary_themes": ["external_threat"],
+        "base_impact": 5,
+        "geographic_scope": {"scope_score": 4, "regions": ["Mesopotamia"], "centrality": 0.3},
+        "temporal_scope": {"duration_score": 2, "immediacy": 1.0, "persistence": 0.3}
+    },
+    {
+        "year": 228,
+        "name": "Rise of the Sasanians",
+        "primary_themes": ["external_threat", "internal_stability"],
+        "base_impact": -8,
+        "geographic_scope": {"scope_score": 6, "regions": ["Persia", "Syria"], "centrality": 0.2},
+        "temporal_scope": {"duration_score": 3, "immediacy": 0.4, "persistence": 0.5},
+        "cascade_effects": [
+            {"affected_theme": "economic_development", "impact_delay": 4, "impact_strength": -3}
+        ]
+    },
+    {
+        "year": "230–233",
+        "name": "Unrest in the provinces",
+        "type_ratings": [4, 3, 5, 5, 5, 4],
+        "location": {"description": "Gaul and the Rhine frontier", "centrality": 7},
+        "duration_score": 4,
+        "geographic_scope": 5,
+        "impact": -3
+    },
+    {
+        "year": "unknown",
+        "name": "Undated reform",
+        "primary_themes": ["governance_efficiency"],
+        "base_impact": 4,
+        "geographic_scope": {"scope_score": 2, "regions": [], "centrality": 0.9},
+        "temporal_scope": {"duration_score": 2, "immediacy": 1.0, "persistence": 0.5}
+    }
+]
+
+PERIOD_RATINGS = {
+    "period_ratings": {
+        "period1": {"external_threat": 6, "internal_stability": 7, "economic_development": 5,
+                    "socio_cultural_vitality": 5, "religious_influence": 4, "governance_efficiency": 4},
+        "period2": {"external_threat": 9, "internal_stability": 2, "economic_development": 3,
+                    "socio_cultural_vitality": 4, "religious_influence": 6, "governance_efficiency": 3}
+    }
+}
+
+
+def scratch_grid(animator, year):
+    """The work grid for one year, built from nothing"""
+    tracks = dict(animator.tracks)
+    tracks["amplitude"] = tracks["amplitude"] * animator.weights(year)
+    grid = animator.rasterizer.kernel_grid(tracks).astype(np.float64)
+    if animator.period_ratings:
+        scores = animator.rasterizer.theme_scores(animator.period_ratings, year, year)
+        grid += animator.rasterizer.base_layer(scores, grid.shape)
+    return grid
+
+
+@pytest.mark.parametrize("period_ratings", [None, PERIOD_RATINGS], ids=["events", "events-and-periods"])
+def test_work_frames_match_scratch_frames(period_ratings):
+    animator = TerrainAnimator(EventTable.from_events(EVENTS), period_ratings,
+                               TerrainRasterizer(SIZE, SIZE), start_year=225, end_year=250)
+
+    years = []
+    for year, grid, changed in animator.work_frames():
+        expected = scratch_grid(animator, year)
+        np.testing.assert_allclose(grid, expected, rtol=0, atol=1e-5 * max(np.abs(expected).max(), 1))
+        years.append((year, changed))
+
+    assert [year for year, _ in years] == list(range(225, 251))
+    # Nothing moves between the Severan fade and the Sasanian rise
+    assert dict(years)[226] == 0 and dict(years)[228] > 0
+
+
+def test_frames_render_work_frames():
+    rasterizer = TerrainRasterizer(SIZE, SIZE)
+    animator = TerrainAnimator(EventTable.from_events(EVENTS), PERIOD_RATINGS, rasterizer,
+                               start_year=229, end_year=231)
+
+    frames = [(year, heights.copy()) for year, heights, _ in animator.frames()]
+    grids = [(year, rasterizer.render_window(grid)) for year, grid, _ in animator.work_frames()]
+
+    assert [year for year, _ in frames] == [229, 230, 231]
+    for (_, heights), (_, expected) in zip(frames, grids):
+        assert heights.shape == (SIZE, SIZE)
+        np.testing.assert_array_equal(heights, expected)
+    assert animator.height_range() == pytest.approx(max(np.abs(grid).max() for _, grid, _ in animator.work_frames()))
+
+
+def test_track_weights():
+    animator = TerrainAnimator(EventTable.from_events(EVENTS), rasterizer=TerrainRasterizer(SIZE, SIZE))
+    tracks = animator.tracks
+
+    # Two splats (Persia, Syria) for the Sasanian event, each carrying the
+    # cascade too; the undated event has no track
+    sasanian = np.flatnonzero(tracks["start"] == 228)
+    cascade = np.flatnonzero(tracks["start"] == 232)
+    assert len(sasanian) == 2 and len(cascade) == 2
+    assert len(tracks["x"]) == 1 + 2 + 2 + 2
+    np.testing.assert_array_equal(tracks["x"][cascade], tracks["x"][sasanian])
+    np.testing.assert_allclose(tracks["amplitude"][cascade], -3 * 0.6 * 0.3 / 2)
+
+    # Rises from immediacy over its three active years, then fades to persistence
+    weights = np.array([animator.weights(year)[sasanian[0]] for year in range(227, 238)])
+    np.testing.assert_allclose(weights, [0, 0.4, 0.7, 1, 0.9, 0.8, 0.7, 0.6, 0.5, 0.5, 0.5])
+
+
+def test_bundled_events_match_scratch_frames():
+    events = load_json(BUNDLED_EVENTS)
+    events = events.get("historical_events", events)["events"]
+    animator = TerrainAnimator(EventTable.from_events(events), rasterizer=TerrainRasterizer(SIZE, SIZE))
+
+    for year, grid, _ in animator.work_frames():
+        if year % 20 == 0:
+            expected = scratch_grid(animator, year)
+            np.testing.assert_allclose(grid, expected, rtol=0, atol=1e-5 * max(np.abs(expected).max(), 1))
@@ -0,0 +1,110 @@
+import struct
+import zlib
+import numpy as np
+import pytest
+from src.event_table import EventTable
+from src.terrain_rasterizer import TerrainRasterizer, heightmap_levels, write_png16, write_raw16
+
+SIZE = 512
+
+
+def make_event(year, name, regions, base_impact=6, scope_score=3, centrality=0.5):
+    return {
+        "year": year,
+        "name": name,
+        "primary_themes": ["economic_development"],
+        "base_impact": base_impact,
+        "geographic_scope": {"scope_score": scope_score, "regions": regions, "centrality": centrality},
+        "temporal_scope": {"duration_score": 10, "immediacy": 1.0, "persistence": 0.5}
+    }
+
+
+def gaussian_sum(splats, shape):
+    """Kernels evaluated directly at every pixel centre"""
+    ys, xs = np.mgrid[:shape[0], :shape[1]] + 0.5
+    heights = np.zeros(shape)
+    for x, y, sigma, amplitude in zip(splats["x"], splats["y"], splats["sigma"], splats["amplitude"]):
+        heights += amplitude * np.exp(-0.5 * ((xs - x) ** 2 + (ys - y) ** 2) / sigma ** 2)
+    return heights
+
+
+def test_rasterize_matches_direct_gaussians():
+    rasterizer = TerrainRasterizer(SIZE, SIZE)
+    table = EventTable.from_events([
+        make_event(193, "Civil war", ["Rome", "Syria"], -8, scope_score=2),
+        make_event(260, "Palmyrene revolt", ["Palmyra"], 5, scope_score=6),
+        make_event(330, "New capital", ["Constantinople"], 7, scope_score=10)
+    ])
+    splats = rasterizer.event_splats(table)
+
+    heights = rasterizer.rasterize(table)
+
+    assert heights.shape == (SIZE, SIZE) and heights.dtype == np.float32
+    assert splats["amplitude"].tolist() == pytest.approx([-0.8, -0.8, 3.0, 7.0])
+    expected = gaussian_sum(splats, heights.shape)
+    np.testing.assert_allclose(heights, expected, rtol=0, atol=0.01 * np.abs(expected).max())
+
+
+def test_render_window_is_a_slice_of_the_full_render():
+    rasterizer = TerrainRasterizer(SIZE, SIZE)
+    table = EventTable.from_events([make_event(193, "Civil war", ["Rome", "Gaul"]),
+                                    make_event(250, "Plague", [], -4, scope_score=8, centrality=0.1)])
+    grid = rasterizer.work_grid(table, {"period1": {"economic_development": 8}})
+    full = rasterizer.render_window(grid)
+
+    for rows, cols in [((0, 128), (0, 128)), ((128, 256), (384, 512)), ((100, 301), (37, 90))]:
+        np.testing.assert_allclose(rasterizer.render_window(grid, rows, cols),
+                                   full[rows[0]:rows[1], cols[0]:cols[1]], atol=1e-6)
+
+
+def test_sigmas_snap_to_levels():
+    rasterizer = TerrainRasterizer(SIZE, SIZE, sigma_min=0.01, sigma_max=0.1, sigma_levels=4)
+
+    sigmas = rasterizer.quantize_sigma(np.linspace(-0.5, 1.5, 101))
+
+    np.testing.assert_allclose(np.unique(sigmas), np.array([0.01, 0.04, 0.07, 0.1]) * SIZE)
+    assert rasterizer.quantize_sigma(np.array([0.0]))[0] == pytest.approx(0.01 * SIZE)
+    assert rasterizer.quantize_sigma(np.array([0.45]))[0] == pytest.approx(0.04 * SIZE)
+
+
+def test_unplaced_events_keep_their_place():
+    rasterizer = TerrainRasterizer(SIZE, SIZE)
+    wanderer = make_event(270, "Wandering warband", [], centrality=0.3)
+
+    alone = rasterizer.event_splats(EventTable.from_events([wanderer]))
+    crowded = rasterizer.event_splats(EventTable.from_events(
+        [make_event(year, f"Raid {year}", []) for year in range(200, 210)] + [wanderer]))
+
+    assert (crowded["x"][-1], crowded["y"][-1]) == (alone["x"][0], alone["y"][0])
+    distance = np.hypot(alone["x"][0] - rasterizer.center[0], alone["y"][0] - rasterizer.center[1])
+    assert distance == pytest.approx(0.7 * 0.45 * SIZE)
+
+
+def test_heightmap_levels():
+    levels, height_range = heightmap_levels(np.array([[-2.0, 0.0, 1.0, 2.0]], dtype=np.float32))
+
+    assert height_range == 2.0
+    assert levels.tolist() == [[0, 32768, 49151, 65535]]
+    assert heightmap_levels(np.zeros((1, 1), dtype=np.float32))[1] == 1.0
+
+
+def test_png16_and_raw16_hold_the_levels(tmp_path):
+    levels = np.random.default_rng(0).integers(0, 65536, size=(5, 7)).astype(np.uint16)
+
+    write_png16(str(tmp_path / "terrain.png"), levels)
+    write_raw16(str(tmp_path / "terrain.raw"), levels)
+
+    data = (tmp_path / "terrain.png").read_bytes()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    assert struct.unpack(">IIBB", data[16:26]) == (7, 5, 16, 0)
+    idat = data.index(b"IDAT")
+    length = struct.unpack(">I", data[idat - 4:idat])[0]
+    rows = np.frombuffer(zlib.decompress(data[idat + 4:idat + 4 + length]), dtype=np.uint8).reshape(5, 15)
+    assert (rows[:, 0] == 1).all()
+    # Undo the Sub filter: each byte adds the byte one sample (two bytes) before it
+    samples = rows[:, 1:].copy()
+    for i in range(2, samples.shape[1]):
+        samples[:, i] += samples[:, i - 2]
+    np.testing.assert_array_equal(samples.view(">u2"), levels)
+
+    np.testing.assert_array_equal(np.fromfile(str(tmp_path / "terrain.raw"), dtype="<u2").reshape(5, 7), levels)
@@ -0,0 +1,85 @@
+import os
+import pytest
+from pipeline import PROJECT_DIR, PipelineRunner, Step, build_steps
+
+
+def test_build_steps_dependencies():
+    runner = PipelineRunner(build_steps())
+
+    assert runner.deps["stage0.clean"] == {"stage0.extract"}
+    assert runner.deps["stage1.summaries"] == {"stage1.texts"}
+    assert runner.deps["stage1.themes"] == {"stage1.summaries"}
+    assert runner.deps["stage2.report"] == {"stage2.themes", "stage2.events", "stage2.periods"}
+    for name in ("stage2.terrain", "stage2.tiles", "stage2.animation", "stage2.cascades"):
+        assert runner.deps[name] == {"stage2.events", "stage2.periods"}
+    assert runner.order.index("stage1.themes") < runner.order.index("stage2.events")
+
+
+def test_build_steps_code_inputs_exist():
+    for step in build_steps():
+        for path in step.inputs:
+            if path.endswith(".py"):
+                assert os.path.exists(os.path.join(PROJECT_DIR, path)), f"{step.name}: {path}"
+
+
+def copy_step(name, source, target, calls):
+    def action():
+        calls.append(name)
+        with open(source, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(text + name + "\n")
+    action.__name__ = f"copy_{name}"
+    return Step(name, inputs=[source], outputs=[target], action=action)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "source.txt").write_text("text\n", encoding='utf-8')
+    return tmp_path
+
+
+def chain(calls):
+    return [copy_step("b", "a.txt", "b.txt", calls), copy_step("a", "source.txt", "a.txt", calls),
+            copy_step("c", "b.txt", "c.txt", calls)]
+
+
+def test_unchanged_steps_are_skipped(workdir):
+    calls = []
+    assert PipelineRunner(chain(calls)).run()
+    assert calls == ["a", "b", "c"]
+    assert (workdir / "c.txt").read_text(encoding='utf-8') == "text\na\nb\nc\n"
+
+    calls.clear()
+    assert PipelineRunner(chain(calls)).run()
+    assert calls == []
+
+    # A changed input reruns its step and whatever reads its output
+    (workdir / "a.txt").write_text("edited\n", encoding='utf-8')
+    assert PipelineRunner(chain(calls)).run()
+    assert calls == ["a"]
+    (workdir / "source.txt").write_text("new text\n", encoding='utf-8')
+    assert PipelineRunner(chain(calls)).run()
+    assert calls == ["a", "a", "b", "c"]
+
+    calls.clear()
+    assert PipelineRunner(chain(calls), force=True, only=["b"]).run()
+    assert calls == ["b"]
+
+
+def test_failure_blocks_dependents(workdir):
+    calls = []
+    steps = chain(calls)
+    steps[0] = Step("b", inputs=["a.txt"], outputs=["b.txt"], action=lambda: calls.append("b"))
+
+    assert not PipelineRunner(steps).run()
+    assert calls == ["a", "b"]
+    assert not (workdir / "c.txt").exists()
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="produced by both"):
+        PipelineRunner([Step("a", [], ["x"]), Step("b", [], ["x"])])
+    with pytest.raises(ValueError, match="cycle"):
+        PipelineRunner([Step("a", ["y"], ["x"]), Step("b", ["x"], ["y"])])